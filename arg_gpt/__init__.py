@@ -1,15 +1,12 @@
 """
 arg_gpt package initialization.
 Exposes the main functionality for AI function integration.
+
+The registry functions are imported on first access, so importing a submodule such as
+the daemon's thin client does not load ai_func, the environment or the SDK.
 """
 
-from .ai_func import (
-    ai_func,
-    get_ai_functions,
-    get_function_schemas,
-    get_function_by_name,
-    clear_registry
-)
+import importlib
 
 __all__ = [
     'ai_func',
@@ -18,3 +15,16 @@ __all__ = [
     'get_function_by_name',
     'clear_registry'
 ]
+
+
+def __getattr__(name):
+    if name not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(".ai_func", __name__)
+    # Importing the submodule binds arg_gpt.ai_func to the module; the decorator replaces it
+    globals().update({exported: getattr(module, exported) for exported in __all__})
+    return globals()[name]
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
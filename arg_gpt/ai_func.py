@@ -1,8 +1,8 @@
 from functools import wraps
 from arg_gpt.gpt_function_reflection import doc_to_gpt_dict
-from openai import OpenAI
 from typing import Dict, Any, List, Tuple
 from arg_gpt.gpt_helpers import interpret_response
+from arg_gpt.tool_options import ToolOptions, set_tool_options
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -10,26 +10,41 @@ load_dotenv()
 # Store both functions and their schemas
 ai_func_registry: Dict[str, Tuple[callable, Dict[str, Any]]] = {}
 
-client = OpenAI()
+def __getattr__(name):
+    # The OpenAI SDK is slow to import, so the shared client is only created on first use
+    global client
+    if name == "client":
+        from openai import OpenAI
+        client = OpenAI()
+        return client
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def clear_registry():
     """Clear the function registry. Used primarily for testing."""
     global ai_func_registry
     ai_func_registry = {}
 
-def ai_func(func):
+def ai_func(func=None, **options):
     """
     Decorator to register functions for AI use.
     
+    Can be used bare (``@ai_func``) or with options (``@ai_func(max_output_bytes=4096)``).
+    
     Arguments:
         func: The function to register
+        options: Keyword options stored as the function's ToolOptions
         
     Returns:
         The wrapped function
     """
+    if func is None:
+        return lambda f: ai_func(f, **options)
+    tool_options = ToolOptions(**options)
+
     @wraps(func)
     def wrapper(*args, **kwargs):
         return func(*args, **kwargs)
+    set_tool_options(wrapper, tool_options)
     
     # Format the function schema properly for OpenAI API
     func_dict = doc_to_gpt_dict(func)
@@ -0,0 +1,194 @@
+"""
+Module for cancelling a conversation turn and bounding it with a deadline.
+
+A CancellationToken is created per turn, for example by the server when a request
+arrives, and passed down through ``call_gpt_with_function``, the rate limiter, the
+model router's escalation loop and the dispatcher. Blocking waits return as soon as
+the token is cancelled or its deadline passes, tool calls that have not started are
+answered with a ``cancelled`` error instead of being run, and a running tool is
+abandoned like a timed out one.
+
+Tools that check for cancellation themselves declare a parameter annotated with
+CancellationToken. The dispatcher injects the turn's token into it, and the parameter is
+left out of the tool's schema.
+"""
+
+import inspect
+import threading
+import time
+import typing
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+
+
+class CancellationError(Exception):
+    """Raised when work stops because its token was cancelled."""
+
+
+class DeadlineExceeded(CancellationError):
+    """Raised when work stops because its token's deadline passed."""
+
+
+class CancellationToken:
+    """Cancellation flag with an optional deadline, shared by everything a turn starts."""
+
+    def __init__(self, timeout: Optional[float] = None, deadline: Optional[float] = None,
+                 parent: Optional["CancellationToken"] = None, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the token.
+
+        Arguments:
+            timeout: Seconds from now until the deadline
+            deadline: Absolute deadline on ``clock``; the earlier of both is used
+            parent: Token whose cancellation and deadline also apply to this one
+            clock: Monotonic clock, replaceable for tests
+        """
+        self.clock = clock
+        deadlines = [value for value in (deadline, None if timeout is None else clock() + timeout) if value is not None]
+        if parent is not None and parent.deadline is not None:
+            deadlines.append(parent.deadline)
+        self.deadline: Optional[float] = min(deadlines) if deadlines else None
+        self.parent = parent
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        if parent is not None:
+            parent.on_cancel(lambda: self.cancel(parent.reason or "cancelled"))
+
+    def child(self, timeout: Optional[float] = None) -> "CancellationToken":
+        """Create a token cancelled with this one, optionally with an earlier deadline."""
+        return CancellationToken(timeout=timeout, parent=self, clock=self.clock)
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """Cancel the token and run its callbacks once."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Register a callback run when the token is cancelled.
+
+        Deadlines do not run callbacks; waits use ``remaining`` as their timeout instead.
+
+        Arguments:
+            callback: Called without arguments, immediately if already cancelled
+
+        Returns:
+            A function unregistering the callback
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    @property
+    def expired(self) -> bool:
+        """Whether the deadline has passed."""
+        return self.deadline is not None and self.clock() >= self.deadline
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the token was cancelled or its deadline has passed."""
+        return self._event.is_set() or self.expired
+
+    def remaining(self) -> Optional[float]:
+        """Seconds until the deadline, never negative, or None without a deadline."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - self.clock())
+
+    def raise_if_cancelled(self) -> None:
+        """
+        Stop the current work if the token is cancelled.
+
+        Raises:
+            CancellationError: If the token was cancelled
+            DeadlineExceeded: If the deadline has passed
+        """
+        if self._event.is_set():
+            raise CancellationError(self.reason or "cancelled")
+        if self.expired:
+            raise DeadlineExceeded("deadline exceeded")
+
+    def wait(self, seconds: Optional[float] = None) -> bool:
+        """
+        Sleep for up to ``seconds``, returning early when the token is cancelled.
+
+        Arguments:
+            seconds: Maximum seconds to sleep; until cancellation or the deadline if None
+
+        Returns:
+            True if the token is cancelled
+        """
+        remaining = self.remaining()
+        if remaining is not None:
+            seconds = remaining if seconds is None else min(seconds, remaining)
+        self._event.wait(seconds)
+        return self.cancelled
+
+
+def limit_timeout(timeout: Optional[float], token: Optional[CancellationToken]) -> Optional[float]:
+    """The smaller of a timeout and the time left until a token's deadline."""
+    remaining = token.remaining() if token is not None else None
+    if remaining is None:
+        return timeout
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+@lru_cache(maxsize=1024)
+def injected_parameters(func: Callable) -> FrozenSet[str]:
+    """
+    Get the parameters of a function that receive the turn's CancellationToken.
+
+    Arguments:
+        func: The tool function
+
+    Returns:
+        Names of the parameters annotated with CancellationToken or Optional[CancellationToken]
+    """
+    try:
+        hints = typing.get_type_hints(func)
+        parameters = inspect.signature(func).parameters
+    except (TypeError, ValueError, NameError):
+        return frozenset()
+    return frozenset(name for name in parameters if is_token_type(hints.get(name)))
+
+
+def inject_token(arguments: Dict[str, Any], injected: FrozenSet[str],
+                 token: Optional[CancellationToken]) -> Dict[str, Any]:
+    """
+    Add the turn's token to a tool's arguments.
+
+    Arguments:
+        arguments: The decoded arguments
+        injected: The tool's injected parameters, see injected_parameters
+        token: The turn's token; a token that is never cancelled if None
+
+    Returns:
+        The arguments with every injected parameter set
+    """
+    if not injected:
+        return arguments
+    token = token if token is not None else CancellationToken()
+    return {**arguments, **{name: token for name in injected}}
+
+
+def is_token_type(type_hint) -> bool:
+    """Check whether a type hint is CancellationToken, optionally wrapped in Optional."""
+    if type_hint is CancellationToken:
+        return True
+    return typing.get_origin(type_hint) is typing.Union and CancellationToken in typing.get_args(type_hint)
@@ -0,0 +1,228 @@
+"""
+Module for isolating slow or failing tools.
+
+Tools can be given an execution timeout, which runs them on a thread of their own and
+abandons the call once the timeout expires, and a circuit breaker, which fast-fails a
+tool after repeated recent errors or slow calls until a cool-down has passed.
+"""
+
+import queue
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, List, Optional
+
+from .cancellation import CancellationToken, limit_timeout
+from .tool_options import ToolOptions
+
+# Idle tool threads kept for reuse
+MAX_IDLE_TOOL_THREADS = 32
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ToolTimeoutError(Exception):
+    """Raised when a tool does not finish within its timeout."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker counting recent failures of one tool.
+
+    The breaker opens when ``failure_threshold`` failures happen within ``window``
+    seconds. While open every call is rejected; after ``reset_timeout`` seconds a
+    single trial call is let through and its outcome closes or reopens the breaker.
+    Calls slower than ``slow_call_seconds`` count as failures.
+    """
+
+    def __init__(self, failure_threshold: int = 5, window: float = 60.0, reset_timeout: float = 30.0,
+                 slow_call_seconds: Optional[float] = None, clock=time.monotonic):
+        """
+        Initialize a closed breaker.
+
+        Arguments:
+            failure_threshold: Number of recent failures that opens the breaker
+            window: Seconds for which a failure counts as recent
+            reset_timeout: Seconds the breaker stays open before a trial call
+            slow_call_seconds: Latency above which a successful call counts as a failure
+            clock: Monotonic clock, replaceable for testing
+        """
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.slow_call_seconds = slow_call_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self._failures = deque()
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Check whether a call may proceed, claiming the trial call when half open."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets a trial call through."""
+        return max(0.0, self._opened_at + self.reset_timeout - self.clock())
+
+    def _open(self, now: float) -> None:
+        self.state = OPEN
+        self._opened_at = now
+        self._failures.clear()
+
+    def record_success(self, latency: float = 0.0) -> None:
+        """Record a completed call and its latency."""
+        if self.slow_call_seconds is not None and latency > self.slow_call_seconds:
+            self.record_failure()
+            return
+        with self._lock:
+            self._trial_running = False
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+
+    def release(self) -> None:
+        """Record a call that ended without an outcome, e.g. because it was cancelled."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        """Record a failed, timed out or slow call."""
+        with self._lock:
+            self._trial_running = False
+            now = self.clock()
+            if self.state == HALF_OPEN:
+                self._open(now)
+                return
+            self._failures.append(now)
+            while self._failures and now - self._failures[0] > self.window:
+                self._failures.popleft()
+            if len(self._failures) >= self.failure_threshold:
+                self._open(now)
+
+
+_breakers: "weakref.WeakKeyDictionary[Callable, CircuitBreaker]" = weakref.WeakKeyDictionary()
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(func: Callable, options: ToolOptions) -> Optional[CircuitBreaker]:
+    """
+    Get the circuit breaker of a tool, shared by every dispatcher using it.
+
+    Arguments:
+        func: The tool function
+        options: The tool's options
+
+    Returns:
+        The breaker, or None if the tool has no failure threshold
+    """
+    if options.failure_threshold is None:
+        return None
+    with _breakers_lock:
+        breaker = _breakers.get(func)
+        if breaker is None:
+            breaker = _breakers[func] = CircuitBreaker(
+                failure_threshold=options.failure_threshold,
+                reset_timeout=options.reset_timeout,
+                slow_call_seconds=options.slow_call_seconds
+            )
+        return breaker
+
+
+class _ToolThreads:
+    """
+    Reusable daemon threads running tool calls, one thread per call in progress.
+
+    A fixed size pool would keep the threads of abandoned calls busy until every later
+    call queued behind them and timed out without running. Here every call gets a thread
+    of its own; threads that finish are kept for reuse up to ``max_idle``.
+    """
+
+    def __init__(self, max_idle: int = MAX_IDLE_TOOL_THREADS):
+        self.max_idle = max_idle
+        self._idle: List[queue.SimpleQueue] = []
+        self._lock = threading.Lock()
+
+    def submit(self, produce: Callable[[], Any]) -> Future:
+        """Run a callable on an idle or new thread."""
+        future: Future = Future()
+        with self._lock:
+            inbox = self._idle.pop() if self._idle else None
+        if inbox is None:
+            inbox = queue.SimpleQueue()
+            threading.Thread(target=self._serve, args=(inbox,), name="arg_gpt_tool", daemon=True).start()
+        inbox.put((future, produce))
+        return future
+
+    def _serve(self, inbox: queue.SimpleQueue) -> None:
+        while True:
+            future, produce = inbox.get()
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = produce()
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+            del future, produce
+            with self._lock:
+                if len(self._idle) >= self.max_idle:
+                    return
+                self._idle.append(inbox)
+
+
+_tool_threads = _ToolThreads()
+
+
+def run_with_timeout(produce: Callable[[], Any], timeout: Optional[float],
+                     token: Optional[CancellationToken] = None) -> Any:
+    """
+    Run a callable on a thread of its own and wait at most ``timeout`` seconds.
+
+    Python threads cannot be killed, so a timed out or cancelled call keeps running
+    in the background; its result is discarded. Abandoned calls never delay later ones.
+
+    Arguments:
+        produce: The callable to run
+        timeout: Seconds to wait for the result; None waits until the token stops the call
+        token: Stops waiting as soon as it is cancelled or its deadline passes
+
+    Returns:
+        The callable's result
+
+    Raises:
+        ToolTimeoutError: If the timeout expired
+        CancellationError: If the token was cancelled or its deadline passed
+    """
+    future = _tool_threads.submit(produce)
+    if token is None:
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise ToolTimeoutError(f"Timed out after {timeout} seconds") from None
+
+    done = threading.Event()
+    future.add_done_callback(lambda _: done.set())
+    unregister = token.on_cancel(done.set)
+    try:
+        done.wait(limit_timeout(timeout, token))
+    finally:
+        unregister()
+    if future.done():
+        return future.result()
+    future.cancel()
+    token.raise_if_cancelled()
+    raise ToolTimeoutError(f"Timed out after {timeout} seconds")
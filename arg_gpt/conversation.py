@@ -0,0 +1,135 @@
+"""
+Module for running conversation turns against a fixed tool set.
+
+A ConversationRunner keeps everything that does not change between prompts warm: the
+client and its connection pool, the tool dispatcher and the byte-stable prompt prefix
+with the tools payload. Long-lived entry points such as the HTTP server, the REPL and
+the daemon build one runner and reuse it for every prompt.
+"""
+
+import logging
+from typing import Any, Iterable, Iterator, List, Optional, Sequence
+
+from . import prompts
+from .cancellation import CancellationToken
+from .dispatcher import ToolDispatcher, tool_failed
+from .gpt_helpers import DEFAULT_MODEL, call_gpt_with_function
+from .plan_cache import PlanCache
+from .prompt_prefix import PromptAssembler
+
+log = logging.getLogger(__name__)
+
+
+def message_content(message: Any) -> Optional[str]:
+    """Get the content of a message dict or SDK message object."""
+    if isinstance(message, dict):
+        return message.get("content", "")
+    return getattr(message, "content", None)
+
+
+def result_text(messages: Sequence[Any]) -> Optional[str]:
+    """Get the result of a turn: the content of its last message."""
+    return message_content(messages[-1]) if messages else None
+
+
+class ConversationRunner:
+    """Runs prompts against one client and tool set, reusing everything built for them."""
+
+    def __init__(self, client, functions: Iterable[callable], model: str = DEFAULT_MODEL,
+                 assembler: Optional[PromptAssembler] = None, rate_limiter=None, usage_tracker=None,
+                 plan_cache: Optional[PlanCache] = None):
+        """
+        Initialize the runner and build its prompt prefix.
+
+        Arguments:
+            client: The OpenAI compatible client
+            functions: The functions exposed to the model
+            model: The model to use
+            assembler: Prompt assembler; one with the default system prompts if omitted
+            rate_limiter: Optional RateLimiter applied to every completion
+            usage_tracker: Optional UsageTracker recording every completion
+            plan_cache: Optional PlanCache learning and serving the tool calls of prompts without history
+        """
+        self.client = client
+        self.functions = tuple(functions)
+        self.model = model
+        self.rate_limiter = rate_limiter
+        self.usage_tracker = usage_tracker
+        self.plan_cache = plan_cache
+        self.dispatcher = ToolDispatcher(self.functions)
+        self.assembler = assembler or PromptAssembler()
+        self.prefix = self.assembler.prefix(self.functions)
+
+    def complete(self, messages: List[Any], session_id: Optional[str] = None,
+                 token: Optional[CancellationToken] = None):
+        """Request a completion for the given messages with the cached tools payload."""
+        return call_gpt_with_function(
+            self.client, self.functions, messages, model=self.model, rate_limiter=self.rate_limiter,
+            tools_dict=self.prefix.tools, usage_tracker=self.usage_tracker, session_id=session_id, token=token
+        )
+
+    def iter_turn(self, prompt: str, history: Sequence[Any] = (), session_id: Optional[str] = None,
+                  token: Optional[CancellationToken] = None) -> Iterator[Any]:
+        """
+        Run one turn, yielding each new message as soon as it is available.
+
+        Arguments:
+            prompt: The user prompt
+            history: Earlier conversation messages, without the system prompts
+            session_id: The conversation the turn belongs to, for usage accounting
+            token: Cancels the completion and the tool calls of the turn
+
+        Yields:
+            The user message, the assistant message and one tool message per tool call
+
+        Raises:
+            CancellationError: If the token is cancelled before the completion is received
+        """
+        messages = self.prefix.messages(*history, *prompts.user_prompt(prompt))
+        yield messages[-1]
+        # Only prompts without history are answered the same way every time
+        plan_cache = self.plan_cache if not history else None
+        if plan_cache is not None:
+            planned = plan_cache.lookup(self.prefix.fingerprint, prompt)
+            if planned is not None:
+                log.debug("Serving %d planned tool calls", len(planned))
+                yield {"role": "assistant", "content": None, "tool_calls": [call.to_payload() for call in planned]}
+                failed = False
+                for message in self.dispatcher.iter_tool_messages(planned, token):
+                    failed = failed or tool_failed(message)
+                    yield message
+                if failed and not (token is not None and token.cancelled):
+                    plan_cache.reject(self.prefix.fingerprint, prompt)
+                return
+
+        response = self.complete(messages, session_id, token)
+        if not response.choices:
+            log.warning("No choices in response")
+            return
+        response_message = response.choices[0].message
+        yield response_message
+        tool_calls = getattr(response_message, "tool_calls", None)
+        if not tool_calls:
+            return
+        failed = False
+        for message in self.dispatcher.iter_tool_messages(tool_calls, token):
+            failed = failed or tool_failed(message)
+            yield message
+        if plan_cache is not None and not failed:
+            plan_cache.observe(self.prefix.fingerprint, prompt, tool_calls)
+
+    def run(self, prompt: str, history: Sequence[Any] = (), session_id: Optional[str] = None,
+            token: Optional[CancellationToken] = None) -> List[Any]:
+        """
+        Run one turn.
+
+        Arguments:
+            prompt: The user prompt
+            history: Earlier conversation messages, without the system prompts
+            session_id: The conversation the turn belongs to, for usage accounting
+            token: Cancels the completion and the tool calls of the turn
+
+        Returns:
+            The new messages of the turn, starting with the user message
+        """
+        return list(self.iter_turn(prompt, history, session_id, token))
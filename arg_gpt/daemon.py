@@ -0,0 +1,283 @@
+"""
+Module for a persistent daemon, its thin client and an interactive REPL.
+
+Every run of a command line script pays for interpreter startup, loading the
+environment, importing the SDK and reflecting over every ``@ai_func``. The daemon pays
+that once and answers prompts over a Unix socket, so repeated commands only wait for
+the model. The client side only loads this module and the session store: the package
+imports its registry lazily, so neither the SDK, the environment nor any tool module is
+loaded. Run it with ``python -m arg_gpt.daemon "prompt"``.
+
+The protocol is JSON lines: the client sends one request object, the daemon answers
+with a ``{"message": ...}`` line per new message followed by ``{"result": ...}`` or
+``{"error": ...}``.
+"""
+
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import sys
+import tempfile
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from .session_store import SessionStore, serialize_message
+
+log = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = os.path.join(
+    tempfile.gettempdir(), f"arg_gpt-{os.getuid() if hasattr(os, 'getuid') else 'user'}.sock"
+)
+# Number of earlier turns of a session sent with a new prompt
+DEFAULT_HISTORY_TURNS = 8
+
+
+class DaemonError(RuntimeError):
+    """Raised by the client when the daemon reports a failed turn, or when the socket path is taken."""
+
+
+def _last_content(messages: List[Dict[str, Any]]) -> Optional[str]:
+    return messages[-1].get("content") if messages else None
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _send(self, payload: Dict[str, Any]) -> None:
+        self.wfile.write(json.dumps(payload).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+    def handle(self):
+        daemon: DaemonServer = self.server.daemon
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+            prompt = request["prompt"]
+        except (ValueError, KeyError, TypeError) as e:
+            self._send({"error": f"Invalid request - {e}"})
+            return
+
+        session_id = request.get("session_id")
+        messages = []
+        try:
+            for message in daemon.runner.iter_turn(prompt, daemon.history(session_id), session_id):
+                message = serialize_message(message)
+                messages.append(message)
+                self._send({"message": message})
+        except (BrokenPipeError, ConnectionResetError):
+            return
+        except Exception as e:
+            log.exception("Conversation failed")
+            self._send({"error": str(e)})
+            return
+        daemon.save(session_id, messages)
+        self._send({"result": _last_content(messages)})
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _remove_stale_socket(path: str) -> None:
+    """
+    Remove a socket file left behind by a daemon that is no longer running.
+
+    Arguments:
+        path: Path of the Unix socket
+
+    Raises:
+        DaemonError: If the path is not a socket or a daemon is still listening on it
+    """
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise DaemonError(f"{path} exists and is not a socket")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            pass
+        else:
+            raise DaemonError(f"A daemon is already listening on {path}")
+    os.unlink(path)
+
+
+class DaemonServer:
+    """Serves prompts over a Unix socket with a warm ConversationRunner."""
+
+    def __init__(self, runner, path: str = DEFAULT_SOCKET_PATH, session_store: Optional[SessionStore] = None,
+                 history_turns: int = DEFAULT_HISTORY_TURNS):
+        """
+        Initialize the daemon, binding its socket.
+
+        Arguments:
+            runner: The ConversationRunner every prompt is served with
+            path: Path of the Unix socket; a stale socket file is replaced
+            session_store: Store used to continue conversations by session_id
+            history_turns: Number of earlier turns of a session sent with a new prompt
+
+        Raises:
+            DaemonError: If the path is not a socket or another daemon is listening on it
+        """
+        self.runner = runner
+        self.path = path
+        self.session_store = session_store
+        self.history_turns = history_turns
+        _remove_stale_socket(path)
+        # The socket is created owner-only, leaving no window for other users to connect
+        umask = os.umask(0o077)
+        try:
+            self.server = _UnixServer(path, _Handler)
+        finally:
+            os.umask(umask)
+        self.server.daemon = self
+        self._thread: Optional[threading.Thread] = None
+
+    def history(self, session_id: Optional[str]) -> List[Dict[str, Any]]:
+        """Load the recent turns of a session, or nothing without a store or session."""
+        if self.session_store is None or not session_id:
+            return []
+        return self.session_store.load_turns(session_id, self.history_turns)
+
+    def save(self, session_id: Optional[str], messages: List[Dict[str, Any]]) -> None:
+        """Append a turn's messages to a session if a store is configured."""
+        if self.session_store is not None and session_id:
+            self.session_store.append(session_id, messages)
+
+    def serve_forever(self) -> None:
+        """Serve prompts on the calling thread until shutdown."""
+        log.info("Daemon listening on %s", self.path)
+        try:
+            self.server.serve_forever()
+        finally:
+            self.close()
+
+    def start(self) -> "DaemonServer":
+        """Start serving on a background thread."""
+        self._thread = threading.Thread(target=self.server.serve_forever, name="arg_gpt_daemon", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and remove the socket."""
+        self.server.shutdown()
+        if self._thread is not None:
+            self._thread.join()
+        self.close()
+
+    def close(self) -> None:
+        """Close the socket and remove its file."""
+        self.server.server_close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "DaemonServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def send_prompt(prompt: str, path: str = DEFAULT_SOCKET_PATH, session_id: Optional[str] = None,
+                timeout: Optional[float] = None,
+                on_message: Optional[Callable[[Dict[str, Any]], None]] = None) -> Optional[str]:
+    """
+    Send a prompt to a running daemon.
+
+    Arguments:
+        prompt: The user prompt
+        path: Path of the daemon's Unix socket
+        session_id: Continue this conversation
+        timeout: Socket timeout in seconds
+        on_message: Called with every new message as it arrives
+
+    Returns:
+        The result of the turn, the content of its last message
+
+    Raises:
+        ConnectionError: If no daemon is listening on the socket
+        DaemonError: If the daemon reports an error
+    """
+    request = {"prompt": prompt}
+    if session_id:
+        request["session_id"] = session_id
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.settimeout(timeout)
+        try:
+            connection.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise ConnectionError(f"No arg_gpt daemon listening on {path}") from e
+        connection.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with connection.makefile("rb") as replies:
+            for line in replies:
+                reply = json.loads(line)
+                if "message" in reply:
+                    if on_message is not None:
+                        on_message(reply["message"])
+                elif "error" in reply:
+                    raise DaemonError(reply["error"])
+                else:
+                    return reply.get("result")
+    raise DaemonError("Daemon closed the connection without a result")
+
+
+def run_repl(runner, read: Callable[[str], str] = input, write: Callable[[str], None] = print,
+             prompt: str = "> ") -> None:
+    """
+    Run an interactive loop answering prompts with a warm runner.
+
+    The conversation continues across prompts; ``/reset`` starts a new one and
+    ``/exit`` or end of input leaves the loop.
+
+    Arguments:
+        runner: The ConversationRunner used for every prompt
+        read: Reads a line of input given the prompt string
+        write: Writes a result
+        prompt: The prompt string
+    """
+    history: List[Dict[str, Any]] = []
+    while True:
+        try:
+            line = read(prompt).strip()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if not line:
+            continue
+        if line == "/exit":
+            return
+        if line == "/reset":
+            history = []
+            continue
+        try:
+            messages = [serialize_message(message) for message in runner.run(line, history)]
+        except Exception as e:
+            log.exception("Conversation failed")
+            write(f"Error: {e}")
+            continue
+        history.extend(messages)
+        write(_last_content(messages))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Thin command line client: send a prompt to the daemon and print the result."""
+    parser = argparse.ArgumentParser(description="Send a prompt to a running arg_gpt daemon")
+    parser.add_argument("prompt")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="Path of the daemon's Unix socket")
+    parser.add_argument("--session", default=None, help="Continue this conversation")
+    arguments = parser.parse_args(argv)
+    try:
+        print(send_prompt(arguments.prompt, arguments.socket, arguments.session))
+    except (ConnectionError, DaemonError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
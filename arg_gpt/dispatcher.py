@@ -0,0 +1,494 @@
+"""
+Module for dispatching model tool calls to Python functions.
+
+A ToolDispatcher is built once per tool set: it resolves every function's name and
+options up front so that handling a response is a dictionary lookup per tool call.
+Tools with a ``backend`` option are sent to the dispatcher's backend of that name,
+such as a RemoteBackend, instead of being called in-process, several calls of a
+tool with a ``batch`` implementation in one message are run as a single invocation,
+and tools with the ``sandbox`` option run in the worker processes of a SandboxPool.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+
+from .cancellation import CancellationError, CancellationToken, inject_token, injected_parameters
+from .circuit_breaker import CircuitBreaker, ToolTimeoutError, breaker_for, run_with_timeout
+from .json_repair import decode_arguments
+from .sandbox import SandboxPool, get_default_pool, sandbox_limits
+from .messages import ToolCall
+from .tool_options import ToolOptions, get_tool_options
+from .tool_output import render_tool_output, resolve_output_limit
+from .type_decoding import build_argument_decoder
+
+log = logging.getLogger(__name__)
+
+# Number of distinct tool sets whose dispatchers are kept by get_dispatcher
+DISPATCHER_CACHE_SIZE = 64
+
+
+class ToolEntry(NamedTuple):
+    """A registered tool with its precomputed execution settings."""
+    func: callable
+    output_limit: int
+    options: ToolOptions
+    breaker: Optional[CircuitBreaker]
+    decode_args: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]]
+    injected: FrozenSet[str]
+
+
+class ToolProgress(NamedTuple):
+    """A chunk of a streamed tool result, reported as soon as the tool produces it."""
+    tool_call_id: str
+    name: str
+    chunk: Any
+    index: int
+    # Seconds since the call started; for the first chunk this is the time to first output
+    elapsed: float
+
+
+class ToolMessage(dict):
+    """A tool message payload that also records whether the dispatcher reported a failure."""
+    __slots__ = ("failed",)
+
+    def __init__(self, *args, failed: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failed = failed
+
+
+def tool_message(tool_call_id: str, name: str, content: str, failed: bool = False) -> Dict[str, Any]:
+    """
+    Build the tool message sent back to the model for a tool call.
+
+    Arguments:
+        tool_call_id: The id of the tool call being answered
+        name: The name of the called function
+        content: The rendered result or error description
+        failed: Whether the call failed, e.g. raised, timed out or was rejected
+
+    Returns:
+        The tool message
+    """
+    return ToolMessage(tool_call_id=tool_call_id, role="tool", name=name, content=content, failed=failed)
+
+
+def tool_failed(message: Any) -> bool:
+    """Check whether a tool message answers a call the dispatcher reported as failed."""
+    return getattr(message, "failed", False)
+
+
+def tool_error(error_type: str, name: str, message: str, **details: Any) -> str:
+    """
+    Format a structured error as tool message content.
+
+    Arguments:
+        error_type: Machine readable kind of error, e.g. "timeout"
+        name: The name of the tool
+        message: Human readable description
+        details: Extra fields such as ``retry_after``
+
+    Returns:
+        The JSON encoded error
+    """
+    return json.dumps({"error": {"type": error_type, "tool": name, "message": message, **details}})
+
+
+def cancelled_error(name: str) -> str:
+    """Format the error answering a call that was cancelled before it finished."""
+    return tool_error("cancelled", name, "The tool call was cancelled or its deadline passed")
+
+
+class ToolDispatcher:
+    """Executes tool calls from a model response against a fixed set of functions."""
+
+    def __init__(self, functions: Iterable[callable], backends: Optional[Dict[str, Any]] = None,
+                 on_progress: Optional[Callable[[ToolProgress], None]] = None,
+                 sandbox_pool: Optional[SandboxPool] = None):
+        """
+        Initialize with the functions that may be called.
+
+        Arguments:
+            functions: The functions that may be called
+            backends: Backends by name for tools with a ``backend`` option; without
+                backends every tool runs in-process, which is how workers run them
+            on_progress: Called with every chunk of generator and async generator results
+            sandbox_pool: Pool running tools with the ``sandbox`` option; the process-wide
+                default pool if omitted
+        """
+        self.functions = tuple(functions)
+        self.backends = backends
+        self.on_progress = on_progress
+        self.sandbox_pool = sandbox_pool
+        self.table: Dict[str, ToolEntry] = {}
+        for func in self.functions:
+            options = get_tool_options(func)
+            self.table[func.__name__] = ToolEntry(
+                func, resolve_output_limit(options), options, breaker_for(func, options),
+                build_argument_decoder(func), injected_parameters(func)
+            )
+        self.remote = {
+            name: entry.options.backend for name, entry in self.table.items()
+            if backends is not None and entry.options.backend is not None
+        }
+        self.batched = {
+            name for name, entry in self.table.items()
+            if entry.options.batch is not None and name not in self.remote
+        }
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.table
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def call_tool(self, tool_call, token: Optional[CancellationToken] = None) -> Dict[str, Any]:
+        """
+        Execute a single tool call.
+
+        Arguments:
+            tool_call: A tool call from a response message
+            token: Cancels the call, see complete_call
+
+        Returns:
+            The tool message with the result or an error description
+        """
+        if tool_call.function.name in self.remote:
+            return next(self.iter_tool_messages([tool_call], token))
+        return self.call(tool_call.id, tool_call.function.name, tool_call.function.arguments, token)
+
+    def call(self, tool_call_id: str, function_name: str, arguments: str,
+             token: Optional[CancellationToken] = None) -> Dict[str, Any]:
+        """
+        Execute a tool call in-process.
+
+        Arguments:
+            tool_call_id: The id of the tool call
+            function_name: The name of the called function
+            arguments: The JSON encoded arguments
+            token: Cancels the call and is injected into CancellationToken parameters
+
+        Returns:
+            The tool message with the result or an error description
+        """
+        entry = self.table.get(function_name)
+        if entry is None:
+            log.warning("Unknown function name: %s", function_name)
+            return tool_message(tool_call_id, function_name, f"Error: Unknown function '{function_name}'",
+                                failed=True)
+
+        try:
+            json_args = decode_arguments(arguments)
+            function_args = entry.decode_args(json_args) if entry.decode_args is not None else json_args
+        except (ValueError, TypeError) as e:
+            log.error("Failed to parse function arguments: %s", e)
+            return tool_message(
+                tool_call_id, function_name, f"Error: Invalid function arguments - {str(e)}", failed=True
+            )
+
+        if entry.options.sandbox:
+            # The worker decodes the JSON arguments itself; typed values cannot cross the pipe
+            log.debug("Executing %s in the sandbox with args: %s", function_name, json_args)
+            pool = self.sandbox_pool or get_default_pool()
+            limits = sandbox_limits(entry.options.sandbox)
+            return self.complete_call(
+                tool_call_id, function_name, entry, lambda: pool.call(entry.func, json_args, limits, token), token
+            )
+        function_args = inject_token(function_args, entry.injected, token)
+        log.debug("Executing %s with args: %s", function_name, function_args)
+        return self.complete_call(tool_call_id, function_name, entry, lambda: entry.func(**function_args), token)
+
+    def prepare_batches(self, tool_calls,
+                        token: Optional[CancellationToken] = None) -> Dict[str, Callable[[], Dict[str, Any]]]:
+        """
+        Group the calls of batched tools so each tool's batch implementation runs once.
+
+        The batch runs when the first of its calls is answered; the other calls of the
+        group then only render their share of the results.
+
+        Arguments:
+            tool_calls: The tool calls of a response message
+            token: Cancels the batches, see complete_call
+
+        Returns:
+            A function producing the tool message of each batched call by tool_call_id
+        """
+        groups: Dict[str, List[Any]] = {}
+        for tool_call in tool_calls:
+            if tool_call.function.name in self.batched:
+                groups.setdefault(tool_call.function.name, []).append(tool_call)
+
+        answers = {}
+        for name, group in groups.items():
+            # A single call gains nothing from batching and uses the plain implementation
+            if len(group) > 1:
+                answers.update(self._batch_answers(name, self.table[name], group, token))
+        return answers
+
+    def _batch_answers(self, name: str, entry: ToolEntry, tool_calls,
+                       token: Optional[CancellationToken]) -> Dict[str, Callable[[], Dict[str, Any]]]:
+        answers = {}
+        decoded = []
+        for tool_call in tool_calls:
+            try:
+                function_args = decode_arguments(tool_call.function.arguments)
+                if entry.decode_args is not None:
+                    function_args = entry.decode_args(function_args)
+            except (ValueError, TypeError) as e:
+                log.error("Failed to parse function arguments: %s", e)
+                message = tool_message(
+                    tool_call.id, name, f"Error: Invalid function arguments - {str(e)}", failed=True
+                )
+                answers[tool_call.id] = lambda message=message: message
+                continue
+            decoded.append((tool_call.id, function_args))
+
+        outcome: Dict[str, Any] = {}
+        lock = threading.Lock()
+
+        def run_batch() -> Sequence[Any]:
+            with lock:
+                if not outcome:
+                    log.debug("Executing %s as a batch of %d calls", name, len(decoded))
+                    try:
+                        results = entry.options.batch([function_args for _, function_args in decoded])
+                        if len(results) != len(decoded):
+                            raise ValueError(f"Batch returned {len(results)} results for {len(decoded)} calls")
+                        outcome["results"] = results
+                    except Exception as e:
+                        outcome["error"] = e
+            if "error" in outcome:
+                raise outcome["error"]
+            return outcome["results"]
+
+        def produce(index: int) -> Any:
+            result = run_batch()[index]
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        for index, (tool_call_id, _) in enumerate(decoded):
+            answers[tool_call_id] = lambda tool_call_id=tool_call_id, index=index: self.complete_call(
+                tool_call_id, name, entry, lambda: produce(index), token
+            )
+        return answers
+
+    def submit_remote(self, tool_calls, token: Optional[CancellationToken] = None) -> Dict[str, Any]:
+        """
+        Submit the remote calls of a message, one batch per backend.
+
+        Arguments:
+            tool_calls: The tool calls of a response message
+            token: Stops waiting for room in a full queue; calls not submitted by then
+                are answered as cancelled
+
+        Returns:
+            The pending results of each submitted call by tool_call_id
+        """
+        batches: Dict[str, List[Any]] = {}
+        for tool_call in tool_calls:
+            backend = self.remote.get(tool_call.function.name)
+            if backend is not None:
+                batches.setdefault(backend, []).append(
+                    (tool_call.id, tool_call.function.name, tool_call.function.arguments)
+                )
+
+        pending = {}
+        for backend, calls in batches.items():
+            if backend not in self.backends:
+                log.error("No backend named %s", backend)
+                continue
+            try:
+                results = self.backends[backend].submit(calls, token)
+            except CancellationError:
+                log.info("Cancelled before submitting %d calls to %s", len(calls), backend)
+                break
+            for tool_call_id, _, _ in calls:
+                pending[tool_call_id] = results
+        return pending
+
+    def complete_call(self, tool_call_id: str, function_name: str, entry: ToolEntry,
+                      produce: Callable[[], Any], token: Optional[CancellationToken] = None) -> Dict[str, Any]:
+        """
+        Produce a tool's result and render it as a tool message.
+
+        Arguments:
+            tool_call_id: The id of the tool call being answered
+            function_name: The name of the called function
+            entry: The dispatch table entry of the function
+            produce: Callable returning the function's result, e.g. by running it
+            token: Cancels the call; with a deadline, the tool runs on a thread of its own and
+                is abandoned as soon as the token is cancelled or the deadline passes,
+                otherwise it runs inline and cancellation is checked before it starts
+
+        Returns:
+            The tool message with the result or an error description
+        """
+        if token is not None and token.cancelled:
+            return tool_message(tool_call_id, function_name, cancelled_error(function_name), failed=True)
+        breaker = entry.breaker
+        if breaker is not None and not breaker.allow():
+            log.warning("Circuit open for %s, rejecting call", function_name)
+            return tool_message(tool_call_id, function_name, tool_error(
+                "circuit_open", function_name,
+                "The tool is temporarily unavailable after repeated failures, do not retry it yet",
+                retry_after=round(breaker.retry_after(), 1)
+            ), failed=True)
+
+        timeout = entry.options.timeout
+        started = time.monotonic()
+        on_chunk = None if self.on_progress is None else self._progress_reporter(tool_call_id, function_name, started)
+        failed = False
+        try:
+            if timeout is None and (token is None or token.deadline is None):
+                content = render_tool_output(produce(), entry.output_limit, on_chunk)
+            else:
+                content = run_with_timeout(
+                    lambda: render_tool_output(produce(), entry.output_limit, on_chunk), timeout, token
+                )
+        except CancellationError:
+            reason = token.reason if token is not None else None
+            log.info("Abandoned %s: %s", function_name, reason or "deadline exceeded")
+            if breaker is not None:
+                # A cancelled call says nothing about the tool's health
+                breaker.release()
+            return tool_message(tool_call_id, function_name, cancelled_error(function_name), failed=True)
+        except ToolTimeoutError:
+            log.error("Function %s timed out after %s seconds", function_name, timeout)
+            content = tool_error("timeout", function_name, f"The tool did not finish within {timeout} seconds")
+            failed = True
+        except Exception as e:
+            log.error("Function execution failed: %s", e)
+            content = f"Error executing function: {str(e)}"
+            failed = True
+
+        if breaker is not None:
+            if failed:
+                breaker.record_failure()
+            else:
+                breaker.record_success(time.monotonic() - started)
+        return tool_message(tool_call_id, function_name, content, failed=failed)
+
+    def _progress_reporter(self, tool_call_id: str, function_name: str, started: float) -> Callable[[Any], None]:
+        count = [0]
+
+        def report(chunk: Any) -> None:
+            index = count[0]
+            count[0] += 1
+            try:
+                self.on_progress(ToolProgress(tool_call_id, function_name, chunk, index, time.monotonic() - started))
+            except Exception as e:
+                log.error("Progress callback failed: %s", e)
+        return report
+
+    def iter_tool_messages(self, tool_calls, token: Optional[CancellationToken] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Execute tool calls, yielding each tool message as soon as it is ready.
+
+        Arguments:
+            tool_calls: The tool calls of a response message
+            token: Once cancelled, the remaining calls are answered without running them
+
+        Yields:
+            One tool message per tool call, in order
+        """
+        if not self.remote and not self.batched:
+            for tool_call in tool_calls:
+                yield self.call(tool_call.id, tool_call.function.name, tool_call.function.arguments, token)
+            return
+
+        # Remote calls are submitted first so workers run them while local calls execute
+        pending = self.submit_remote(tool_calls, token) if self.remote else {}
+        batches = self.prepare_batches(tool_calls, token) if self.batched else {}
+        for tool_call in tool_calls:
+            name = tool_call.function.name
+            if token is not None and token.cancelled:
+                yield tool_message(tool_call.id, name, cancelled_error(name), failed=True)
+            elif tool_call.id in batches:
+                yield batches[tool_call.id]()
+            elif name not in self.remote:
+                yield self.call(tool_call.id, name, tool_call.function.arguments, token)
+            elif tool_call.id in pending:
+                results = pending[tool_call.id]
+                content = results.get(tool_call.id, token)
+                yield tool_message(tool_call.id, name, content, failed=results.failed(tool_call.id))
+            else:
+                yield tool_message(tool_call.id, name, tool_error(
+                    "backend_unavailable", name, f"No backend named {self.remote[name]} is configured"
+                ), failed=True)
+
+    def interpret(self, response, token: Optional[CancellationToken] = None) -> List[Any]:
+        """
+        Interpret a chat completion response and execute its tool calls.
+
+        Arguments:
+            response: The OpenAI API response object
+            token: Cancels the tool calls that have not finished
+
+        Returns:
+            List of message dictionaries for the conversation
+        """
+        messages = []
+        try:
+            if not response.choices:
+                log.warning("No choices in response")
+                return messages
+
+            response_message = response.choices[0].message
+            messages.append(response_message)
+
+            tool_calls = getattr(response_message, 'tool_calls', None)
+            if not tool_calls:
+                log.debug("No tool calls in response")
+                return messages
+
+            # Fast path for the common single tool call
+            if len(tool_calls) == 1:
+                messages.append(self.call_tool(tool_calls[0], token))
+                return messages
+
+            messages.extend(self.iter_tool_messages(tool_calls, token))
+        except Exception as e:
+            log.error("Error interpreting response: %s", e)
+            messages.append({
+                "role": "tool",
+                "content": f"Error interpreting response: {str(e)}"
+            })
+        return messages
+
+
+_dispatcher_cache: "OrderedDict[tuple, ToolDispatcher]" = OrderedDict()
+_dispatcher_cache_lock = threading.Lock()
+
+
+def get_dispatcher(functions: Iterable[callable]) -> ToolDispatcher:
+    """
+    Get the dispatcher for a set of functions, building it on first use.
+
+    Arguments:
+        functions: The functions that may be called
+
+    Returns:
+        A cached ToolDispatcher for this exact sequence of functions
+    """
+    key = tuple(functions)
+    with _dispatcher_cache_lock:
+        dispatcher = _dispatcher_cache.get(key)
+        if dispatcher is not None:
+            _dispatcher_cache.move_to_end(key)
+            return dispatcher
+    dispatcher = ToolDispatcher(key)
+    with _dispatcher_cache_lock:
+        _dispatcher_cache[key] = dispatcher
+        if len(_dispatcher_cache) > DISPATCHER_CACHE_SIZE:
+            _dispatcher_cache.popitem(last=False)
+    return dispatcher
+
+
+def clear_dispatcher_cache() -> None:
+    """Drop all cached dispatchers, e.g. after changing tool options."""
+    with _dispatcher_cache_lock:
+        _dispatcher_cache.clear()
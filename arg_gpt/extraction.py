@@ -0,0 +1,171 @@
+"""
+Module for structured extraction: one completion that only fills a function's arguments.
+
+When a prompt exists only to fill the arguments of one known function, the general
+tool loop is unnecessary: there is no choice of tool to interpret and no second
+completion to summarize the result. ``extract`` forces the function with
+``tool_choice``, or asks for its parameters schema as a JSON ``response_format``,
+validates the arguments against the annotations, including simple types the tool
+loop passes through unchecked, and runs the function locally.
+"""
+
+import inspect
+import logging
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, List, NamedTuple, Optional, Sequence, Union
+
+from . import prompts
+from .cancellation import CancellationToken, inject_token, injected_parameters
+from .gpt_helpers import DEFAULT_MODEL, call_gpt_with_function, create_tools_dict
+from .json_repair import decode_arguments
+from .type_decoding import ArgumentValidationError, build_argument_decoder
+
+log = logging.getLogger(__name__)
+
+TOOL_CHOICE = "tool_choice"
+JSON_SCHEMA = "json_schema"
+
+
+class ExtractionError(ValueError):
+    """Raised when the model's answer cannot be read as the function's arguments."""
+
+
+class ExtractionResult(NamedTuple):
+    """The validated arguments, the function's return value and the raw response."""
+    arguments: Dict[str, Any]
+    value: Any
+    response: Any
+
+
+class _ExtractionSpec(NamedTuple):
+    tool: Dict[str, Any]
+    required: FrozenSet[str]
+    names: FrozenSet[str]
+    accepts_kwargs: bool
+    decode_args: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]]
+    injected: FrozenSet[str]
+
+
+@lru_cache(maxsize=256)
+def _extraction_spec(func: Callable) -> _ExtractionSpec:
+    tool = create_tools_dict([func])[0]
+    parameters = inspect.signature(func).parameters.values()
+    injected = injected_parameters(func)
+    return _ExtractionSpec(
+        tool=tool,
+        required=frozenset(tool["function"]["parameters"].get("required", [])),
+        names=frozenset(
+            p.name for p in parameters if p.kind not in (p.VAR_POSITIONAL, p.VAR_KEYWORD) and p.name not in injected
+        ),
+        accepts_kwargs=any(p.kind == p.VAR_KEYWORD for p in parameters),
+        decode_args=build_argument_decoder(func, strict=True),
+        injected=injected,
+    )
+
+
+def validate_arguments(func: Callable, arguments: Any) -> Dict[str, Any]:
+    """
+    Check and convert arguments produced for a function.
+
+    Arguments:
+        func: The function the arguments are for
+        arguments: The decoded JSON arguments
+
+    Returns:
+        The arguments converted to the function's annotated types
+
+    Raises:
+        ArgumentValidationError: If arguments are missing, unexpected or of the wrong type
+    """
+    spec = _extraction_spec(func)
+    if not isinstance(arguments, dict):
+        raise ArgumentValidationError(f"Expected an object, got {type(arguments).__name__}")
+    missing = spec.required.difference(arguments)
+    if missing:
+        raise ArgumentValidationError(f"Missing required arguments: {', '.join(sorted(missing))}")
+    if not spec.accepts_kwargs:
+        unexpected = set(arguments).difference(spec.names)
+        if unexpected:
+            raise ArgumentValidationError(f"Unexpected arguments: {', '.join(sorted(unexpected))}")
+    return spec.decode_args(arguments) if spec.decode_args is not None else arguments
+
+
+def extraction_request(func: Callable, mode: str = TOOL_CHOICE) -> Dict[str, Any]:
+    """
+    Build the request options forcing the model to produce a function's arguments.
+
+    Arguments:
+        func: The function whose arguments are extracted
+        mode: TOOL_CHOICE to force the tool, or JSON_SCHEMA for a JSON response format
+
+    Returns:
+        The ``tools_dict`` and extra options to pass to call_gpt_with_function
+    """
+    tool = _extraction_spec(func).tool
+    name = tool["function"]["name"]
+    if mode == TOOL_CHOICE:
+        return {"tools_dict": [tool], "tool_choice": {"type": "function", "function": {"name": name}}}
+    if mode == JSON_SCHEMA:
+        return {
+            "tools_dict": [],
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {"name": name, "schema": tool["function"]["parameters"]}
+            }
+        }
+    raise ValueError(f"Unknown extraction mode: {mode}")
+
+
+def _raw_arguments(response, func: Callable, mode: str) -> str:
+    if not response.choices:
+        raise ExtractionError("No choices in response")
+    message = response.choices[0].message
+    if mode == JSON_SCHEMA:
+        if not message.content:
+            raise ExtractionError("The response has no content")
+        return message.content
+    for tool_call in getattr(message, "tool_calls", None) or ():
+        if tool_call.function.name == func.__name__:
+            return tool_call.function.arguments
+    raise ExtractionError(f"The response does not call {func.__name__}")
+
+
+def extract(client, func: Callable, prompt: Union[str, Sequence[Dict[str, Any]]], model: str = DEFAULT_MODEL,
+            mode: str = TOOL_CHOICE, run: bool = True, rate_limiter=None, usage_tracker=None,
+            session_id: Optional[str] = None, token: Optional[CancellationToken] = None) -> ExtractionResult:
+    """
+    Extract a function's arguments from a prompt in one completion and run it locally.
+
+    Arguments:
+        client: The OpenAI compatible client
+        func: The function whose arguments are extracted
+        prompt: The user prompt, or the full list of messages
+        model: The model to use
+        mode: TOOL_CHOICE to force the tool, or JSON_SCHEMA for a JSON response format
+        run: Call the function with the arguments; otherwise the value is None
+        rate_limiter: Optional RateLimiter applied to the completion
+        usage_tracker: Optional UsageTracker recording the completion's usage
+        session_id: The conversation the completion belongs to, for usage accounting
+        token: Cancels the completion and is injected into CancellationToken parameters
+
+    Returns:
+        The ExtractionResult
+
+    Raises:
+        ExtractionError: If the answer is missing or not valid JSON
+        ArgumentValidationError: If the arguments don't match the function's parameters
+        CancellationError: If the token is cancelled before the completion is received
+    """
+    messages: List[Any] = prompts.user_prompt(prompt) if isinstance(prompt, str) else list(prompt)
+    response = call_gpt_with_function(
+        client, [func], messages, model=model, rate_limiter=rate_limiter, usage_tracker=usage_tracker,
+        session_id=session_id, token=token, **extraction_request(func, mode)
+    )
+    raw = _raw_arguments(response, func, mode)
+    try:
+        arguments = decode_arguments(raw)
+    except ValueError as e:
+        raise ExtractionError(f"Invalid JSON arguments - {e}") from None
+    arguments = validate_arguments(func, arguments)
+    value = func(**inject_token(arguments, _extraction_spec(func).injected, token)) if run else None
+    return ExtractionResult(arguments, value, response)
@@ -0,0 +1,220 @@
+"""
+Module for answering many independent prompts concurrently against one tool set.
+
+FanOut runs every prompt as its own turn of a shared ConversationRunner, so all turns
+reuse one client and connection pool, the cached tool dispatcher and the pre-serialized
+tools payload. At most ``max_concurrency`` turns run at a time: an asyncio semaphore
+bounds them and each turn runs on a thread of the fan-out's pool, because the client is
+synchronous. Results are returned in prompt order or as they complete, and throughput
+and latency statistics accumulate across runs.
+
+Every fan-out runs its turns with a child of the caller's token, cancelled when the
+fan-out stops, so turns that already started do not keep calling the model and running
+tools after a consumer of ``as_completed`` stops early. ``run`` and ``as_completed``
+are for synchronous code; coroutines use ``run_async`` and ``as_completed_async``.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+
+from .cancellation import CancellationToken
+from .conversation import ConversationRunner, result_text
+from .gpt_helpers import DEFAULT_MODEL
+from .tool_output import iterate_async, run_coroutine
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+class PromptResult(NamedTuple):
+    """The outcome of one prompt of a fan-out."""
+    index: int
+    prompt: str
+    messages: List[Any]
+    result: Optional[str]
+    error: Optional[BaseException]
+    latency: float
+
+    @property
+    def ok(self) -> bool:
+        """Whether the turn finished without an exception."""
+        return self.error is None
+
+
+@dataclass
+class FanOutStats:
+    """Aggregate statistics of a FanOut."""
+    prompts: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Prompts answered per second of fan-out wall time."""
+        return self.prompts / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        """Mean seconds per prompt."""
+        return self.total_latency / self.prompts if self.prompts else 0.0
+
+
+class FanOut:
+    """Runs many prompts concurrently with one ConversationRunner."""
+
+    def __init__(self, runner: ConversationRunner, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        """
+        Initialize the fan-out.
+
+        Arguments:
+            runner: The runner every prompt is run with
+            max_concurrency: Maximum number of turns in progress at a time
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.runner = runner
+        self.max_concurrency = max_concurrency
+        self.stats = FanOutStats()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency, thread_name_prefix="arg_gpt_fan_out"
+                )
+            return self._executor
+
+    def _record(self, result: PromptResult) -> None:
+        with self._lock:
+            self.stats.prompts += 1
+            self.stats.total_latency += result.latency
+            self.stats.max_latency = max(self.stats.max_latency, result.latency)
+            if result.error is not None:
+                self.stats.failed += 1
+
+    def _record_elapsed(self, elapsed: float) -> None:
+        with self._lock:
+            self.stats.elapsed += elapsed
+
+    def _turn(self, index: int, prompt: str, token: Optional[CancellationToken]) -> PromptResult:
+        started = time.perf_counter()
+        try:
+            messages = self.runner.run(prompt, token=token)
+        except Exception as e:
+            log.error("Prompt %d failed: %s", index, e)
+            result = PromptResult(index, prompt, [], None, e, time.perf_counter() - started)
+        else:
+            result = PromptResult(index, prompt, messages, result_text(messages), None, time.perf_counter() - started)
+        self._record(result)
+        return result
+
+    async def _run_one(self, semaphore: asyncio.Semaphore, index: int, prompt: str,
+                       token: Optional[CancellationToken]) -> PromptResult:
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), self._turn, index, prompt, token)
+
+    async def as_completed_async(self, prompts: Iterable[str],
+                                 token: Optional[CancellationToken] = None) -> AsyncIterator[PromptResult]:
+        """
+        Run prompts concurrently, yielding each result as soon as its turn finishes.
+
+        Arguments:
+            prompts: The independent prompts
+            token: Cancels every turn that has not finished
+
+        Yields:
+            One PromptResult per prompt, in completion order; ``index`` is the prompt's position
+        """
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        fan_token = token.child() if token is not None else CancellationToken()
+        tasks = [asyncio.ensure_future(self._run_one(semaphore, index, prompt, fan_token))
+                 for index, prompt in enumerate(prompts)]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            # Turns already running on the pool stop at their next cancellation check
+            fan_token.cancel("fan-out stopped")
+            for task in tasks:
+                task.cancel()
+            self._record_elapsed(time.perf_counter() - started)
+
+    async def run_async(self, prompts: Iterable[str], token: Optional[CancellationToken] = None) -> List[PromptResult]:
+        """
+        Run prompts concurrently and wait for all of them.
+
+        Arguments:
+            prompts: The independent prompts
+            token: Cancels every turn that has not finished
+
+        Returns:
+            One PromptResult per prompt, in prompt order
+        """
+        results: List[Optional[PromptResult]] = []
+        async for result in self.as_completed_async(prompts, token):
+            results.extend([None] * (result.index + 1 - len(results)))
+            results[result.index] = result
+        return results
+
+    def as_completed(self, prompts: Iterable[str], token: Optional[CancellationToken] = None) -> Iterator[PromptResult]:
+        """
+        Synchronous version of as_completed_async; closing the iterator stops the remaining turns.
+
+        Raises:
+            RuntimeError: If called inside a running event loop; use as_completed_async there
+        """
+        return iterate_async(self.as_completed_async(prompts, token))
+
+    def run(self, prompts: Iterable[str], token: Optional[CancellationToken] = None) -> List[PromptResult]:
+        """
+        Synchronous version of run_async.
+
+        Raises:
+            RuntimeError: If called inside a running event loop; await run_async there
+        """
+        return run_coroutine(self.run_async(prompts, token))
+
+    def close(self) -> None:
+        """Shut down the fan-out's threads."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def __enter__(self) -> "FanOut":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def fan_out(client, functions: Sequence[callable], prompts: Iterable[str], model: str = DEFAULT_MODEL,
+            max_concurrency: int = DEFAULT_MAX_CONCURRENCY, **options) -> List[PromptResult]:
+    """
+    Answer independent prompts concurrently with one client and tool set.
+
+    Arguments:
+        client: The OpenAI compatible client
+        functions: The functions exposed to the model
+        prompts: The prompts
+        model: The model to use
+        max_concurrency: Maximum number of turns in progress at a time
+        options: Further ConversationRunner arguments such as rate_limiter or usage_tracker
+
+    Returns:
+        One PromptResult per prompt, in prompt order
+    """
+    with FanOut(ConversationRunner(client, functions, model=model, **options), max_concurrency) as runner:
+        return runner.run(prompts)
@@ -6,13 +6,117 @@ signatures, docstrings, and type hints into structured data suitable for API doc
 or function schema generation.
 """
 
+import collections.abc
+import dataclasses
+import enum
 import inspect
 import re
 import typing
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Type, Union, get_args, get_origin
+from typing import Any, Dict, List, Literal, Optional, Type, Union, get_args, get_origin
+from .cancellation import is_token_type
 from .doc_string_helpers import DocstringParser
 
+try:
+    import pydantic
+except ImportError:  # pragma: no cover - optional dependency
+    pydantic = None
+
+try:
+    from types import UnionType
+except ImportError:  # pragma: no cover - Python < 3.10
+    UnionType = None
+
+def is_pydantic_model(type_hint: Any) -> bool:
+    """Check whether a type is a pydantic model class."""
+    return pydantic is not None and isinstance(type_hint, type) and issubclass(type_hint, pydantic.BaseModel)
+
+
+def is_typeddict(type_hint: Any) -> bool:
+    """Check whether a type is a TypedDict class."""
+    return (
+        isinstance(type_hint, type) and issubclass(type_hint, dict)
+        and hasattr(type_hint, "__annotations__") and hasattr(type_hint, "__total__")
+    )
+
+
+def is_enum(type_hint: Any) -> bool:
+    """Check whether a type is an Enum class."""
+    return isinstance(type_hint, type) and issubclass(type_hint, enum.Enum)
+
+
+def is_named_type(type_hint: Any) -> bool:
+    """Check whether a type is emitted once under $defs and referenced with $ref."""
+    return (
+        is_enum(type_hint) or is_typeddict(type_hint) or is_pydantic_model(type_hint)
+        or (isinstance(type_hint, type) and dataclasses.is_dataclass(type_hint))
+    )
+
+
+def to_json_value(value: Any) -> Any:
+    """Convert a default value such as an Enum member or dataclass to its JSON form."""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if pydantic is not None and isinstance(value, pydantic.BaseModel):
+        return value.model_dump() if hasattr(value, "model_dump") else value.dict()
+    return value
+
+
+def _literal_type(values: List[Any]) -> Optional[str]:
+    """Get the JSON type shared by all literal values, if any."""
+    types = {
+        "boolean" if isinstance(value, bool) else TypeTranslator.SIMPLE_TYPE_MAP.get(type(value))
+        for value in values
+    }
+    if types == {"integer", "number"}:
+        return "number"
+    return types.pop() if len(types) == 1 else None
+
+
+class SchemaDefinitions:
+    """Collects the named types of a schema so each one is defined once under $defs."""
+
+    def __init__(self):
+        self.schemas: Dict[str, Dict[str, Any]] = {}
+        self._names: Dict[Any, str] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.schemas)
+
+    def _unique_name(self, type_hint: Any) -> str:
+        name = getattr(type_hint, "__name__", "Model")
+        candidate, index = name, 2
+        while candidate in self.schemas:
+            candidate = f"{name}{index}"
+            index += 1
+        return candidate
+
+    def ref(self, type_hint: Any, build) -> Dict[str, str]:
+        """
+        Get a $ref to a named type, building its definition on first use.
+
+        Arguments:
+            type_hint: The named type
+            build: Callable producing the type's schema
+
+        Returns:
+            The $ref schema
+        """
+        name = self._names.get(type_hint)
+        if name is None:
+            name = self._unique_name(type_hint)
+            self._names[type_hint] = name
+            # Reserve the name first so recursive types refer back to it
+            self.schemas[name] = {}
+            self.schemas[name] = build()
+        return {"$ref": f"#/$defs/{name}"}
+
+    def add(self, name: str, schema: Dict[str, Any]) -> None:
+        """Add an externally built definition, e.g. a nested pydantic model."""
+        self.schemas.setdefault(name, schema)
+
+
 class TypeTranslator:
     """Translates Python types to API schema types."""
 
@@ -23,20 +127,29 @@ class TypeTranslator:
         bool: "boolean",
         list: "array",
         tuple: "array",
+        set: "array",
+        frozenset: "array",
         dict: "object",
         None: "null",
         type(None): "null",
         inspect.Signature.empty: "null"
     }
 
+    ARRAY_ORIGINS = (list, set, frozenset, collections.abc.Sequence, collections.abc.MutableSequence,
+                     collections.abc.Set, collections.abc.MutableSet, collections.abc.Iterable,
+                     collections.abc.Collection)
+    MAPPING_ORIGINS = (dict, collections.abc.Mapping, collections.abc.MutableMapping)
+
     @classmethod
-    def translate_recursive(cls, type_hint: Type, description: Optional[str] = None) -> Dict[str, Any]:
+    def translate_recursive(cls, type_hint: Type, description: Optional[str] = None,
+                            defs: Optional[SchemaDefinitions] = None) -> Dict[str, Any]:
         """
         Recursively translate a Python type hint into an API schema type definition.
         
         Arguments:
             type_hint: The Python type hint to translate
             description: Optional description of the type
+            defs: Collector for named types; they are referenced with $ref when given
             
         Returns:
             A dictionary containing the translated type information with nested structure
@@ -52,42 +165,64 @@ class TypeTranslator:
             result["type"] = cls.SIMPLE_TYPE_MAP[type_hint]
             return result
 
+        # Any accepts every value, so it adds no constraint
+        if type_hint is Any:
+            return result
+
+        if is_named_type(type_hint):
+            if defs is None:
+                result.update(cls.translate_named(type_hint, SchemaDefinitions()))
+            else:
+                result.update(defs.ref(type_hint, lambda: cls.translate_named(type_hint, defs)))
+            return result
+
         origin = get_origin(type_hint)
         if origin is None:
             result["type"] = cls.SIMPLE_TYPE_MAP.get(type_hint, "null")
             return result
 
+        # Handle Literal values as an enum
+        if origin is Literal:
+            values = [to_json_value(value) for value in get_args(type_hint)]
+            literal_type = _literal_type(values)
+            if literal_type:
+                result["type"] = literal_type
+            result["enum"] = values
+            return result
+
         # Handle Union types (including Optional)
-        if origin is Union:
+        if origin is Union or (UnionType is not None and origin is UnionType):
             args = get_args(type_hint)
             # Handle Optional[T] as a special case
             if len(args) == 2 and type(None) in args:
                 non_none_type = next(arg for arg in args if arg is not type(None))
-                result = cls.translate_recursive(non_none_type, description)
+                result = cls.translate_recursive(non_none_type, description, defs)
                 result["nullable"] = True
                 return result
             result["anyOf"] = [
-                cls.translate_recursive(arg)
+                cls.translate_recursive(arg, defs=defs)
                 for arg in args
             ]
             return result
 
         # Handle List types
-        if origin is list:
+        if origin in cls.ARRAY_ORIGINS:
             args = get_args(type_hint)
             item_type = args[0] if args else Any
             result["type"] = "array"
+            if origin in (set, frozenset, collections.abc.Set, collections.abc.MutableSet):
+                result["uniqueItems"] = True
             modified_desc = f"An array of {description}" if description else None
-            result["items"] = cls.translate_recursive(item_type, modified_desc)
+            result["items"] = cls.translate_recursive(item_type, modified_desc, defs)
             return result
 
         # Handle Dict types
-        if origin is dict:
+        if origin in cls.MAPPING_ORIGINS:
             args = get_args(type_hint)
             key_type, value_type = args if args else (Any, Any)
             result["type"] = "object"
             modified_desc = f"A dictionary of {description}" if description else None
-            result["additionalProperties"] = cls.translate_recursive(value_type, modified_desc)
+            result["additionalProperties"] = cls.translate_recursive(value_type, modified_desc, defs)
             return result
 
         # Handle other generic types
@@ -96,14 +231,69 @@ class TypeTranslator:
             args = get_args(type_hint)
             if args:
                 modified_desc = f"An instance of {description}" if description else None
-                result["items"] = cls.translate_recursive(args[0], modified_desc)
+                result["items"] = cls.translate_recursive(args[0], modified_desc, defs)
             return result
 
         result["type"] = "object"
         return result
 
     @classmethod
-    def translate(cls, type_hint: Type, description: Optional[str] = None) -> Dict[str, Any]:
+    def translate_named(cls, type_hint: Type, defs: SchemaDefinitions) -> Dict[str, Any]:
+        """
+        Translate the definition of a named type: an Enum, dataclass, TypedDict or pydantic model.
+        
+        Arguments:
+            type_hint: The named type
+            defs: Collector for nested named types
+            
+        Returns:
+            The schema of the type itself
+        """
+        doc = inspect.getdoc(type_hint)
+        if is_enum(type_hint):
+            values = [to_json_value(member) for member in type_hint]
+            result = {"enum": values}
+            literal_type = _literal_type(values)
+            if literal_type:
+                result["type"] = literal_type
+            return result
+
+        if is_pydantic_model(type_hint):
+            if hasattr(type_hint, "model_json_schema"):
+                schema = type_hint.model_json_schema(ref_template="#/$defs/{model}")
+            else:  # pragma: no cover - pydantic v1
+                schema = type_hint.schema(ref_template="#/$defs/{model}")
+            for name, nested in {**schema.pop("definitions", {}), **schema.pop("$defs", {})}.items():
+                defs.add(name, nested)
+            return schema
+
+        hints = typing.get_type_hints(type_hint)
+        result = {"type": "object", "properties": {}, "required": []}
+        if doc and not doc.startswith(f"{type_hint.__name__}("):
+            result["description"] = doc
+        if dataclasses.is_dataclass(type_hint):
+            for field in dataclasses.fields(type_hint):
+                if not field.init:
+                    continue
+                prop = cls.translate_recursive(hints.get(field.name, Any), defs=defs)
+                if field.default is not dataclasses.MISSING:
+                    prop["default"] = to_json_value(field.default)
+                elif field.default_factory is dataclasses.MISSING:
+                    result["required"].append(field.name)
+                result["properties"][field.name] = prop
+            return result
+
+        # TypedDict
+        required_keys = getattr(type_hint, "__required_keys__", hints.keys() if type_hint.__total__ else ())
+        for name, hint in hints.items():
+            result["properties"][name] = cls.translate_recursive(hint, defs=defs)
+            if name in required_keys:
+                result["required"].append(name)
+        return result
+
+    @classmethod
+    def translate(cls, type_hint: Type, description: Optional[str] = None,
+                  defs: Optional[SchemaDefinitions] = None) -> Dict[str, Any]:
         """
         Translate a Python type hint into an API schema type definition.
         This is the main entry point that wraps the recursive translation.
@@ -111,11 +301,19 @@ class TypeTranslator:
         Arguments:
             type_hint: The Python type hint to translate
             description: Optional description of the type
+            defs: Shared collector for named types; when omitted, any definitions
+                are attached to the result under $defs
             
         Returns:
             A dictionary containing the translated type information
         """
-        return cls.translate_recursive(type_hint, description)
+        if defs is not None:
+            return cls.translate_recursive(type_hint, description, defs)
+        local_defs = SchemaDefinitions()
+        result = cls.translate_recursive(type_hint, description, local_defs)
+        if local_defs:
+            result["$defs"] = local_defs.schemas
+        return result
 
 class FunctionInspector:
     """Inspects Python functions and extracts their metadata."""
@@ -128,6 +326,11 @@ class FunctionInspector:
         self.signature = inspect.signature(func)
         self.docstring = inspect.getdoc(func) or ""
         self.doc_sections = DocstringParser.parse(self.docstring)
+        try:
+            # Resolves string annotations, e.g. from ``from __future__ import annotations``
+            self.type_hints = typing.get_type_hints(func)
+        except Exception:
+            self.type_hints = {}
 
     def get_description(self) -> str:
         """Extract the function's description from its docstring."""
@@ -148,23 +351,29 @@ class FunctionInspector:
             if name in ["Arguments", "Args", "Parameters"]
         ), None)
 
+        defs = SchemaDefinitions()
         param_descriptions = {}
         if args_section:
             param_matches = re.findall(r'(\w+):\s*(.+?)(?=\w+:|$)', args_section.content, re.DOTALL)
             param_descriptions = {name.strip(): desc.strip() for name, desc in param_matches}
 
         for name, param in self.signature.parameters.items():
+            # The dispatcher injects the turn's CancellationToken; the model never sees it
+            if is_token_type(self.type_hints.get(name, param.annotation)):
+                continue
             if param.default is inspect.Parameter.empty:
                 parameters["required"].append(name)
 
             description = param_descriptions.get(name)
-            param_info = TypeTranslator.translate(param.annotation, description)
+            param_info = TypeTranslator.translate(self.type_hints.get(name, param.annotation), description, defs)
 
             if param.default is not inspect.Parameter.empty:
-                param_info["default"] = param.default
+                param_info["default"] = to_json_value(param.default)
 
             parameters["properties"][name] = param_info
 
+        if defs:
+            parameters["$defs"] = defs.schemas
         return parameters
 
     def get_return_info(self) -> Optional[Dict[str, Any]]:
@@ -177,7 +386,7 @@ class FunctionInspector:
                 if name in ["Returns", "Return"]
             ), None)
             description = return_section.content if return_section else None
-            return TypeTranslator.translate(return_annotation, description)
+            return TypeTranslator.translate(self.type_hints.get("return", return_annotation), description)
         return None
 
     def to_gpt_dict(self) -> Dict[str, Any]:
@@ -4,9 +4,14 @@ import inspect
 import json
 from typing import List, Dict, Any
 from .gpt_function_reflection import doc_to_gpt_dict
+from .dispatcher import ToolDispatcher, get_dispatcher
+from .messages import to_payloads
+from .rate_limit import estimate_request_tokens
 
 log = logging.getLogger(__name__)
 
+DEFAULT_MODEL = "gpt-3.5-turbo-1106"
+
 def create_tools_dict(functions):
     tools_dict = []
     for func in functions:
@@ -25,16 +30,46 @@ def create_tools_dict(functions):
         tools_dict.append(tool)
     return tools_dict
 
-def call_gpt_with_function(client, functions, messages, model="gpt-3.5-turbo-1106"):
-    # convert list of functions to list of dicts
-    tools_dict = create_tools_dict(functions)
+def call_gpt_with_function(client, functions, messages, model=DEFAULT_MODEL, rate_limiter=None,
+                           tools_dict=None, usage_tracker=None, session_id=None, token=None, **request_options):
+    # A cancelled turn never sends the request
+    if token is not None:
+        token.raise_if_cancelled()
+
+    # convert list of functions to list of dicts, unless a prebuilt payload was given
+    if tools_dict is None:
+        tools_dict = create_tools_dict(functions)
+
+    # Compact Message instances are only converted to payload dicts here
+    messages = to_payloads(messages)
+
+    # Extra options such as tool_choice or response_format are passed through to the API
+    request = {"model": model, "messages": messages, "max_tokens": 500, **request_options}
+    if tools_dict:
+        request["tools"] = tools_dict
+
+    def create():
+        # The SDK's per-request timeout bounds the completion by what is left of the turn's
+        # deadline, so it is computed after any wait for rate limit capacity
+        if token is not None and token.deadline is not None and "timeout" not in request_options:
+            request["timeout"] = token.remaining()
+        return client.chat.completions.create(**request)
 
-    response = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        tools=tools_dict,
-        max_tokens=500
-    )
+    if rate_limiter is None:
+        response = create()
+    else:
+        estimated_tokens = estimate_request_tokens(messages, tools_dict, max_tokens=request["max_tokens"])
+        with rate_limiter.limit(estimated_tokens, token) as reservation:
+            response = create()
+            total_tokens = getattr(getattr(response, "usage", None), "total_tokens", None)
+            if isinstance(total_tokens, int):
+                reservation.settle(total_tokens)
+
+    if usage_tracker is not None and not request.get("stream"):
+        usage_tracker.record_response(model, response, tools_dict, session_id)
+    if token is not None and not request.get("stream"):
+        # Cancelled while waiting for the completion: its tool calls must not run
+        token.raise_if_cancelled()
     return response
 
 def interpret_response(response, functions) -> List[Dict[str, Any]]:
@@ -43,97 +78,10 @@ def interpret_response(response, functions) -> List[Dict[str, Any]]:
     
     Arguments:
         response: The OpenAI API response object
-        functions: List of available functions that can be called
+        functions: List of available functions that can be called, or a prebuilt ToolDispatcher
         
     Returns:
         List of message dictionaries for the conversation
     """
-    # Create function lookup dictionary
-    func_dict = {func.__name__: func for func in functions}
-    messages = []
-    
-    try:
-        # Get the response message from the first choice
-        if not response.choices:
-            log.warning("No choices in response")
-            return messages
-            
-        response_message = response.choices[0].message
-        log.info("Processing response message: %s", response_message)
-        
-        # Always append the response message
-        messages.append(response_message)
-        
-        # Check if there are any tool calls
-        tool_calls = getattr(response_message, 'tool_calls', None)
-        if not tool_calls:
-            log.info("No tool calls in response")
-            return messages
-            
-        # Process each tool call
-        for tool_call in tool_calls:
-            try:
-                # Get function details
-                function_name = tool_call.function.name
-                log.info("Processing function call: %s", function_name)
-                
-                # Look up the function
-                function_to_call = func_dict.get(function_name)
-                if function_to_call is None:
-                    log.warning("Unknown function name: %s", function_name)
-                    messages.append({
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "name": function_name,
-                        "content": f"Error: Unknown function '{function_name}'"
-                    })
-                    continue
-                
-                # Parse arguments
-                try:
-                    function_args = json.loads(tool_call.function.arguments)
-                except json.JSONDecodeError as e:
-                    log.error("Failed to parse function arguments: %s", e)
-                    messages.append({
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "name": function_name,
-                        "content": f"Error: Invalid function arguments - {str(e)}"
-                    })
-                    continue
-                
-                # Execute function
-                try:
-                    log.info("Executing %s with args: %s", function_name, function_args)
-                    function_response = function_to_call(**function_args)
-                    # Convert response to string, handle None case
-                    response_content = str(function_response) if function_response is not None else "Function executed successfully"
-                except Exception as e:
-                    log.error("Function execution failed: %s", e)
-                    response_content = f"Error executing function: {str(e)}"
-                
-                # Append the result
-                messages.append({
-                    "tool_call_id": tool_call.id,
-                    "role": "tool",
-                    "name": function_name,
-                    "content": response_content
-                })
-                
-            except Exception as e:
-                log.error("Error processing tool call: %s", e)
-                messages.append({
-                    "tool_call_id": getattr(tool_call, 'id', 'unknown'),
-                    "role": "tool",
-                    "name": getattr(tool_call, 'function.name', 'unknown'),
-                    "content": f"Error processing tool call: {str(e)}"
-                })
-                
-    except Exception as e:
-        log.error("Error interpreting response: %s", e)
-        messages.append({
-            "role": "tool",
-            "content": f"Error interpreting response: {str(e)}"
-        })
-    
-    return messages
+    dispatcher = functions if isinstance(functions, ToolDispatcher) else get_dispatcher(functions)
+    return dispatcher.interpret(response)
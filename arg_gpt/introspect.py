@@ -0,0 +1,194 @@
+"""
+Module for inspecting the tool registry before deploying it.
+
+Loads a module that registers ``@ai_func`` tools and reports, per tool, the size of its
+schema in the tools payload in bytes and estimated tokens, the time spent reflecting
+its signature and docstring into that schema, and warnings about schemas the model is
+likely to misuse: missing descriptions and ``"null"`` types, which TypeTranslator emits
+for parameters without a usable annotation. The payload itself can be dumped exactly
+as it is sent.
+
+Usage:
+    arg-gpt-tools list examples.example_functions
+    arg-gpt-tools payload examples.example_functions --output tools.json
+"""
+
+import importlib
+import json
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+import typer
+
+from .ai_func import get_ai_functions
+from .gpt_function_reflection import doc_to_gpt_dict
+from .prompt_prefix import PromptAssembler
+from .token_estimation import estimate_json_tokens
+
+NO_DESCRIPTION = "No description available."
+
+SORT_KEYS = {
+    "name": lambda report: report.name,
+    "bytes": lambda report: -report.schema_bytes,
+    "tokens": lambda report: -report.schema_tokens,
+    "time": lambda report: -report.reflection_seconds,
+}
+
+
+@dataclass
+class ToolReport:
+    """Size, reflection time and warnings of one tool's schema."""
+    name: str
+    schema_bytes: int
+    schema_tokens: int
+    reflection_seconds: float
+    warnings: List[str] = field(default_factory=list)
+
+
+def _null_types(schema: Any, path: str) -> Iterable[str]:
+    if isinstance(schema, dict):
+        if schema.get("type") == "null":
+            yield path
+        for key, value in schema.items():
+            yield from _null_types(value, f"{path}.{key}")
+    elif isinstance(schema, list):
+        for index, value in enumerate(schema):
+            yield from _null_types(value, f"{path}[{index}]")
+
+
+def schema_warnings(tool: Dict[str, Any]) -> List[str]:
+    """
+    Find likely problems in a tool's schema.
+
+    Arguments:
+        tool: The tool's entry of the tools payload
+
+    Returns:
+        Human readable warnings, empty if the schema looks fine
+    """
+    function = tool.get("function", {})
+    warnings = []
+    if function.get("description", NO_DESCRIPTION) == NO_DESCRIPTION:
+        warnings.append("missing description")
+    properties = function.get("parameters", {}).get("properties", {})
+    for name, schema in properties.items():
+        if "description" not in schema:
+            warnings.append(f"parameter '{name}' has no description")
+    for path in _null_types(function.get("parameters", {}), "parameters"):
+        warnings.append(f"{path} has type null, is an annotation missing?")
+    return warnings
+
+
+def reflection_time(func: callable, repeat: int = 3) -> float:
+    """Best of ``repeat`` timings, in seconds, of reflecting a function into its schema."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        doc_to_gpt_dict(func)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def profile_tools(functions: Iterable[callable], assembler: Optional[PromptAssembler] = None,
+                  repeat: int = 3) -> List[ToolReport]:
+    """
+    Profile the schemas of a tool set.
+
+    Arguments:
+        functions: The functions exposed to the model
+        assembler: Assembler building the payload as it is sent; a default one if omitted
+        repeat: Reflections timed per function
+
+    Returns:
+        One report per tool, in payload order
+    """
+    functions = list(functions)
+    by_name = {func.__name__: func for func in functions}
+    tools = (assembler or PromptAssembler()).prefix(functions).tools
+    reports = []
+    for tool in tools:
+        name = tool["function"]["name"]
+        reports.append(ToolReport(
+            name=name,
+            schema_bytes=len(json.dumps(tool, separators=(",", ":"), ensure_ascii=False).encode("utf-8")),
+            schema_tokens=estimate_json_tokens(tool),
+            reflection_seconds=reflection_time(by_name[name], repeat),
+            warnings=schema_warnings(tool),
+        ))
+    return reports
+
+
+def load_registry(module: str) -> List[callable]:
+    """
+    Import a module registering ``@ai_func`` tools and get the registered functions.
+
+    Arguments:
+        module: Dotted module name, importable from the current directory
+
+    Returns:
+        The registered functions
+    """
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    importlib.import_module(module)
+    return get_ai_functions()
+
+
+def format_reports(reports: List[ToolReport]) -> str:
+    """Render reports as a table followed by totals and warnings."""
+    width = max([len(report.name) for report in reports] + [4])
+    lines = [f"{'tool':<{width}}  {'bytes':>7}  {'tokens':>6}  {'reflect ms':>10}  warnings"]
+    for report in reports:
+        lines.append(
+            f"{report.name:<{width}}  {report.schema_bytes:>7}  {report.schema_tokens:>6}  "
+            f"{report.reflection_seconds * 1000:>10.2f}  {len(report.warnings)}"
+        )
+    lines.append(
+        f"{'total':<{width}}  {sum(r.schema_bytes for r in reports):>7}  "
+        f"{sum(r.schema_tokens for r in reports):>6}  "
+        f"{sum(r.reflection_seconds for r in reports) * 1000:>10.2f}  {sum(len(r.warnings) for r in reports)}"
+    )
+    for report in reports:
+        for warning in report.warnings:
+            lines.append(f"warning: {report.name}: {warning}")
+    return "\n".join(lines)
+
+
+app = typer.Typer(help="Inspect the tools registered with @ai_func.")
+
+
+@app.command("list")
+def list_tools(module: str, sort: str = typer.Option("bytes", help="name, bytes, tokens or time"),
+               as_json: bool = typer.Option(False, "--json", help="Print the reports as JSON"),
+               deduplicate: bool = typer.Option(False, help="Measure the payload with shared $defs")):
+    """List the registered tools with schema sizes, reflection time and warnings."""
+    if sort not in SORT_KEYS:
+        raise typer.BadParameter(f"Expected one of {', '.join(SORT_KEYS)}", param_hint="--sort")
+    reports = profile_tools(load_registry(module), PromptAssembler(deduplicate=deduplicate))
+    reports.sort(key=SORT_KEYS[sort])
+    if as_json:
+        typer.echo(json.dumps([asdict(report) for report in reports], indent=2))
+    else:
+        typer.echo(format_reports(reports))
+
+
+@app.command("payload")
+def dump_payload(module: str, output: Optional[str] = typer.Option(None, help="Write to this file"),
+                 deduplicate: bool = typer.Option(False, help="Hoist shared subschemas into $defs"),
+                 messages: bool = typer.Option(False, help="Include the system messages of the prefix")):
+    """Dump the tools payload exactly as it is sent with every request."""
+    prefix = PromptAssembler(deduplicate=deduplicate).prefix(load_registry(module))
+    text = prefix.serialized if messages else json.dumps(prefix.tools, separators=(",", ":"), ensure_ascii=False)
+    if output is None:
+        typer.echo(text)
+    else:
+        with open(output, "w", encoding="utf-8") as file:
+            file.write(text)
+        typer.echo(f"Wrote {len(text.encode('utf-8'))} bytes, fingerprint {prefix.fingerprint}", err=True)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,265 @@
+"""
+Module for decoding tool call arguments quickly and repairing common malformations.
+
+Arguments are decoded with ``orjson`` when it is installed. When decoding fails, a
+single bounded pass fixes what models typically get wrong: markdown code fences,
+single-quoted strings, Python literals, trailing commas and output cut off at
+``max_tokens`` right after a complete value, where only the closing brackets are
+missing. Repairs never change what the arguments mean: output cut off inside a
+string, number or member is rejected, because the tool would otherwise run on a
+value the model never finished. Every repair saves a round trip asking the model to
+try again, so repairs are counted by kind.
+"""
+
+import json
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+# Inputs longer than this are not repaired
+MAX_REPAIR_CHARS = 64 * 1024
+
+CODE_FENCE = "code_fence"
+SINGLE_QUOTES = "single_quotes"
+PYTHON_LITERAL = "python_literal"
+TRAILING_COMMA = "trailing_comma"
+INVALID_ESCAPE = "invalid_escape"
+TRUNCATED = "truncated"
+
+_FENCE = re.compile(r"^```[a-zA-Z]*\s*\n?(.*?)\n?```$", re.DOTALL)
+_LITERALS = {"true": "true", "false": "false", "null": "null", "True": "true", "False": "false", "None": "null"}
+_ESCAPES = set('"\\/bfnrtu')
+
+
+def fast_loads(text: str) -> Any:
+    """Decode JSON with orjson if available, raising ValueError on invalid input."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+@dataclass
+class RepairStats:
+    """Counts of decoded, repaired and unrepairable argument strings."""
+    decoded: int = 0
+    repaired: int = 0
+    failed: int = 0
+    kinds: Dict[str, int] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    def record(self, repairs: Optional[List[str]] = None, failed: bool = False) -> None:
+        """Count one decoded argument string and the repairs it needed."""
+        if not repairs and not failed:
+            # The common case skips the lock; a rare lost update only skews the total
+            self.decoded += 1
+            return
+        with self._lock:
+            if failed:
+                self.failed += 1
+                return
+            self.decoded += 1
+            self.repaired += 1
+            for kind in repairs:
+                self.kinds[kind] = self.kinds.get(kind, 0) + 1
+
+
+# Process-wide counters used by the dispatcher
+repair_stats = RepairStats()
+
+
+class _Container:
+    __slots__ = ("close", "expect")
+
+    def __init__(self, close: str):
+        self.close = close
+        self.expect = "key" if close == "}" else "value"
+
+
+def _read_string(text: str, start: int, repairs: set) -> Tuple[str, int, bool]:
+    """Read a quoted string starting at ``start``, returning it double-quoted."""
+    quote = text[start]
+    if quote == "'":
+        repairs.add(SINGLE_QUOTES)
+    pieces = ['"']
+    index = start + 1
+    length = len(text)
+    while index < length:
+        char = text[index]
+        if char == quote:
+            pieces.append('"')
+            return "".join(pieces), index + 1, True
+        if char == "\\":
+            if index + 1 >= length:
+                break
+            escaped = text[index + 1]
+            if escaped in _ESCAPES:
+                pieces.append(text[index:index + 2])
+            else:
+                # e.g. \' is valid in Python but not in JSON
+                repairs.add(INVALID_ESCAPE)
+                pieces.append(escaped)
+            index += 2
+            continue
+        if char == '"':
+            pieces.append('\\"')
+        elif char == "\n":
+            pieces.append("\\n")
+        else:
+            pieces.append(char)
+        index += 1
+    pieces.append('"')
+    return "".join(pieces), length, False
+
+
+def _drop_trailing_comma(out: List[str], repairs: set) -> None:
+    index = len(out) - 1
+    while index >= 0 and out[index].isspace():
+        index -= 1
+    if index >= 0 and out[index] == ",":
+        del out[index:]
+        repairs.add(TRAILING_COMMA)
+
+
+def repair_json(text: str) -> Tuple[Any, List[str]]:
+    """
+    Repair and decode a malformed JSON document.
+
+    Arguments:
+        text: The malformed JSON
+
+    Returns:
+        The decoded value and the kinds of repairs that were applied
+
+    Raises:
+        ValueError: If the input is too long, was cut off inside a value or cannot be repaired
+    """
+    if len(text) > MAX_REPAIR_CHARS:
+        raise ValueError(f"Input of {len(text)} characters is too long to repair")
+    repairs: set = set()
+    text = text.strip()
+    fenced = _FENCE.match(text)
+    if fenced:
+        text = fenced.group(1).strip()
+        repairs.add(CODE_FENCE)
+
+    out: List[str] = []
+    stack: List[_Container] = []
+
+    def value_done():
+        if stack:
+            stack[-1].expect = "comma"
+
+    index = 0
+    length = len(text)
+    while index < length:
+        char = text[index]
+        if char in "\"'":
+            string, index, closed = _read_string(text, index, repairs)
+            if not closed:
+                raise ValueError("Could not repair JSON - cut off inside a string")
+            out.append(string)
+            if stack and stack[-1].expect == "key":
+                stack[-1].expect = "colon"
+            else:
+                value_done()
+            continue
+        if char in "{[":
+            out.append(char)
+            stack.append(_Container("}" if char == "{" else "]"))
+        elif char in "}]":
+            _drop_trailing_comma(out, repairs)
+            if stack and stack[-1].close == char:
+                stack.pop()
+            out.append(char)
+            value_done()
+        elif char == ":":
+            out.append(char)
+            if stack:
+                stack[-1].expect = "value"
+        elif char == ",":
+            out.append(char)
+            if stack:
+                stack[-1].expect = "key" if stack[-1].close == "}" else "value"
+        elif char.isalnum() or char in "-+.":
+            end = index
+            while end < length and (text[end].isalnum() or text[end] in "-+._"):
+                end += 1
+            word = text[index:end]
+            if word in _LITERALS:
+                if _LITERALS[word] != word:
+                    repairs.add(PYTHON_LITERAL)
+                out.append(_LITERALS[word])
+                value_done()
+            elif end == length and stack:
+                # A number at the very end may be missing digits, e.g. 25 of 250
+                raise ValueError(f"Could not repair JSON - cut off inside {word!r}")
+            else:
+                # Invalid words in the middle are left for the decoder to reject
+                out.append(word)
+                value_done()
+            index = end
+            continue
+        else:
+            out.append(char)
+        index += 1
+
+    if stack:
+        repairs.add(TRUNCATED)
+    while stack:
+        container = stack.pop()
+        if container.expect != "comma":
+            # An empty container, a key without a value or a comma announcing another member
+            raise ValueError("Could not repair JSON - cut off inside a member")
+        out.append(container.close)
+        value_done()
+
+    repaired = "".join(out)
+    try:
+        value = json.loads(repaired)
+    except ValueError as e:
+        raise ValueError(f"Could not repair JSON - {e}") from None
+    return value, sorted(repairs)
+
+
+def decode_arguments(text: str, stats: Optional[RepairStats] = repair_stats, repair: bool = True) -> Any:
+    """
+    Decode tool call arguments, repairing them if they are malformed.
+
+    Arguments:
+        text: The JSON arguments from the model
+        stats: Counters to update; the process-wide repair_stats by default
+        repair: Attempt a repair when strict decoding fails
+
+    Returns:
+        The decoded arguments
+
+    Raises:
+        ValueError: If the arguments are invalid and cannot be repaired
+    """
+    try:
+        value = fast_loads(text)
+    except (ValueError, TypeError):
+        if not repair or not isinstance(text, str):
+            if stats is not None:
+                stats.record(failed=True)
+            raise
+        try:
+            value, repairs = repair_json(text)
+        except ValueError:
+            if stats is not None:
+                stats.record(failed=True)
+            raise
+        if stats is not None:
+            stats.record(repairs)
+        return value
+    if stats is not None:
+        stats.record()
+    return value
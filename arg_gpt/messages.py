@@ -0,0 +1,183 @@
+"""
+Module for a compact in-memory representation of conversation messages.
+
+A process holding many idle sessions mostly holds their messages. Provider payload
+dicts and SDK ``ChatCompletionMessage`` objects each carry a per-instance dict, and an
+assistant message's tool calls add two more dicts per call. Message keeps the same
+fields in ``__slots__``, interns roles and function names, and shares one instance per
+distinct system prompt between all sessions. Messages are converted from payloads when
+they are stored and back only when a request or a load needs them.
+
+This module only uses the standard library, so light entry points can import it.
+"""
+
+import sys
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Number of distinct system prompts whose shared Message instances are kept
+SYSTEM_MESSAGE_CACHE_SIZE = 256
+
+_FIELDS = ("role", "content", "name", "tool_call_id", "tool_calls")
+
+
+class FunctionCall:
+    """The function name and JSON arguments of a tool call."""
+    __slots__ = ("name", "arguments")
+
+    def __init__(self, name: str, arguments: str):
+        self.name = sys.intern(name) if isinstance(name, str) else name
+        self.arguments = arguments
+
+
+class ToolCall:
+    """Lightweight tool call with the attributes of the SDK's tool call objects."""
+    __slots__ = ("id", "function")
+
+    def __init__(self, tool_call_id: str, name: str, arguments: str):
+        self.id = tool_call_id
+        self.function = FunctionCall(name, arguments)
+
+    @classmethod
+    def from_payload(cls, tool_call: Any) -> "ToolCall":
+        """Build a tool call from its payload dict or an SDK tool call object."""
+        if isinstance(tool_call, ToolCall):
+            return tool_call
+        if isinstance(tool_call, dict):
+            function = tool_call.get("function") or {}
+            return cls(tool_call.get("id"), function.get("name"), function.get("arguments"))
+        return cls(tool_call.id, tool_call.function.name, tool_call.function.arguments)
+
+    def to_payload(self) -> Dict[str, Any]:
+        """Convert to the provider payload of an assistant message's tool call."""
+        return {
+            "id": self.id,
+            "type": "function",
+            "function": {"name": self.function.name, "arguments": self.function.arguments}
+        }
+
+
+class Message:
+    """
+    A conversation message stored in slots.
+
+    Fields other than the role, content, name, tool call id and tool calls are kept in
+    ``extra``, which is None for almost every message.
+    """
+    __slots__ = _FIELDS + ("extra",)
+
+    def __init__(self, role: str, content: Optional[str] = None, name: Optional[str] = None,
+                 tool_call_id: Optional[str] = None, tool_calls: Optional[Tuple[ToolCall, ...]] = None,
+                 extra: Optional[Dict[str, Any]] = None):
+        self.role = sys.intern(role)
+        self.content = content
+        self.name = sys.intern(name) if name is not None else None
+        self.tool_call_id = tool_call_id
+        self.tool_calls = tool_calls or None
+        self.extra = extra or None
+
+    @classmethod
+    def from_payload(cls, message: Any) -> "Message":
+        """
+        Build a message from a provider payload dict or an SDK message object.
+
+        System messages without extra fields return the shared instance of their prompt.
+
+        Arguments:
+            message: A message dict, SDK message object or Message
+
+        Returns:
+            The compact message
+        """
+        if isinstance(message, Message):
+            return message
+        if not isinstance(message, dict):
+            if hasattr(message, "model_dump"):
+                message = message.model_dump(exclude_none=True)
+            else:
+                message = {key: value for key, value in vars(message).items()
+                           if not key.startswith("_") and value is not None}
+        role = message.get("role")
+        content = message.get("content")
+        extra = {key: value for key, value in message.items() if key not in _FIELDS and value is not None}
+        if role == "system" and not extra and len(message) <= 2 and isinstance(content, str):
+            return system_message(content)
+        tool_calls = message.get("tool_calls")
+        return cls(
+            role,
+            content,
+            message.get("name"),
+            message.get("tool_call_id"),
+            tuple(ToolCall.from_payload(tool_call) for tool_call in tool_calls) if tool_calls else None,
+            extra
+        )
+
+    def to_payload(self) -> Dict[str, Any]:
+        """Convert to a new provider payload dict, leaving out unset fields."""
+        payload: Dict[str, Any] = {"role": self.role}
+        if self.tool_call_id is not None:
+            payload["tool_call_id"] = self.tool_call_id
+        if self.name is not None:
+            payload["name"] = self.name
+        if self.content is not None or self.tool_calls is None:
+            payload["content"] = self.content
+        if self.tool_calls is not None:
+            payload["tool_calls"] = [tool_call.to_payload() for tool_call in self.tool_calls]
+        if self.extra is not None:
+            payload.update(self.extra)
+        return payload
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a payload field, like ``dict.get`` on the payload."""
+        if key in _FIELDS:
+            value = getattr(self, key)
+            if key == "tool_calls" and value is not None:
+                return [tool_call.to_payload() for tool_call in value]
+            return default if value is None else value
+        return self.extra.get(key, default) if self.extra is not None else default
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, Message):
+            return self.to_payload() == other.to_payload()
+        if isinstance(other, dict):
+            return self.to_payload() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"Message({self.to_payload()!r})"
+
+
+@lru_cache(maxsize=SYSTEM_MESSAGE_CACHE_SIZE)
+def system_message(content: str) -> Message:
+    """
+    Get the shared Message of a system prompt.
+
+    Arguments:
+        content: The system prompt
+
+    Returns:
+        One instance per prompt; it is shared and must not be mutated
+    """
+    return Message("system", content)
+
+
+def to_messages(messages: Sequence[Any]) -> List[Message]:
+    """Convert payload dicts and SDK message objects into compact messages."""
+    return [Message.from_payload(message) for message in messages]
+
+
+def to_payloads(messages: Sequence[Any]) -> Sequence[Any]:
+    """
+    Convert the compact messages of a request into payload dicts.
+
+    Arguments:
+        messages: Message instances mixed with payload dicts or SDK objects
+
+    Returns:
+        The input itself when it holds no Message, so plain requests are not copied
+    """
+    if not any(isinstance(message, Message) for message in messages):
+        return messages
+    return [message.to_payload() if isinstance(message, Message) else message for message in messages]
@@ -0,0 +1,486 @@
+"""
+Module providing a local stand-in for an OpenAI compatible chat completions API.
+
+MockLLM answers chat completion requests from a script of replies (text, tool calls or
+errors), or by calling the first offered tool with placeholder arguments, after a
+configurable latency and with optional error injection. It can be used in-process
+through MockClient, which has the ``client.chat.completions.create`` interface of the
+SDK, or over HTTP through MockServer, so ``openai.OpenAI(base_url=server.url)`` works
+unchanged. RecordingClient captures real sessions to a JSON lines file that
+``MockScript.from_recording`` replays.
+
+This makes it possible to load-test ``call_gpt_with_function`` and ``interpret_response``
+without an API key and to measure the library's own overhead in isolation.
+"""
+
+import hashlib
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from .rate_limit import estimate_request_tokens
+from .session_store import serialize_message
+from .token_estimation import estimate_tokens
+
+# Size of the argument fragments in streamed tool calls
+STREAM_ARGUMENT_CHUNK = 8
+
+LatencyModel = Callable[[], float]
+
+
+def constant_latency(seconds: float) -> LatencyModel:
+    """Latency model always returning the same delay."""
+    return lambda: seconds
+
+
+def uniform_latency(low: float, high: float, seed: Optional[int] = None) -> LatencyModel:
+    """Latency model drawing delays uniformly between two bounds."""
+    rng = random.Random(seed)
+    return lambda: rng.uniform(low, high)
+
+
+def lognormal_latency(median: float, sigma: float = 0.5, seed: Optional[int] = None) -> LatencyModel:
+    """Latency model with a long tail, like real completion latencies."""
+    rng = random.Random(seed)
+    mu = math.log(median)
+    return lambda: rng.lognormvariate(mu, sigma)
+
+
+def sampled_latency(samples: Sequence[float], seed: Optional[int] = None) -> LatencyModel:
+    """Latency model replaying delays drawn from measured samples."""
+    rng = random.Random(seed)
+    samples = list(samples)
+    return lambda: rng.choice(samples)
+
+
+class MockAPIError(Exception):
+    """Injected provider error raised by MockClient."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ScriptedReply:
+    """One scripted answer of the mock model."""
+
+    def __init__(self, content: Optional[str] = None, tool_calls: Sequence[tuple] = (),
+                 error: Optional[int] = None, response: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the reply.
+
+        Arguments:
+            content: Assistant text
+            tool_calls: (function name, arguments dict) pairs to call
+            error: HTTP status code of an error to return instead
+            response: A complete recorded response payload to return as is
+        """
+        self.content = content
+        self.tool_calls = list(tool_calls)
+        self.error = error
+        self.response = response
+
+
+class MockScript:
+    """Sequence of scripted replies, optionally looked up by request."""
+
+    def __init__(self, replies: Sequence[ScriptedReply], loop: bool = True,
+                 by_request: Optional[Dict[str, ScriptedReply]] = None):
+        """
+        Initialize the script.
+
+        Arguments:
+            replies: Replies given in order
+            loop: Start over after the last reply instead of falling back to the default answer
+            by_request: Replies keyed by request_key, taking precedence over the order
+        """
+        self.replies = list(replies)
+        self.loop = loop
+        self.by_request = by_request or {}
+        self._position = itertools.count()
+
+    def next_reply(self, request: Dict[str, Any]) -> Optional[ScriptedReply]:
+        """Get the reply for a request, or None to use the default answer."""
+        if self.by_request:
+            reply = self.by_request.get(request_key(request))
+            if reply is not None:
+                return reply
+        if not self.replies:
+            return None
+        position = next(self._position)
+        if position >= len(self.replies) and not self.loop:
+            return None
+        return self.replies[position % len(self.replies)]
+
+    @classmethod
+    def from_recording(cls, path: str, loop: bool = True) -> "MockScript":
+        """
+        Build a script replaying the responses recorded by RecordingClient.
+
+        Arguments:
+            path: The recording file
+            loop: Start over after the last recorded response
+
+        Returns:
+            A script answering recorded requests with their recorded response, and other
+            requests with the recorded responses in order
+        """
+        replies = []
+        by_request = {}
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                reply = ScriptedReply(response=record["response"])
+                replies.append(reply)
+                by_request.setdefault(record["key"], reply)
+        return cls(replies, loop=loop, by_request=by_request)
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    """Fingerprint the model, messages and tools of a request for replay lookup."""
+    relevant = {
+        "model": request.get("model"),
+        "messages": [serialize_message(message) for message in request.get("messages", [])],
+        "tools": request.get("tools"),
+    }
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+_PLACEHOLDERS = {"string": "test", "integer": 1, "number": 1.0, "boolean": True, "array": [], "object": {}}
+
+
+def _placeholder(schema: Dict[str, Any], defs: Dict[str, Any], depth: int = 0) -> Any:
+    ref = schema.get("$ref", "")
+    if ref.startswith("#/$defs/") and depth < 8:
+        return _placeholder(defs.get(ref[len("#/$defs/"):], {}), defs, depth + 1)
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "default" in schema:
+        return schema["default"]
+    if "anyOf" in schema and schema["anyOf"]:
+        return _placeholder(schema["anyOf"][0], defs, depth + 1)
+    if schema.get("type") == "object" and "properties" in schema and depth < 8:
+        return placeholder_arguments(schema, defs, depth + 1)
+    return _PLACEHOLDERS.get(schema.get("type"), "test")
+
+
+def placeholder_arguments(parameters: Dict[str, Any], defs: Optional[Dict[str, Any]] = None,
+                          depth: int = 0) -> Dict[str, Any]:
+    """Build arguments for the required parameters of a schema from placeholder values."""
+    defs = parameters.get("$defs", {}) if defs is None else defs
+    properties = parameters.get("properties", {})
+    return {
+        name: _placeholder(properties.get(name, {}), defs, depth)
+        for name in parameters.get("required", [])
+    }
+
+
+class MockLLM:
+    """The mock model: turns requests into response payloads."""
+
+    def __init__(self, script: Optional[MockScript] = None, latency: Optional[LatencyModel] = None,
+                 error_rate: float = 0.0, error_status: int = 429, seed: Optional[int] = None):
+        """
+        Initialize the mock model.
+
+        Arguments:
+            script: Scripted replies; without one the first offered tool is called,
+                or a text answer is given when there are no tools
+            latency: Latency model applied to every request; none by default
+            error_rate: Probability of answering with an injected error
+            error_status: HTTP status code of injected errors
+            seed: Seed of the error injection
+        """
+        self.script = script
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._rng = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def _next_id(self) -> int:
+        with self._lock:
+            self.requests += 1
+            return next(self._ids)
+
+    def delay(self) -> float:
+        """Draw the latency of a request."""
+        return self.latency() if self.latency is not None else 0.0
+
+    @staticmethod
+    def _default_reply(request: Dict[str, Any]) -> ScriptedReply:
+        """Call the forced or first tool, or fill the requested JSON schema, with placeholders."""
+        response_format = request.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            schema = response_format.get("json_schema", {}).get("schema", {})
+            return ScriptedReply(content=json.dumps(placeholder_arguments(schema)))
+        tools = request.get("tools") or []
+        tool_choice = request.get("tool_choice")
+        if isinstance(tool_choice, dict):
+            forced = tool_choice.get("function", {}).get("name")
+            tools = [tool for tool in tools if tool["function"]["name"] == forced] or tools
+        if tools:
+            function = tools[0]["function"]
+            return ScriptedReply(tool_calls=[(function["name"], placeholder_arguments(function.get("parameters", {})))])
+        return ScriptedReply(content="This is a mock response.")
+
+    def complete(self, request: Dict[str, Any]) -> tuple:
+        """
+        Answer a request.
+
+        Arguments:
+            request: The chat completion request parameters
+
+        Returns:
+            An (HTTP status, payload) pair; the payload is a chat completion or an error body
+        """
+        number = self._next_id()
+        reply = self.script.next_reply(request) if self.script is not None else None
+        status = reply.error if reply is not None and reply.error else None
+        if status is None and self.error_rate and self._rng.random() < self.error_rate:
+            status = self.error_status
+        if status is not None:
+            with self._lock:
+                self.errors += 1
+            return status, {"error": {"message": f"Injected error {status}", "type": "mock_error", "code": status}}
+        if reply is not None and reply.response is not None:
+            return 200, reply.response
+
+        if reply is None:
+            reply = self._default_reply(request)
+
+        message = {"role": "assistant", "content": reply.content}
+        if reply.tool_calls:
+            message["tool_calls"] = [
+                {
+                    "id": f"call_mock_{number}_{index}",
+                    "type": "function",
+                    "function": {"name": name, "arguments": json.dumps(arguments)}
+                }
+                for index, (name, arguments) in enumerate(reply.tool_calls)
+            ]
+        prompt_tokens = estimate_request_tokens(request.get("messages", []), request.get("tools"))
+        completion_tokens = estimate_tokens(json.dumps(message))
+        return 200, {
+            "id": f"chatcmpl-mock-{number}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if reply.tool_calls else "stop",
+                "logprobs": None
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+
+def completion_to_chunks(completion: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Split a chat completion payload into streamed chunk payloads.
+
+    Arguments:
+        completion: A chat completion payload
+
+    Yields:
+        Chat completion chunk payloads, with tool call arguments in small fragments
+    """
+    choice = completion["choices"][0]
+    message = choice["message"]
+
+    def chunk(delta, finish_reason=None):
+        return {
+            "id": completion["id"],
+            "object": "chat.completion.chunk",
+            "created": completion["created"],
+            "model": completion["model"],
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+
+    yield chunk({"role": "assistant", "content": message.get("content") or ""})
+    for index, tool_call in enumerate(message.get("tool_calls") or []):
+        function = tool_call["function"]
+        yield chunk({"tool_calls": [{
+            "index": index, "id": tool_call["id"], "type": "function",
+            "function": {"name": function["name"], "arguments": ""}
+        }]})
+        arguments = function["arguments"]
+        for start in range(0, len(arguments), STREAM_ARGUMENT_CHUNK):
+            yield chunk({"tool_calls": [{
+                "index": index, "function": {"arguments": arguments[start:start + STREAM_ARGUMENT_CHUNK]}
+            }]})
+    yield chunk({}, choice["finish_reason"])
+
+
+class _Completions:
+    def __init__(self, llm: MockLLM, sleep: Callable[[float], None]):
+        self.llm = llm
+        self.sleep = sleep
+
+    def create(self, **request):
+        delay = self.llm.delay()
+        if delay:
+            self.sleep(delay)
+        status, payload = self.llm.complete(request)
+        if status != 200:
+            raise MockAPIError(status, payload["error"]["message"])
+        if request.get("stream"):
+            return (ChatCompletionChunk.model_validate(chunk) for chunk in completion_to_chunks(payload))
+        return ChatCompletion.model_validate(payload)
+
+
+class _Chat:
+    def __init__(self, completions: _Completions):
+        self.completions = completions
+
+
+class MockClient:
+    """In-process client with the ``chat.completions.create`` interface of the OpenAI SDK."""
+
+    def __init__(self, llm: Optional[MockLLM] = None, sleep: Callable[[float], None] = time.sleep):
+        """
+        Initialize the client.
+
+        Arguments:
+            llm: The mock model; a default MockLLM without latency if omitted
+            sleep: Function used to wait for the simulated latency
+        """
+        self.llm = llm or MockLLM()
+        self.chat = _Chat(_Completions(self.llm, sleep))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "ArgGptMock/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]})
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        llm: MockLLM = self.server.llm
+        delay = llm.delay()
+        if delay:
+            time.sleep(delay)
+        status, payload = llm.complete(request)
+        if status != 200 or not request.get("stream"):
+            self._send_json(status, payload)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for chunk in completion_to_chunks(payload):
+            self.wfile.write(b"data: " + json.dumps(chunk).encode("utf-8") + b"\n\n")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class MockServer:
+    """OpenAI compatible HTTP server backed by a MockLLM, run on a background thread."""
+
+    def __init__(self, llm: Optional[MockLLM] = None, host: str = "127.0.0.1", port: int = 0):
+        """
+        Initialize the server.
+
+        Arguments:
+            llm: The mock model; a default MockLLM without latency if omitted
+            host: Interface to bind
+            port: Port to bind; 0 picks a free port
+        """
+        self.llm = llm or MockLLM()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.llm = self.llm
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to pass to the SDK client, e.g. ``openai.OpenAI(base_url=server.url)``."""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockServer":
+        """Start serving on a background thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="arg_gpt_mock_server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the server."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MockServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+class RecordingClient:
+    """Wraps a real client and records each request with its response for replay."""
+
+    def __init__(self, client, path: str):
+        """
+        Initialize the recorder.
+
+        Arguments:
+            client: The client to forward requests to
+            path: JSON lines file the records are appended to
+        """
+        self.client = client
+        self.path = path
+        self._lock = threading.Lock()
+        self.chat = _Chat(self)
+
+    def create(self, **request):
+        response = self.client.chat.completions.create(**request)
+        if request.get("stream"):
+            # Streams are consumed by the caller, so only complete responses are recorded
+            return response
+        record = {"key": request_key(request), "response": serialize_message(response)}
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(record) + "\n")
+        return response
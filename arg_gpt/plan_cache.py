@@ -0,0 +1,203 @@
+"""
+Module for serving repeated prompts' tool calls without a completion.
+
+High-volume templated prompts are often mapped to exactly the same tool calls every
+time. PlanCache learns the tool calls ("plan") of successful turns per normalized
+prompt. Once a plan has been confirmed often enough, and no other plan was seen for
+the prompt too often, it is served locally and the completion is skipped. Plans are
+keyed by the fingerprint of the prompt prefix, so changing a tool's schema or the
+system prompts invalidates everything learned for the old registry. The index is an
+LRU bounded to ``max_entries`` prompts.
+
+ConversationRunner is what learns and serves plans: it knows the prompt and the prompt
+prefix of a turn, which interpret_response does not. A turn counts as successful when
+the dispatcher flagged none of its tool messages as failed; what a tool returns is not
+inspected, so a result that happens to read like an error is still learned.
+"""
+
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .json_repair import decode_arguments
+from .messages import ToolCall
+
+log = logging.getLogger(__name__)
+
+# A plan is the (name, canonical JSON arguments) pair of every tool call, in order
+Plan = Tuple[Tuple[str, str], ...]
+
+# Number of different plans tracked per prompt
+MAX_PLANS_PER_PROMPT = 4
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse runs of whitespace and strip the ends of a prompt."""
+    return _WHITESPACE.sub(" ", prompt).strip()
+
+
+def plan_of(tool_calls: Sequence[Any]) -> Optional[Plan]:
+    """
+    Build the plan of a message's tool calls.
+
+    Arguments:
+        tool_calls: SDK tool call objects or their dict payloads
+
+    Returns:
+        The plan, or None if an argument string is not valid JSON
+    """
+    plan = []
+    for tool_call in tool_calls:
+        if isinstance(tool_call, dict):
+            function = tool_call.get("function", {})
+            name, arguments = function.get("name"), function.get("arguments")
+        else:
+            name, arguments = tool_call.function.name, tool_call.function.arguments
+        try:
+            decoded = decode_arguments(arguments, stats=None, repair=False)
+        except (ValueError, TypeError):
+            return None
+        plan.append((name, json.dumps(decoded, sort_keys=True, separators=(",", ":"), ensure_ascii=False)))
+    return tuple(plan)
+
+
+@dataclass
+class PlanCacheStats:
+    """Lookups and learning of a PlanCache."""
+    hits: int = 0
+    misses: int = 0
+    observations: int = 0
+    evictions: int = 0
+    rejections: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class _Entry:
+    __slots__ = ("plans", "observations")
+
+    def __init__(self):
+        self.plans: Dict[Plan, int] = {}
+        self.observations = 0
+
+
+class PlanCache:
+    """Learns prompt to tool call mappings and serves confirmed ones."""
+
+    def __init__(self, min_confirmations: int = 3, min_confidence: float = 1.0, max_entries: int = 10000,
+                 normalize: Callable[[str], str] = normalize_prompt):
+        """
+        Initialize the cache.
+
+        Arguments:
+            min_confirmations: Successful turns with the same plan needed before it is served
+            min_confidence: Fraction of a prompt's successful turns that must agree with the plan
+            max_entries: Number of prompts kept; the least recently used are evicted
+            normalize: Maps a prompt to its cache key
+        """
+        if min_confirmations < 1:
+            raise ValueError("min_confirmations must be at least 1")
+        self.min_confirmations = min_confirmations
+        self.min_confidence = min_confidence
+        self.max_entries = max_entries
+        self.normalize = normalize
+        self.stats = PlanCacheStats()
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def observe(self, fingerprint: str, prompt: str, tool_calls: Sequence[Any]) -> None:
+        """
+        Record the tool calls of a successful turn.
+
+        Arguments:
+            fingerprint: The fingerprint of the prompt prefix the turn was run with
+            prompt: The user prompt
+            tool_calls: The tool calls the model answered with
+        """
+        if not tool_calls:
+            return
+        plan = plan_of(tool_calls)
+        if plan is None:
+            return
+        key = (fingerprint, self.normalize(prompt))
+        with self._lock:
+            self.stats.observations += 1
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry()
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.stats.evictions += 1
+            else:
+                self._entries.move_to_end(key)
+            entry.observations += 1
+            if plan in entry.plans or len(entry.plans) < MAX_PLANS_PER_PROMPT:
+                entry.plans[plan] = entry.plans.get(plan, 0) + 1
+
+    def lookup(self, fingerprint: str, prompt: str) -> Optional[List[ToolCall]]:
+        """
+        Get the confirmed tool calls for a prompt.
+
+        Arguments:
+            fingerprint: The fingerprint of the current prompt prefix
+            prompt: The user prompt
+
+        Returns:
+            New tool calls to execute, or None if no plan is confident enough
+        """
+        key = (fingerprint, self.normalize(prompt))
+        with self._lock:
+            entry = self._entries.get(key)
+            plan = self._confirmed_plan(entry) if entry is not None else None
+            if plan is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            calls = []
+            for name, arguments in plan:
+                self._counter += 1
+                calls.append(ToolCall(f"call_plan_{self._counter}", name, arguments))
+            return calls
+
+    def _confirmed_plan(self, entry: _Entry) -> Optional[Plan]:
+        plan, confirmations = max(entry.plans.items(), key=lambda item: item[1])
+        if confirmations < self.min_confirmations:
+            return None
+        if confirmations / entry.observations < self.min_confidence:
+            return None
+        return plan
+
+    def reject(self, fingerprint: str, prompt: str) -> None:
+        """Forget everything learned for a prompt, e.g. after a served plan failed."""
+        with self._lock:
+            if self._entries.pop((fingerprint, self.normalize(prompt)), None) is not None:
+                self.stats.rejections += 1
+
+    def invalidate(self, fingerprint: Optional[str] = None) -> None:
+        """
+        Forget learned plans.
+
+        Arguments:
+            fingerprint: Only forget the plans of this prompt prefix; all plans if omitted
+        """
+        with self._lock:
+            if fingerprint is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == fingerprint]:
+                del self._entries[key]
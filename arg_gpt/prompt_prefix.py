@@ -0,0 +1,148 @@
+"""
+Module for assembling requests with a byte-stable prefix.
+
+Provider-side prompt caching only hits when a request starts with exactly the same
+bytes as an earlier one. The system prompts and the tools payload form that prefix, so
+they are built once, with tools sorted by name and every schema's keys in canonical
+order, independent of import or registration order. The built prefix is cached per
+tool set and identified by a fingerprint that is stable across processes.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from . import prompts
+from .gpt_helpers import create_tools_dict
+from .schema_dedup import deduplicate_tools
+
+PREFIX_CACHE_SIZE = 32
+
+
+def canonicalize(value: Any) -> Any:
+    """
+    Rebuild a JSON value with every dict's keys in sorted order.
+
+    Arguments:
+        value: A JSON value
+
+    Returns:
+        An equal value whose serialization does not depend on insertion order
+    """
+    if isinstance(value, dict):
+        return {key: canonicalize(value[key]) for key in sorted(value)}
+    if isinstance(value, list):
+        return [canonicalize(item) for item in value]
+    return value
+
+
+def canonical_tools(tools: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Sort a tools payload by function name and canonicalize every schema."""
+    return [
+        canonicalize(tool)
+        for tool in sorted(tools, key=lambda tool: tool.get("function", {}).get("name", ""))
+    ]
+
+
+def default_system_messages() -> List[Dict[str, str]]:
+    """The system prompts used by the examples, in their usual order."""
+    return prompts.request_detailed_result() + prompts.remain_functional()
+
+
+class PromptPrefix:
+    """The system messages and tools payload shared by every request of a tool set."""
+
+    def __init__(self, system_messages: Sequence[Dict[str, Any]], tools: List[Dict[str, Any]]):
+        """
+        Initialize the prefix.
+
+        Arguments:
+            system_messages: The leading system messages
+            tools: The canonical tools payload
+        """
+        self.system_messages: Tuple[Dict[str, Any], ...] = tuple(canonicalize(m) for m in system_messages)
+        self.tools = tools
+        self.serialized = json.dumps(
+            {"messages": list(self.system_messages), "tools": tools},
+            separators=(",", ":"), ensure_ascii=False
+        )
+        self.fingerprint = hashlib.sha256(self.serialized.encode("utf-8")).hexdigest()
+
+    def messages(self, *conversation: Dict[str, Any]) -> List[Any]:
+        """
+        Build a request's messages starting with the prefix.
+
+        Arguments:
+            conversation: The messages following the system prompts
+
+        Returns:
+            A new list; the system messages are shared instances and must not be mutated
+        """
+        return [*self.system_messages, *conversation]
+
+
+class PromptAssembler:
+    """Builds and caches byte-stable prompt prefixes per tool set."""
+
+    def __init__(self, system_messages: Optional[Sequence[Dict[str, Any]]] = None,
+                 deduplicate: bool = False, cache_size: int = PREFIX_CACHE_SIZE):
+        """
+        Initialize the assembler.
+
+        Arguments:
+            system_messages: The system messages; the examples' prompts by default
+            deduplicate: Hoist repeated subschemas into $defs, see schema_dedup
+            cache_size: Number of tool sets whose prefixes are kept
+        """
+        self.system_messages = list(system_messages) if system_messages is not None else default_system_messages()
+        self.deduplicate = deduplicate
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[FrozenSet, PromptPrefix]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def prefix(self, functions: Iterable[callable]) -> PromptPrefix:
+        """
+        Get the prefix for a tool set, building it on first use.
+
+        Arguments:
+            functions: The functions exposed to the model, in any order
+
+        Returns:
+            The cached PromptPrefix, shared by every order of the same functions
+        """
+        functions = tuple(functions)
+        # The payload is sorted by name, so the order of the functions does not matter
+        key = frozenset(functions)
+        with self._lock:
+            prefix = self._cache.get(key)
+            if prefix is not None:
+                self._cache.move_to_end(key)
+                return prefix
+
+        tools = create_tools_dict(functions)
+        if self.deduplicate:
+            tools, _ = deduplicate_tools(tools)
+        prefix = PromptPrefix(self.system_messages, canonical_tools(tools))
+        with self._lock:
+            self._cache[key] = prefix
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return prefix
+
+    def assemble(self, functions: Iterable[callable], prompt: str,
+                 history: Sequence[Any] = ()) -> Tuple[List[Any], List[Dict[str, Any]]]:
+        """
+        Assemble the messages and tools of a request.
+
+        Arguments:
+            functions: The functions exposed to the model
+            prompt: The new user prompt
+            history: Earlier conversation messages after the system prompts
+
+        Returns:
+            The messages and the tools payload to send
+        """
+        prefix = self.prefix(functions)
+        return prefix.messages(*history, *prompts.user_prompt(prompt)), prefix.tools
@@ -0,0 +1,440 @@
+"""
+Module for client-side rate limiting of provider calls.
+
+Workers that share an API key can stay under the provider's requests-per-minute
+and tokens-per-minute limits by sharing a RateLimiter. Token buckets use
+reservations: a request takes its tokens immediately, possibly putting the bucket
+into debt, and waits until the debt is repaid. This keeps requests in arrival order
+and never needs a retry loop. A request abandoned before it is sent gives its
+reservation back. Buckets and the in-flight limit can be kept in a SQLite file to
+coordinate processes on the same host.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Iterable, Optional
+
+from .cancellation import CancellationToken
+from .token_estimation import estimate_tokens
+
+# Tokens the API adds around every message for role and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+# Seconds between cancellation checks while waiting for an in-flight slot
+CANCEL_POLL_INTERVAL = 0.05
+
+
+def _message_text(message: Any) -> str:
+    if isinstance(message, dict):
+        content = message.get("content")
+        tool_calls = message.get("tool_calls")
+    else:
+        content = getattr(message, "content", None)
+        tool_calls = getattr(message, "tool_calls", None)
+    text = content if isinstance(content, str) else json.dumps(content, default=str) if content else ""
+    if tool_calls:
+        text += json.dumps(tool_calls, default=lambda o: getattr(o, "__dict__", str(o)))
+    return text
+
+
+def estimate_request_tokens(messages: Iterable[Any], tools: Optional[list] = None, max_tokens: int = 0) -> int:
+    """
+    Estimate the tokens a chat completion request counts against a tokens-per-minute limit.
+
+    Arguments:
+        messages: The request messages, as dicts or SDK message objects
+        tools: The tools payload sent with the request
+        max_tokens: The completion budget, which providers reserve up front
+
+    Returns:
+        The estimated token count
+    """
+    total = max_tokens
+    for message in messages:
+        total += MESSAGE_OVERHEAD_TOKENS + estimate_tokens(_message_text(message))
+    if tools:
+        total += estimate_tokens(json.dumps(tools, separators=(",", ":"), default=str))
+    return total
+
+
+class TokenBucket:
+    """In-process token bucket refilled continuously at a fixed rate."""
+
+    def __init__(self, capacity: float, refill_per_second: float, clock=time.monotonic):
+        """
+        Initialize a full bucket.
+
+        Arguments:
+            capacity: Maximum number of tokens held
+            refill_per_second: Tokens added per second
+            clock: Monotonic clock, replaceable for testing
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take tokens from the bucket, going into debt if needed.
+
+        Arguments:
+            amount: Number of tokens to take; clamped to the capacity
+
+        Returns:
+            Seconds to wait before the reservation is covered
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_per_second)
+            self._updated = now
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.refill_per_second)
+
+    def refund(self, amount: float) -> None:
+        """Return tokens that were reserved but not used."""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class SQLiteTokenBucket:
+    """Token bucket whose state is shared by all processes using the same SQLite file."""
+
+    def __init__(self, path: str, name: str, capacity: float, refill_per_second: float):
+        """
+        Initialize the bucket, creating its row if needed.
+
+        Arguments:
+            path: Path of the SQLite database file
+            name: Name of the bucket within the file
+            capacity: Maximum number of tokens held
+            refill_per_second: Tokens added per second
+        """
+        self.path = path
+        self.name = name
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        connection = self._connect()
+        try:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, updated REAL)"
+            )
+            connection.execute(
+                "INSERT OR IGNORE INTO buckets VALUES (?, ?, ?)", (name, capacity, time.time())
+            )
+        finally:
+            connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _update(self, amount: float) -> float:
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            tokens, updated = connection.execute(
+                "SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            now = time.time()
+            tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.refill_per_second) - amount
+            connection.execute(
+                "UPDATE buckets SET tokens = ?, updated = ? WHERE name = ?", (tokens, now, self.name)
+            )
+            connection.execute("COMMIT")
+            return tokens
+        finally:
+            connection.close()
+
+    def reserve(self, amount: float) -> float:
+        """Take tokens from the shared bucket and return the seconds to wait."""
+        tokens = self._update(min(amount, self.capacity))
+        return max(0.0, -tokens / self.refill_per_second)
+
+    def refund(self, amount: float) -> None:
+        """Return tokens that were reserved but not used."""
+        self._update(-amount)
+
+
+class SQLiteLeaseSemaphore:
+    """
+    Counting semaphore shared by processes through leases in a SQLite file.
+
+    Each holder inserts a lease row that expires after ``lease_seconds``, so slots
+    held by a crashed process are recovered automatically.
+    """
+
+    def __init__(self, path: str, name: str, limit: int, lease_seconds: float = 300.0,
+                 poll_interval: float = 0.05):
+        """
+        Initialize the semaphore.
+
+        Arguments:
+            path: Path of the SQLite database file
+            name: Name of the semaphore within the file
+            limit: Maximum number of concurrent holders
+            lease_seconds: Time after which an unreleased lease is dropped
+            poll_interval: Seconds between attempts while the semaphore is full
+        """
+        self.path = path
+        self.name = name
+        self.limit = limit
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        connection = self._connect()
+        try:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS leases (id TEXT PRIMARY KEY, name TEXT, expires REAL)"
+            )
+        finally:
+            connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def try_acquire(self) -> Optional[str]:
+        """Take a lease if a slot is free, returning its id or None."""
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            connection.execute("DELETE FROM leases WHERE name = ? AND expires < ?", (self.name, now))
+            (held,) = connection.execute("SELECT COUNT(*) FROM leases WHERE name = ?", (self.name,)).fetchone()
+            lease_id = None
+            if held < self.limit:
+                lease_id = uuid.uuid4().hex
+                connection.execute(
+                    "INSERT INTO leases VALUES (?, ?, ?)", (lease_id, self.name, now + self.lease_seconds)
+                )
+            connection.execute("COMMIT")
+            return lease_id
+        finally:
+            connection.close()
+
+    def acquire(self, token: Optional[CancellationToken] = None) -> str:
+        """
+        Block until a lease is available and return its id.
+
+        Raises:
+            CancellationError: If the token is cancelled while waiting
+        """
+        while True:
+            lease_id = self.try_acquire()
+            if lease_id is not None:
+                return lease_id
+            if token is None:
+                time.sleep(self.poll_interval)
+            elif token.wait(self.poll_interval):
+                token.raise_if_cancelled()
+
+    def release(self, lease_id: str) -> None:
+        """Release a lease."""
+        connection = self._connect()
+        try:
+            connection.execute("DELETE FROM leases WHERE id = ?", (lease_id,))
+        finally:
+            connection.close()
+
+
+class Reservation:
+    """Tokens reserved for one request, which can be corrected once usage is known."""
+
+    def __init__(self, limiter: "RateLimiter", tokens: int):
+        self.limiter = limiter
+        self.tokens = tokens
+
+    def settle(self, actual_tokens: int) -> None:
+        """
+        Correct the reservation with the tokens the request actually used.
+
+        Arguments:
+            actual_tokens: Total tokens reported by the provider
+        """
+        if self.limiter.token_bucket is not None and actual_tokens < self.tokens:
+            self.limiter.token_bucket.refund(self.tokens - actual_tokens)
+        self.tokens = actual_tokens
+
+
+class RateLimiter:
+    """Requests-per-minute, tokens-per-minute and in-flight limits for provider calls."""
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 max_in_flight: Optional[int] = None, shared_path: Optional[str] = None, name: str = "default"):
+        """
+        Initialize the limiter.
+
+        Arguments:
+            requests_per_minute: Request limit, or None for no limit
+            tokens_per_minute: Token limit, or None for no limit
+            max_in_flight: Maximum concurrent requests, or None for no limit
+            shared_path: Optional SQLite file used to share the limits across processes
+            name: Name of the limits within the shared file
+        """
+        self.shared_path = shared_path
+        self.request_bucket = self._make_bucket(f"{name}:requests", requests_per_minute)
+        self.token_bucket = self._make_bucket(f"{name}:tokens", tokens_per_minute)
+        self.max_in_flight = max_in_flight
+        self._semaphore = None
+        self._lease_semaphore = None
+        if max_in_flight is not None:
+            if shared_path:
+                self._lease_semaphore = SQLiteLeaseSemaphore(shared_path, f"{name}:in_flight", max_in_flight)
+            else:
+                # Shared by sync and async callers, so together they stay within the limit
+                self._semaphore = threading.BoundedSemaphore(max_in_flight)
+
+    def _make_bucket(self, name: str, per_minute: Optional[float]):
+        if per_minute is None:
+            return None
+        if self.shared_path:
+            return SQLiteTokenBucket(self.shared_path, name, per_minute, per_minute / 60.0)
+        return TokenBucket(per_minute, per_minute / 60.0)
+
+    def reserve(self, tokens: int) -> float:
+        """
+        Reserve one request and a number of tokens.
+
+        Arguments:
+            tokens: Estimated tokens of the request
+
+        Returns:
+            Seconds to wait before sending the request
+        """
+        wait = 0.0
+        if self.request_bucket is not None:
+            wait = self.request_bucket.reserve(1)
+        if self.token_bucket is not None:
+            wait = max(wait, self.token_bucket.reserve(tokens))
+        return wait
+
+    def refund(self, tokens: int) -> None:
+        """
+        Give back the reservation of a request that was never sent.
+
+        Arguments:
+            tokens: The tokens that were reserved for it
+        """
+        if self.request_bucket is not None:
+            self.request_bucket.refund(1)
+        if self.token_bucket is not None:
+            self.token_bucket.refund(tokens)
+
+    def _acquire_slot(self, token: Optional[CancellationToken]) -> bool:
+        if token is None:
+            return self._semaphore.acquire()
+        while not self._semaphore.acquire(timeout=CANCEL_POLL_INTERVAL):
+            token.raise_if_cancelled()
+        return True
+
+    @contextmanager
+    def limit(self, tokens: int = 0, token: Optional[CancellationToken] = None):
+        """
+        Context manager that waits for capacity and holds an in-flight slot.
+
+        Arguments:
+            tokens: Estimated tokens of the request
+            token: Stops waiting when cancelled or at its deadline
+
+        Yields:
+            The Reservation, to be settled with the actual usage
+
+        Raises:
+            CancellationError: If the token is cancelled before capacity is available
+        """
+        lease_id = None
+        acquired = False
+        if self._semaphore is not None:
+            acquired = self._acquire_slot(token)
+        elif self._lease_semaphore is not None:
+            lease_id = self._lease_semaphore.acquire(token)
+        reserved = sent = False
+        try:
+            wait = self.reserve(tokens)
+            reserved = True
+            if wait:
+                if token is None:
+                    time.sleep(wait)
+                elif token.wait(wait):
+                    token.raise_if_cancelled()
+            sent = True
+            yield Reservation(self, tokens)
+        finally:
+            if reserved and not sent:
+                self.refund(tokens)
+            if acquired:
+                self._semaphore.release()
+            elif lease_id is not None:
+                self._lease_semaphore.release(lease_id)
+
+    async def _acquire_slot_async(self) -> None:
+        # Polling never blocks the loop and cannot leave a slot taken by a cancelled waiter
+        while not self._semaphore.acquire(blocking=False):
+            await asyncio.sleep(CANCEL_POLL_INTERVAL)
+
+    @staticmethod
+    async def _run_blocking(func: Callable[[], Any], on_abandoned: Callable[[Any], None]) -> Any:
+        """Run a blocking call on the default executor, handing its result to on_abandoned if the caller is cancelled."""
+        future = asyncio.get_running_loop().run_in_executor(None, func)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            def finish(done):
+                if not done.cancelled() and done.exception() is None:
+                    on_abandoned(done.result())
+            future.add_done_callback(finish)
+            raise
+
+    def _release_lease(self, lease_id: Optional[str]) -> None:
+        if lease_id is not None:
+            self._lease_semaphore.release(lease_id)
+
+    async def _acquire_lease_async(self) -> str:
+        # Each attempt is short, so a cancelled waiter stops polling and never keeps a lease
+        while True:
+            lease_id = await self._run_blocking(self._lease_semaphore.try_acquire, self._release_lease)
+            if lease_id is not None:
+                return lease_id
+            await asyncio.sleep(self._lease_semaphore.poll_interval)
+
+    @asynccontextmanager
+    async def limit_async(self, tokens: int = 0):
+        """
+        Async context manager that waits for capacity and holds an in-flight slot.
+
+        Arguments:
+            tokens: Estimated tokens of the request
+
+        Yields:
+            The Reservation, to be settled with the actual usage
+        """
+        lease_id = None
+        acquired = False
+        if self._lease_semaphore is not None:
+            lease_id = await self._acquire_lease_async()
+        elif self._semaphore is not None:
+            await self._acquire_slot_async()
+            acquired = True
+        reserved = sent = False
+        try:
+            if self.shared_path:
+                wait = await self._run_blocking(lambda: self.reserve(tokens), lambda _: self.refund(tokens))
+            else:
+                wait = self.reserve(tokens)
+            reserved = True
+            if wait:
+                await asyncio.sleep(wait)
+            sent = True
+            yield Reservation(self, tokens)
+        finally:
+            if reserved and not sent:
+                self.refund(tokens)
+            if acquired:
+                self._semaphore.release()
+            elif lease_id is not None:
+                self._lease_semaphore.release(lease_id)
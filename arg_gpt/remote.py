@@ -0,0 +1,384 @@
+"""
+Module for executing tool calls on worker processes, possibly on other hosts.
+
+Tools registered with ``@ai_func(backend="name")`` are dispatched through the backend
+of that name instead of being called in-process. RemoteBackend submits a message's
+remote calls as one batch to a task queue and correlates the results by
+``tool_call_id``; RemoteWorker processes claim batches from the queue, run the tools
+with a local ToolDispatcher and post the rendered tool message content back, together
+with whether the dispatcher reported the call as failed.
+
+SQLiteTaskQueue is a queue shared through a SQLite file, enough for several worker
+processes on one host or a shared volume and for tests. Claimed tasks carry a lease,
+so tasks of a crashed worker are picked up again, and submissions wait while the
+queue is full so producers slow down to the speed of the workers.
+"""
+
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .cancellation import CancellationToken
+from .dispatcher import ToolDispatcher, cancelled_error, tool_error, tool_failed
+
+log = logging.getLogger(__name__)
+
+# Maximum number of unfinished tasks a queue accepts before submissions wait
+DEFAULT_MAX_PENDING = 1000
+
+_PENDING, _CLAIMED, _DONE = 0, 1, 2
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a task queue stays full for longer than the submission timeout."""
+
+
+class Task(NamedTuple):
+    """A tool call claimed by a worker."""
+    id: int
+    tool_call_id: str
+    name: str
+    arguments: str
+
+
+class SQLiteTaskQueue:
+    """Tool call queue shared by producer and worker processes through a SQLite file."""
+
+    def __init__(self, path: str, name: str = "default", max_pending: int = DEFAULT_MAX_PENDING,
+                 poll_interval: float = 0.02):
+        """
+        Initialize the queue, creating its table if needed.
+
+        Arguments:
+            path: Path of the SQLite database file
+            name: Name of the queue within the file
+            max_pending: Maximum number of unfinished tasks before submissions wait
+            poll_interval: Seconds between checks while waiting for space or results
+        """
+        self.path = path
+        self.name = name
+        self.max_pending = max_pending
+        self.poll_interval = poll_interval
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS tool_tasks ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, queue TEXT NOT NULL, batch TEXT NOT NULL, "
+                "tool_call_id TEXT NOT NULL, name TEXT NOT NULL, arguments TEXT NOT NULL, "
+                "status INTEGER NOT NULL, worker TEXT, lease_until REAL, result TEXT, "
+                "failed INTEGER NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(tool_tasks)")}
+            if "failed" not in columns:
+                # Files created before failures were recorded
+                connection.execute("ALTER TABLE tool_tasks ADD COLUMN failed INTEGER NOT NULL DEFAULT 0")
+            connection.execute("CREATE INDEX IF NOT EXISTS tool_tasks_status ON tool_tasks (queue, status, id)")
+            connection.execute("CREATE INDEX IF NOT EXISTS tool_tasks_batch ON tool_tasks (batch)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def pending(self) -> int:
+        """Number of tasks submitted but not finished."""
+        connection = self._connect()
+        try:
+            (count,) = connection.execute(
+                "SELECT COUNT(*) FROM tool_tasks WHERE queue = ? AND status < ?", (self.name, _DONE)
+            ).fetchone()
+            return count
+        finally:
+            connection.close()
+
+    def try_submit(self, calls: Sequence[Tuple[str, str, str]]) -> Optional[str]:
+        """
+        Submit a batch of calls if the queue has room for all of them.
+
+        Arguments:
+            calls: (tool_call_id, name, JSON arguments) triples
+
+        Returns:
+            The batch id, or None if the queue is full
+        """
+        batch = uuid.uuid4().hex
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            (count,) = connection.execute(
+                "SELECT COUNT(*) FROM tool_tasks WHERE queue = ? AND status < ?", (self.name, _DONE)
+            ).fetchone()
+            # A batch larger than the whole queue is still accepted into an empty queue
+            if count and count + len(calls) > self.max_pending:
+                connection.execute("ROLLBACK")
+                return None
+            connection.executemany(
+                "INSERT INTO tool_tasks (queue, batch, tool_call_id, name, arguments, status) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(self.name, batch, tool_call_id, name, arguments, _PENDING) for tool_call_id, name, arguments in calls]
+            )
+            connection.execute("COMMIT")
+            return batch
+        finally:
+            connection.close()
+
+    def submit(self, calls: Sequence[Tuple[str, str, str]], timeout: Optional[float] = None,
+               token: Optional[CancellationToken] = None) -> str:
+        """
+        Submit a batch of calls, waiting while the queue is full.
+
+        Arguments:
+            calls: (tool_call_id, name, JSON arguments) triples
+            timeout: Maximum seconds to wait for room; forever if None
+            token: Stops waiting for room when cancelled or at its deadline
+
+        Returns:
+            The batch id used to collect the results
+
+        Raises:
+            QueueFullError: If the queue is still full after the timeout
+            CancellationError: If the token is cancelled before the batch is submitted
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if token is not None:
+                token.raise_if_cancelled()
+            batch = self.try_submit(calls)
+            if batch is not None:
+                return batch
+            if deadline is not None and time.monotonic() >= deadline:
+                raise QueueFullError(f"Queue {self.name} has {self.max_pending} unfinished tasks")
+            if token is None:
+                time.sleep(self.poll_interval)
+            else:
+                token.wait(self.poll_interval)
+
+    def claim(self, worker: str, limit: int = 16, lease_seconds: float = 60.0) -> List[Task]:
+        """
+        Claim up to ``limit`` pending tasks, including tasks whose lease expired.
+
+        Arguments:
+            worker: Identifier of the claiming worker
+            limit: Maximum number of tasks to claim
+            lease_seconds: Time after which unfinished tasks may be claimed by another worker
+
+        Returns:
+            The claimed tasks, oldest first
+        """
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            rows = connection.execute(
+                "SELECT id, tool_call_id, name, arguments FROM tool_tasks "
+                "WHERE queue = ? AND (status = ? OR (status = ? AND lease_until < ?)) ORDER BY id LIMIT ?",
+                (self.name, _PENDING, _CLAIMED, now, limit)
+            ).fetchall()
+            connection.executemany(
+                "UPDATE tool_tasks SET status = ?, worker = ?, lease_until = ? WHERE id = ?",
+                [(_CLAIMED, worker, now + lease_seconds, row[0]) for row in rows]
+            )
+            connection.execute("COMMIT")
+            return [Task(*row) for row in rows]
+        finally:
+            connection.close()
+
+    def complete(self, worker: str, results: Iterable[Tuple[Any, ...]]) -> None:
+        """
+        Post the results of claimed tasks.
+
+        Results of tasks that were reclaimed by another worker in the meantime are dropped.
+
+        Arguments:
+            worker: Identifier of the worker that claimed the tasks
+            results: (task id, tool message content, failed) triples; without the
+                failed flag a result counts as successful
+        """
+        connection = self._connect()
+        try:
+            connection.executemany(
+                "UPDATE tool_tasks SET status = ?, result = ?, failed = ? "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                [(_DONE, content, int(bool(failed and failed[0])), task_id, worker, _CLAIMED)
+                 for task_id, content, *failed in results]
+            )
+        finally:
+            connection.close()
+
+    def collect_outcomes(self, batch: str) -> Dict[str, Tuple[str, bool]]:
+        """Get the finished results of a batch and whether they failed, by tool_call_id."""
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                "SELECT tool_call_id, result, failed FROM tool_tasks WHERE batch = ? AND status = ?", (batch, _DONE)
+            ).fetchall()
+            return {tool_call_id: (content, bool(failed)) for tool_call_id, content, failed in rows}
+        finally:
+            connection.close()
+
+    def collect(self, batch: str) -> Dict[str, str]:
+        """Get the finished results of a batch by tool_call_id."""
+        return {tool_call_id: content for tool_call_id, (content, _) in self.collect_outcomes(batch).items()}
+
+    def discard(self, batch: str) -> None:
+        """Remove a batch, including tasks that were never run."""
+        connection = self._connect()
+        try:
+            connection.execute("DELETE FROM tool_tasks WHERE batch = ?", (batch,))
+        finally:
+            connection.close()
+
+
+class PendingResults:
+    """Results of one submitted batch, waited for on first access."""
+
+    def __init__(self, queue: SQLiteTaskQueue, batch: Optional[str], calls: Sequence[Tuple[str, str, str]],
+                 timeout: float, error: Optional[str] = None):
+        self.queue = queue
+        self.batch = batch
+        self.names = {tool_call_id: name for tool_call_id, name, _ in calls}
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout
+        self.error = error
+        self._results: Optional[Dict[str, Tuple[str, bool]]] = None
+        self._lock = threading.Lock()
+
+    def _wait(self, token: Optional[CancellationToken]) -> Dict[str, Tuple[str, bool]]:
+        deadline = self.deadline if token is None or token.deadline is None else min(self.deadline, token.deadline)
+        results = self.queue.collect_outcomes(self.batch)
+        while len(results) < len(self.names) and time.monotonic() < deadline:
+            if token is None:
+                time.sleep(self.queue.poll_interval)
+            elif token.wait(self.queue.poll_interval):
+                break
+            results = self.queue.collect_outcomes(self.batch)
+        # Discarding also drops the tasks no worker has claimed yet
+        self.queue.discard(self.batch)
+        return results
+
+    def get(self, tool_call_id: str, token: Optional[CancellationToken] = None) -> str:
+        """
+        Get the tool message content of a call, waiting for the batch if needed.
+
+        Arguments:
+            tool_call_id: The id of a call in the batch
+            token: Stops waiting for the batch when cancelled or at its deadline
+
+        Returns:
+            The content rendered by the worker, or a structured error
+        """
+        name = self.names[tool_call_id]
+        if self.error is not None:
+            return tool_error("backpressure", name, self.error)
+        with self._lock:
+            if self._results is None:
+                self._results = self._wait(token)
+        outcome = self._results.get(tool_call_id)
+        if outcome is None:
+            if token is not None and token.cancelled:
+                return cancelled_error(name)
+            return tool_error("timeout", name, f"No worker finished the tool within {self.timeout} seconds")
+        return outcome[0]
+
+    def failed(self, tool_call_id: str) -> bool:
+        """Check whether get answered a call with an error, either locally or from the worker's dispatcher."""
+        if self.error is not None or self._results is None or tool_call_id not in self._results:
+            return True
+        return self._results[tool_call_id][1]
+
+
+class RemoteBackend:
+    """Dispatcher backend sending tool calls to workers through a task queue."""
+
+    def __init__(self, queue: SQLiteTaskQueue, timeout: float = 60.0, submit_timeout: Optional[float] = 10.0):
+        """
+        Initialize the backend.
+
+        Arguments:
+            queue: The queue served by the workers
+            timeout: Seconds to wait for the results of a batch
+            submit_timeout: Seconds to wait for room in a full queue
+        """
+        self.queue = queue
+        self.timeout = timeout
+        self.submit_timeout = submit_timeout
+
+    def submit(self, calls: Sequence[Tuple[str, str, str]],
+               token: Optional[CancellationToken] = None) -> PendingResults:
+        """
+        Submit a message's calls for this backend as one batch.
+
+        Arguments:
+            calls: (tool_call_id, name, JSON arguments) triples
+            token: Stops waiting for room in a full queue
+
+        Returns:
+            The pending results, correlated by tool_call_id
+
+        Raises:
+            CancellationError: If the token is cancelled before the batch is submitted
+        """
+        try:
+            batch = self.queue.submit(calls, timeout=self.submit_timeout, token=token)
+        except QueueFullError as e:
+            log.warning("Rejecting %d remote calls: %s", len(calls), e)
+            return PendingResults(self.queue, None, calls, self.timeout, error=str(e))
+        return PendingResults(self.queue, batch, calls, self.timeout)
+
+
+class RemoteWorker:
+    """Worker process loop claiming tool calls from a queue and running them locally."""
+
+    def __init__(self, queue: SQLiteTaskQueue, functions: Iterable[callable], worker_id: Optional[str] = None,
+                 batch_size: int = 16, lease_seconds: float = 60.0, idle_interval: float = 0.05):
+        """
+        Initialize the worker.
+
+        Arguments:
+            queue: The queue to serve
+            functions: The tools this worker can run
+            worker_id: Identifier of the worker; host and process id by default
+            batch_size: Maximum number of tasks claimed at once
+            lease_seconds: Time after which unfinished claimed tasks are handed to another worker
+            idle_interval: Seconds to sleep when the queue is empty
+        """
+        self.queue = queue
+        # Without backends the dispatcher runs every tool in this process
+        self.dispatcher = ToolDispatcher(functions)
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.idle_interval = idle_interval
+
+    def run_once(self) -> int:
+        """
+        Claim and run one batch of tasks.
+
+        Returns:
+            The number of tasks run
+        """
+        tasks = self.queue.claim(self.worker_id, self.batch_size, self.lease_seconds)
+        if not tasks:
+            return 0
+        results = []
+        for task in tasks:
+            message = self.dispatcher.call(task.tool_call_id, task.name, task.arguments)
+            results.append((task.id, message["content"], tool_failed(message)))
+        self.queue.complete(self.worker_id, results)
+        return len(tasks)
+
+    def run_forever(self, stop: Optional[threading.Event] = None) -> None:
+        """
+        Serve the queue until the stop event is set.
+
+        Arguments:
+            stop: Event ending the loop; runs until interrupted if omitted
+        """
+        stop = stop or threading.Event()
+        log.info("Worker %s serving queue %s", self.worker_id, self.queue.name)
+        while not stop.is_set():
+            if not self.run_once():
+                stop.wait(self.idle_interval)
@@ -0,0 +1,169 @@
+"""
+Module for routing requests to a cheap model first and escalating when it fails.
+
+Most prompts are simple single tool calls that a small, fast model answers correctly.
+ModelRouter sends every request to the first model of a ladder and checks the answer
+before any tool runs; a call to an unknown function, arguments that are not valid
+JSON even after repair, or arguments that fail validation send the same request to the next, stronger
+model. Latency per model and escalation rates are recorded so the ladder can be tuned.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from .dispatcher import ToolDispatcher, get_dispatcher
+from .extraction import validate_arguments
+from .gpt_helpers import call_gpt_with_function
+from .json_repair import decode_arguments
+from .type_decoding import ArgumentValidationError
+
+log = logging.getLogger(__name__)
+
+UNKNOWN_FUNCTION = "unknown_function"
+INVALID_JSON = "invalid_json"
+VALIDATION_FAILED = "validation_failed"
+
+
+def escalation_reason(response: Any, dispatcher: ToolDispatcher) -> Optional[str]:
+    """
+    Check a response's tool calls without running them.
+
+    Arguments:
+        response: The chat completion response
+        dispatcher: The dispatcher that would execute the calls
+
+    Returns:
+        The reason to escalate, or None if the answer looks usable
+    """
+    if not response.choices:
+        return None
+    for tool_call in getattr(response.choices[0].message, "tool_calls", None) or ():
+        entry = dispatcher.table.get(tool_call.function.name)
+        if entry is None:
+            return UNKNOWN_FUNCTION
+        try:
+            arguments = decode_arguments(tool_call.function.arguments, stats=None)
+        except (ValueError, TypeError):
+            return INVALID_JSON
+        try:
+            validate_arguments(entry.func, arguments)
+        except (ArgumentValidationError, TypeError, ValueError):
+            return VALIDATION_FAILED
+    return None
+
+
+@dataclass
+class ModelStats:
+    """Requests answered by one model of the ladder."""
+    requests: int = 0
+    escalated: int = 0
+    total_latency: float = 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        """Mean seconds per request."""
+        return self.total_latency / self.requests if self.requests else 0.0
+
+    @property
+    def escalation_rate(self) -> float:
+        """Fraction of this model's answers that were escalated."""
+        return self.escalated / self.requests if self.requests else 0.0
+
+
+@dataclass
+class RouterStats:
+    """Latency and escalation statistics of a ModelRouter."""
+    models: Dict[str, ModelStats] = field(default_factory=dict)
+    reasons: Dict[str, int] = field(default_factory=dict)
+    routed: int = 0
+    escalated: int = 0
+
+    @property
+    def escalation_rate(self) -> float:
+        """Fraction of routed requests that needed more than the first model."""
+        return self.escalated / self.routed if self.routed else 0.0
+
+
+class RoutedResponse(NamedTuple):
+    """The accepted response, the model that produced it and the escalations on the way."""
+    response: Any
+    model: str
+    escalations: List[str]
+
+
+class ModelRouter:
+    """Tries models from cheapest to strongest until one gives a usable answer."""
+
+    def __init__(self, models: Sequence[str]):
+        """
+        Initialize the router.
+
+        Arguments:
+            models: Model names ordered from the cheapest to the strongest
+        """
+        if not models:
+            raise ValueError("ModelRouter needs at least one model")
+        self.models = list(models)
+        self.stats = RouterStats(models={model: ModelStats() for model in self.models})
+        self._lock = threading.Lock()
+
+    def _record(self, model: str, latency: float, reason: Optional[str]) -> None:
+        with self._lock:
+            stats = self.stats.models[model]
+            stats.requests += 1
+            stats.total_latency += latency
+            if reason is not None:
+                stats.escalated += 1
+                self.stats.reasons[reason] = self.stats.reasons.get(reason, 0) + 1
+
+    def complete(self, client, functions, messages: List[Any], dispatcher: Optional[ToolDispatcher] = None,
+                 **options) -> RoutedResponse:
+        """
+        Request a completion, escalating to stronger models when the answer is unusable.
+
+        Arguments:
+            client: The OpenAI compatible client
+            functions: The functions exposed to the model
+            messages: The conversation messages
+            dispatcher: Dispatcher used to check tool calls; the cached one for functions if omitted
+            options: Further call_gpt_with_function arguments such as tools_dict, rate_limiter or
+                token; a cancelled token stops the escalation before the next model is asked
+
+        Returns:
+            The RoutedResponse; the strongest model's answer is accepted as it is
+
+        Raises:
+            CancellationError: If the token is cancelled or its deadline passes
+        """
+        dispatcher = dispatcher or get_dispatcher(functions)
+        escalations = []
+        for index, model in enumerate(self.models):
+            started = time.perf_counter()
+            response = call_gpt_with_function(client, functions, messages, model=model, **options)
+            latency = time.perf_counter() - started
+            last = index == len(self.models) - 1
+            reason = None if last else escalation_reason(response, dispatcher)
+            self._record(model, latency, reason)
+            if reason is None:
+                with self._lock:
+                    self.stats.routed += 1
+                    if escalations:
+                        self.stats.escalated += 1
+                return RoutedResponse(response, model, escalations)
+            log.info("Escalating from %s: %s", model, reason)
+            escalations.append(reason)
+
+    def run(self, client, functions, messages: List[Any], dispatcher: Optional[ToolDispatcher] = None,
+            **options) -> List[Any]:
+        """
+        Route a request and execute the accepted answer's tool calls.
+
+        Returns:
+            The assistant message followed by the tool messages, as from interpret_response
+        """
+        dispatcher = dispatcher or get_dispatcher(functions)
+        response = self.complete(client, functions, messages, dispatcher, **options).response
+        return dispatcher.interpret(response, options.get("token"))
@@ -0,0 +1,438 @@
+"""
+Module for running dangerous tools in isolated, resource limited worker processes.
+
+Tools registered with ``@ai_func(sandbox=True)`` are not called in the host process.
+The dispatcher sends them to a SandboxPool: a few pre-started Python worker processes
+that have already paid for interpreter startup and imports, so a call costs one round
+trip over a pipe instead of a fresh process. Every call runs with limits on CPU time
+and address space, a wall clock timeout enforced by the host, and everything the tool
+or its child processes write to stdout and stderr is captured in a size-capped buffer.
+
+A worker that exceeds a limit, times out or is cancelled is killed together with its
+process group and replaced. Limits are enforced with ``setrlimit``, so this isolates
+runaway commands and tools; it is not a security boundary against hostile Python code.
+Requires a POSIX system.
+"""
+
+import codecs
+import importlib
+import json
+import logging
+import os
+import queue
+import selectors
+import signal
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, replace
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from .cancellation import CancellationToken, injected_parameters
+from .circuit_breaker import ToolTimeoutError
+from .tool_output import DEFAULT_MAX_OUTPUT_BYTES, CappedBuffer, render_tool_output
+from .type_decoding import build_argument_decoder
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+log = logging.getLogger(__name__)
+
+# Seconds between cancellation checks while waiting for a worker
+POLL_INTERVAL = 0.05
+# Seconds a worker may take to start before it is considered broken
+START_TIMEOUT = 30.0
+# Seconds a call waits for a free worker before failing
+ACQUIRE_TIMEOUT = 300.0
+
+
+class SandboxError(RuntimeError):
+    """Raised when a sandboxed call fails, exceeds a limit or its worker dies."""
+
+
+@dataclass(frozen=True)
+class SandboxLimits:
+    """
+    Resource limits of one sandboxed call.
+
+    Attributes:
+        cpu_seconds: CPU time the call may use
+        memory_bytes: Address space limit of the worker process while the call runs
+        wall_seconds: Wall clock time after which the worker is killed
+        max_output_bytes: Captured stdout and stderr kept; the middle is dropped beyond it
+    """
+    cpu_seconds: float = 10.0
+    memory_bytes: Optional[int] = 1024 * 1024 * 1024
+    wall_seconds: float = 30.0
+    max_output_bytes: int = DEFAULT_MAX_OUTPUT_BYTES
+
+
+DEFAULT_LIMITS = SandboxLimits()
+
+
+def sandbox_limits(option: Any) -> SandboxLimits:
+    """Get the limits of a tool's ``sandbox`` option, which is True or a SandboxLimits."""
+    return option if isinstance(option, SandboxLimits) else DEFAULT_LIMITS
+
+
+def combine_result(content: Optional[str], output: str) -> Any:
+    """Combine a sandboxed tool's rendered return value and its captured output."""
+    if not output:
+        return content
+    if content is None:
+        return output
+    return {"result": content, "output": output}
+
+
+class _Worker:
+    """One worker process and the pipes of its request protocol."""
+
+    def __init__(self, python: str, preload: Iterable[str]):
+        env = dict(os.environ)
+        # Workers import tools the same way the host does
+        env["PYTHONPATH"] = os.pathsep.join(path for path in sys.path if path)
+        self.process = subprocess.Popen(
+            [python, "-m", "arg_gpt.sandbox", json.dumps({"preload": list(preload)})],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            env=env, start_new_session=True
+        )
+        self.tasks = 0
+        self.ready = False
+
+    def kill(self) -> None:
+        """Kill the worker and every process it started."""
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.process.wait()
+        for pipe in (self.process.stdin, self.process.stdout):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+    def _read_line(self, timeout: Optional[float], token: Optional[CancellationToken]) -> Optional[bytes]:
+        """Read one protocol line, or None if the timeout or the token stopped the wait."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.process.stdout, selectors.EVENT_READ)
+            while True:
+                wait = POLL_INTERVAL if token is not None else None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    wait = remaining if wait is None else min(wait, remaining)
+                if selector.select(wait):
+                    return self.process.stdout.readline()
+                if token is not None and token.cancelled:
+                    return None
+
+    def wait_ready(self) -> None:
+        if self.ready:
+            return
+        line = self._read_line(START_TIMEOUT, None)
+        if not line:
+            raise SandboxError("The sandbox worker failed to start")
+        self.ready = True
+
+    def request(self, line: bytes, timeout: float, token: Optional[CancellationToken]) -> Optional[Dict[str, Any]]:
+        self.wait_ready()
+        self.tasks += 1
+        self.process.stdin.write(line)
+        self.process.stdin.flush()
+        reply = self._read_line(timeout, token)
+        if reply is None:
+            return None
+        if not reply:
+            raise SandboxError(_exit_reason(self.process.wait()))
+        return json.loads(reply)
+
+
+def _exit_reason(returncode: int) -> str:
+    if returncode == -signal.SIGXCPU:
+        return "The tool exceeded its CPU time limit"
+    if returncode < 0:
+        return f"The sandbox worker was killed by signal {-returncode}"
+    return f"The sandbox worker exited with status {returncode}"
+
+
+class SandboxPool:
+    """Pool of warm worker processes running sandboxed tool calls."""
+
+    def __init__(self, size: int = 2, limits: SandboxLimits = DEFAULT_LIMITS, preload: Iterable[str] = (),
+                 max_tasks_per_worker: int = 100, python: str = sys.executable):
+        """
+        Initialize the pool; workers are started on first use or by ``start``.
+
+        Arguments:
+            size: Number of worker processes, and so of concurrent sandboxed calls
+            limits: Limits of calls whose tool does not set its own
+            preload: Modules imported by every worker when it starts, e.g. the tool modules
+            max_tasks_per_worker: Calls after which a worker is replaced by a fresh one
+            python: The Python interpreter of the workers
+        """
+        if resource is None:  # pragma: no cover - not available on Windows
+            raise SandboxError("Sandboxed tools need a POSIX system")
+        self.size = size
+        self.limits = limits
+        self.preload = tuple(preload)
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.python = python
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers = set()
+        self._started = False
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self.python, self.preload)
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _retire(self, worker: _Worker) -> None:
+        worker.kill()
+        with self._lock:
+            self._workers.discard(worker)
+            closed = self._closed
+        if not closed:
+            # The replacement starts up while the pool serves other calls
+            self._idle.put(self._spawn())
+
+    def _acquire(self, token: Optional[CancellationToken]) -> _Worker:
+        """Take an idle worker, waiting while all of them are busy or starting."""
+        deadline = time.monotonic() + ACQUIRE_TIMEOUT
+        while True:
+            if token is not None:
+                token.raise_if_cancelled()
+            if self._closed:
+                raise SandboxError("The sandbox pool is closed")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise SandboxError(f"No sandbox worker became free within {ACQUIRE_TIMEOUT} seconds")
+            try:
+                return self._idle.get(timeout=min(POLL_INTERVAL, remaining))
+            except queue.Empty:
+                continue
+
+    def start(self) -> "SandboxPool":
+        """Start the worker processes."""
+        with self._lock:
+            if self._started:
+                return self
+            self._started = True
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+        return self
+
+    def call(self, func: Callable, arguments: Dict[str, Any], limits: Optional[SandboxLimits] = None,
+             token: Optional[CancellationToken] = None) -> Any:
+        """
+        Run a function in a worker process.
+
+        Arguments:
+            func: A function defined at module level of an importable module
+            arguments: JSON keyword arguments, decoded into the parameter types by the worker
+            limits: Limits of this call; the pool's limits if omitted
+            token: Kills the call's worker when cancelled or at its deadline
+
+        Returns:
+            The rendered return value; with captured output, a dict of the result and the output
+
+        Raises:
+            SandboxError: If the arguments are not JSON, the tool raised, exceeded a limit,
+                its worker died or no worker became free
+            ToolTimeoutError: If the wall clock limit expired
+            CancellationError: If the token was cancelled or its deadline passed
+        """
+        if self._closed:
+            raise SandboxError("The sandbox pool is closed")
+        module, qualname = func.__module__, func.__qualname__
+        if module == "__main__" or "<locals>" in qualname:
+            raise SandboxError(f"Sandboxed tool {qualname} must be defined at module level of an importable module")
+        limits = limits or self.limits
+        payload = {
+            "module": module, "qualname": qualname,
+            "arguments": {name: value for name, value in arguments.items() if name not in injected_parameters(func)},
+            "limits": asdict(limits),
+        }
+        try:
+            line = json.dumps(payload).encode("utf-8") + b"\n"
+        except (TypeError, ValueError) as e:
+            raise SandboxError(f"Arguments of sandboxed tool {qualname} are not JSON: {e}") from None
+
+        self.start()
+        worker = self._acquire(token)
+        try:
+            response = worker.request(line, limits.wall_seconds, token)
+        except BaseException:
+            self._retire(worker)
+            raise
+        if response is None:
+            self._retire(worker)
+            if token is not None:
+                token.raise_if_cancelled()
+            raise ToolTimeoutError(f"Timed out after {limits.wall_seconds} seconds")
+        if response.get("recycle") or worker.tasks >= self.max_tasks_per_worker:
+            self._retire(worker)
+        else:
+            self._idle.put(worker)
+        if "error" in response:
+            raise SandboxError(response["error"])
+        return combine_result(response.get("content"), response.get("output", ""))
+
+    def close(self) -> None:
+        """Kill every worker."""
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.kill()
+
+    def __enter__(self) -> "SandboxPool":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+_default_pool: Optional[SandboxPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool() -> SandboxPool:
+    """Get the process-wide pool used by dispatchers without their own, creating it on first use."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            import atexit
+            _default_pool = SandboxPool()
+            atexit.register(_default_pool.close)
+        return _default_pool
+
+
+# Worker process
+
+
+class _CpuLimitExceeded(BaseException):
+    pass
+
+
+def _raise_cpu_limit(signum, frame):
+    raise _CpuLimitExceeded()
+
+
+@lru_cache(maxsize=256)
+def _resolve(module: str, qualname: str) -> Tuple[Callable, Optional[Callable[[Dict[str, Any]], Dict[str, Any]]]]:
+    """Import a tool and build the decoder of its JSON arguments once per worker."""
+    target = importlib.import_module(module)
+    for part in qualname.split("."):
+        target = getattr(target, part)
+    return target, build_argument_decoder(target)
+
+
+def _capture_reader(read_fd: int, buffer: CappedBuffer) -> None:
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    try:
+        while True:
+            chunk = os.read(read_fd, 65536)
+            if not chunk:
+                break
+            buffer.write(decoder.decode(chunk))
+    except OSError:
+        pass
+    buffer.write(decoder.decode(b"", final=True))
+
+
+def _run_task(task: Dict[str, Any], devnull: int) -> Dict[str, Any]:
+    limits = replace(DEFAULT_LIMITS, **task.get("limits", {}))
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, cpu_hard = resource.getrlimit(resource.RLIMIT_CPU)
+    cpu_limit = int(usage.ru_utime + usage.ru_stime + limits.cpu_seconds) + 1
+    if cpu_hard != resource.RLIM_INFINITY:
+        cpu_limit = min(cpu_limit, cpu_hard)
+    _, memory_hard = resource.getrlimit(resource.RLIMIT_AS)
+
+    buffer = CappedBuffer(limits.max_output_bytes)
+    read_fd, write_fd = os.pipe()
+    reader = threading.Thread(target=_capture_reader, args=(read_fd, buffer), daemon=True)
+    reader.start()
+    os.dup2(write_fd, 1)
+    os.dup2(write_fd, 2)
+    os.close(write_fd)
+
+    response: Dict[str, Any] = {}
+    try:
+        func, decode_args = _resolve(task["module"], task["qualname"])
+        arguments = dict(task["arguments"])
+        if decode_args is not None:
+            arguments = decode_args(arguments)
+        for name in injected_parameters(func):
+            arguments[name] = CancellationToken(timeout=limits.wall_seconds)
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, cpu_hard))
+        if limits.memory_bytes is not None:
+            memory_limit = limits.memory_bytes
+            if memory_hard != resource.RLIM_INFINITY:
+                memory_limit = min(memory_limit, memory_hard)
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_hard))
+        try:
+            value = func(**arguments)
+            response["content"] = None if value is None else render_tool_output(value, limits.max_output_bytes)
+        finally:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_hard, memory_hard))
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_hard, cpu_hard))
+    except _CpuLimitExceeded:
+        response = {"error": "The tool exceeded its CPU time limit", "recycle": True}
+    except MemoryError:
+        response = {"error": "The tool exceeded its memory limit", "recycle": True}
+    except Exception as e:
+        response = {"error": f"{type(e).__name__}: {e}"}
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(devnull, 1)
+        os.dup2(devnull, 2)
+        # A background process still holding the pipe must not block the reply
+        reader.join(timeout=1.0)
+        if reader.is_alive():
+            response["recycle"] = True
+        else:
+            os.close(read_fd)
+    response["output"] = buffer.getvalue()
+    return response
+
+
+def _worker_main(config: Dict[str, Any]) -> None:
+    """Serve requests from the host on stdin until it closes the pipe."""
+    protocol_in = os.fdopen(os.dup(0), "rb")
+    protocol_out = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    # Tools must neither read the requests nor write into the replies
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    signal.signal(signal.SIGXCPU, _raise_cpu_limit)
+    for module in config.get("preload", ()):
+        importlib.import_module(module)
+
+    protocol_out.write(b'{"ready": true}\n')
+    protocol_out.flush()
+    for line in protocol_in:
+        response = _run_task(json.loads(line), devnull)
+        try:
+            protocol_out.write(json.dumps(response, default=str).encode("utf-8") + b"\n")
+            protocol_out.flush()
+        except BrokenPipeError:
+            return
+        if response.get("recycle"):
+            return
+
+
+if __name__ == "__main__":
+    _worker_main(json.loads(sys.argv[1]) if len(sys.argv) > 1 else {})
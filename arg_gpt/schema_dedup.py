@@ -0,0 +1,269 @@
+"""
+Module for deduplicating schemas across a tool registry.
+
+Tools that share parameter types repeat the same nested schema many times. This module
+finds structurally identical subschemas across the whole registry, hoists repeated ones
+into ``$defs`` and hash-conses the resulting payload so identical fragments are a single
+shared dict in memory.
+
+Provider tool schemas must resolve ``$ref`` within their own parameters, so a shared
+definition is emitted once per tool that uses it rather than once per payload; a
+definition is only hoisted into a tool where that saves bytes.
+"""
+
+import hashlib
+import json
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from .gpt_helpers import create_tools_dict
+
+# Subschemas smaller than this are never considered for sharing
+DEFAULT_MIN_BYTES = 48
+# Approximate size of a {"$ref": "#/$defs/Name"} reference and of a definition's key
+_REF_BYTES = 32
+
+_SCHEMA_MAPS = ("properties", "$defs", "definitions", "patternProperties")
+_SCHEMA_LISTS = ("anyOf", "oneOf", "allOf", "prefixItems")
+_SCHEMA_VALUES = ("items", "additionalProperties", "not")
+
+
+def canonical_json(value: Any) -> str:
+    """Serialize a value with sorted keys and no whitespace, so equal schemas give equal text."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def payload_bytes(value: Any) -> int:
+    """Size of a value serialized as compact JSON."""
+    return len(json.dumps(value, separators=(",", ":"), default=str).encode("utf-8"))
+
+
+def iter_subschemas(schema: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over the nested schemas of a schema, depth first, excluding itself.
+
+    Arguments:
+        schema: A JSON schema
+
+    Yields:
+        Every nested schema dict
+    """
+    for key, value in schema.items():
+        if key in _SCHEMA_MAPS and isinstance(value, dict):
+            children = value.values()
+        elif key in _SCHEMA_LISTS and isinstance(value, list):
+            children = value
+        elif key in _SCHEMA_VALUES:
+            children = value if isinstance(value, list) else [value]
+        else:
+            continue
+        for child in children:
+            if isinstance(child, dict):
+                yield child
+                yield from iter_subschemas(child)
+
+
+def _map_children(schema: Dict[str, Any], transform) -> Dict[str, Any]:
+    result = {}
+    for key, value in schema.items():
+        if key in _SCHEMA_MAPS and isinstance(value, dict):
+            value = {name: transform(child) if isinstance(child, dict) else child for name, child in value.items()}
+        elif key in _SCHEMA_LISTS and isinstance(value, list):
+            value = [transform(child) if isinstance(child, dict) else child for child in value]
+        elif key in _SCHEMA_VALUES:
+            if isinstance(value, list):
+                value = [transform(child) if isinstance(child, dict) else child for child in value]
+            elif isinstance(value, dict):
+                value = transform(value)
+        result[key] = value
+    return result
+
+
+class SchemaInterner:
+    """
+    Hash-conses JSON fragments so structurally identical dicts and lists are shared.
+
+    Interned fragments are shared between tools and must be treated as read-only.
+    """
+
+    def __init__(self):
+        self._fragments: Dict[Tuple, Any] = {}
+        self.seen = 0
+
+    def __len__(self) -> int:
+        return len(self._fragments)
+
+    def intern(self, value: Any) -> Any:
+        """
+        Get the shared instance of a JSON value.
+
+        Arguments:
+            value: A JSON value made of dicts, lists and scalars
+
+        Returns:
+            A structurally equal value whose dicts and lists are shared instances
+        """
+        if isinstance(value, dict):
+            items = tuple((key, self.intern(item)) for key, item in value.items())
+            key = ("d",) + tuple((name, self._key(item)) for name, item in items)
+            factory = lambda: dict(items)
+        elif isinstance(value, list):
+            items = [self.intern(item) for item in value]
+            key = ("l",) + tuple(self._key(item) for item in items)
+            factory = lambda: items
+        elif isinstance(value, str):
+            return sys.intern(value)
+        else:
+            return value
+        self.seen += 1
+        shared = self._fragments.get(key)
+        if shared is None:
+            shared = self._fragments[key] = factory()
+        return shared
+
+    @staticmethod
+    def _key(item: Any) -> Any:
+        # Interned containers are identified by identity, scalars by type and value
+        if isinstance(item, (dict, list)):
+            return ("ref", id(item))
+        return (type(item).__name__, item)
+
+
+@dataclass
+class PayloadStats:
+    """Size and sharing statistics of a deduplicated tools payload."""
+    original_bytes: int = 0
+    payload_bytes: int = 0
+    shared_definitions: int = 0
+    fragments: int = 0
+    unique_fragments: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        """Bytes removed from the serialized payload."""
+        return self.original_bytes - self.payload_bytes
+
+
+def _definition_name(schema: Dict[str, Any], canonical: str, taken: Dict[str, str]) -> str:
+    base = schema.get("title") or "Schema" + hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:8]
+    name, index = base, 2
+    while name in taken and taken[name] != canonical:
+        name = f"{base}{index}"
+        index += 1
+    return name
+
+
+def _deduplicate_parameters(parameters: Dict[str, Any], candidates: Set[str]) -> Tuple[Dict[str, Any], int]:
+    """Hoist subschemas repeated within one tool's parameters into its $defs."""
+    defs = dict(parameters.get("$defs", {}))
+    names = {canonical_json(schema): name for name, schema in defs.items()}
+    taken = {name: text for text, name in names.items()}
+
+    counts: Dict[str, int] = {}
+    for schema in iter_subschemas({key: value for key, value in parameters.items() if key != "$defs"}):
+        text = canonical_json(schema)
+        if text in candidates:
+            counts[text] = counts.get(text, 0) + 1
+    for schema in defs.values():
+        for nested in iter_subschemas(schema):
+            text = canonical_json(nested)
+            if text in candidates:
+                counts[text] = counts.get(text, 0) + 1
+
+    # Decide from the largest schema down: hoisting a schema leaves a single copy of
+    # everything nested in it, which may make hoisting the nested schemas pointless
+    hoisted = set()
+    for text in sorted(counts, key=len, reverse=True):
+        count = counts[text]
+        if text not in names and (count < 2 or len(text) * (count - 1) <= (count + 1) * _REF_BYTES):
+            continue
+        hoisted.add(text)
+        if count > 1:
+            for nested in iter_subschemas(json.loads(text)):
+                nested_text = canonical_json(nested)
+                if nested_text in counts:
+                    counts[nested_text] -= count - 1
+    if not hoisted:
+        return parameters, 0
+
+    def replace(schema):
+        text = canonical_json(schema)
+        if text in hoisted:
+            name = names.get(text)
+            if name is None:
+                name = names[text] = _definition_name(schema, text, taken)
+                taken[name] = text
+                defs[name] = rewrite(schema)
+            return {"$ref": f"#/$defs/{name}"}
+        return rewrite(schema)
+
+    def rewrite(schema):
+        return _map_children(schema, replace)
+
+    result = rewrite({key: value for key, value in parameters.items() if key != "$defs"})
+    for name, schema in list(defs.items()):
+        defs[name] = rewrite(schema)
+    result["$defs"] = defs
+    added = len(defs) - len(parameters.get("$defs", {}))
+    return result, added
+
+
+def deduplicate_tools(tools: List[Dict[str, Any]], min_bytes: int = DEFAULT_MIN_BYTES,
+                      interner: Optional[SchemaInterner] = None) -> Tuple[List[Dict[str, Any]], PayloadStats]:
+    """
+    Deduplicate the schemas of a tools payload.
+
+    Arguments:
+        tools: Tools payload as built by create_tools_dict
+        min_bytes: Minimum serialized size of a subschema worth sharing
+        interner: Interner to share fragments with, e.g. across payload builds
+
+    Returns:
+        The deduplicated, interned tools payload and its statistics
+    """
+    interner = interner or SchemaInterner()
+    stats = PayloadStats(original_bytes=payload_bytes(tools))
+
+    # Count structurally identical subschemas across the whole registry
+    counts: Dict[str, int] = {}
+    for tool in tools:
+        parameters = tool.get("function", {}).get("parameters")
+        if not isinstance(parameters, dict):
+            continue
+        for schema in iter_subschemas(parameters):
+            text = canonical_json(schema)
+            if len(text) >= min_bytes:
+                counts[text] = counts.get(text, 0) + 1
+    candidates = {text for text, count in counts.items() if count > 1}
+
+    result = []
+    for tool in tools:
+        function = tool.get("function", {})
+        parameters = function.get("parameters")
+        if isinstance(parameters, dict) and candidates:
+            parameters, added = _deduplicate_parameters(parameters, candidates)
+            stats.shared_definitions += added
+            tool = {**tool, "function": {**function, "parameters": parameters}}
+        result.append(tool)
+
+    seen_before = interner.seen
+    result = [interner.intern(tool) for tool in result]
+    stats.fragments = interner.seen - seen_before
+    stats.unique_fragments = len(interner)
+    stats.payload_bytes = payload_bytes(result)
+    return result, stats
+
+
+def build_tools_payload(functions, min_bytes: int = DEFAULT_MIN_BYTES) -> Tuple[List[Dict[str, Any]], PayloadStats]:
+    """
+    Build a deduplicated tools payload for a list of functions.
+
+    Arguments:
+        functions: The functions to expose
+        min_bytes: Minimum serialized size of a subschema worth sharing
+
+    Returns:
+        The tools payload and its statistics
+    """
+    return deduplicate_tools(create_tools_dict(functions), min_bytes)
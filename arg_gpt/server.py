@@ -0,0 +1,311 @@
+"""
+Module for serving registered tools and conversations over HTTP.
+
+The server loads the tool registry once and keeps a ConversationRunner warm, so every
+request reuses the same client connection pool, tool dispatcher and byte-stable tools
+payload instead of paying process startup, imports and schema reflection per prompt.
+
+Endpoints:
+    GET  /health          Liveness check
+    GET  /tools           The tools payload sent to the model
+    POST /conversations   Run one turn: {"prompt": ..., "messages": [...], "session_id": ...,
+                          "stream": bool, "timeout": seconds}
+
+POST bodies must be sent as ``application/json``, which a browser cannot send cross-site
+without a CORS preflight the server never answers. With an ``auth_token`` every endpoint
+but /health also requires an ``Authorization: Bearer <token>`` header. Client supplied
+``messages`` may only hold user, assistant and tool messages; the system prompts are the
+server's.
+
+With ``"stream": true`` the turn is sent as server-sent events: one ``message`` event per
+new message as soon as it is available, then a ``done`` event with the result. Every turn
+runs with a CancellationToken: its deadline is the request's ``timeout``, and a client
+that disconnects cancels it, so neither the completion nor the remaining tools keep
+running for nobody. Streaming turns notice when an event cannot be written; while a
+plain turn runs, the connection is watched for the client closing it.
+"""
+
+import hmac
+import json
+import logging
+import select
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from .cancellation import CancellationError, CancellationToken, DeadlineExceeded
+from .conversation import ConversationRunner, message_content
+from .gpt_helpers import DEFAULT_MODEL
+from .session_store import SessionStore, serialize_message
+
+log = logging.getLogger(__name__)
+
+# Number of earlier turns of a session sent with a new prompt
+DEFAULT_HISTORY_TURNS = 8
+# Largest accepted request body
+MAX_REQUEST_BYTES = 1024 * 1024
+# Seconds between checks whether the client of a plain turn has disconnected
+DISCONNECT_POLL_INTERVAL = 0.1
+# Roles a client may send in "messages"; system prompts only come from the server
+CLIENT_ROLES = frozenset(("user", "assistant", "tool"))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "ArgGpt/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        log.debug("%s - %s", self.address_string(), format % args)
+
+    def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_event(self, event: str, payload: Any) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.wfile.write(b"event: " + event.encode("ascii") + b"\ndata: " + data + b"\n\n")
+        self.wfile.flush()
+
+    def _client_disconnected(self) -> bool:
+        """Check without blocking whether the client has closed the connection."""
+        try:
+            readable, _, _ = select.select([self.connection], [], [], 0)
+            # A readable socket with nothing to read has reached end of file
+            return bool(readable) and not self.connection.recv(1, socket.MSG_PEEK)
+        except (OSError, ValueError):
+            return True
+
+    def _watch_disconnect(self, token: CancellationToken, done: threading.Event) -> None:
+        """Cancel the token if the client disconnects before the turn is done."""
+        while not done.wait(DISCONNECT_POLL_INTERVAL):
+            if self._client_disconnected():
+                log.info("Client disconnected, cancelling the turn")
+                token.cancel("client disconnected")
+                return
+
+    def _authorized(self) -> bool:
+        """Check the bearer token if the server has one, answering 401 otherwise."""
+        expected = self.server.tool_server.auth_token
+        if expected is None:
+            return True
+        scheme, _, credentials = self.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and hmac.compare_digest(credentials.strip().encode(), expected.encode()):
+            return True
+        self._send_json(401, {"error": {"message": "Unauthorized"}}, {"WWW-Authenticate": "Bearer"})
+        return False
+
+    def _read_json(self) -> Optional[Dict[str, Any]]:
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            self._send_json(415, {"error": {"message": "Content-Type must be application/json"}})
+            return None
+        try:
+            length = int(self.headers["Content-Length"])
+        except (TypeError, ValueError):
+            self._send_json(400, {"error": {"message": "A numeric Content-Length is required"}})
+            return None
+        if length < 0:
+            self._send_json(400, {"error": {"message": "A numeric Content-Length is required"}})
+            return None
+        if length > MAX_REQUEST_BYTES:
+            self._send_json(413, {"error": {"message": "Request too large"}})
+            return None
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            self._send_json(400, {"error": {"message": f"Invalid JSON - {e}"}})
+            return None
+        if not isinstance(request, dict) or not isinstance(request.get("prompt"), str):
+            self._send_json(400, {"error": {"message": "Expected an object with a string 'prompt'"}})
+            return None
+        timeout = request.get("timeout")
+        if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0):
+            self._send_json(400, {"error": {"message": "'timeout' must be a positive number of seconds"}})
+            return None
+        messages = request.get("messages")
+        if messages is not None and not (
+            isinstance(messages, list)
+            and all(isinstance(message, dict) and message.get("role") in CLIENT_ROLES for message in messages)
+        ):
+            roles = ", ".join(sorted(CLIENT_ROLES))
+            self._send_json(400, {"error": {"message": f"'messages' must be a list of objects with a role of {roles}"}})
+            return None
+        return request
+
+    def do_GET(self):
+        server: ToolServer = self.server.tool_server
+        path = self.path.rstrip("/")
+        if path == "/health":
+            self._send_json(200, {"status": "ok", "tools": len(server.runner.functions)})
+        elif not self._authorized():
+            return
+        elif path == "/tools":
+            self._send_json(200, server.runner.prefix.tools)
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        server: ToolServer = self.server.tool_server
+        if not self._authorized():
+            return
+        if self.path.rstrip("/") != "/conversations":
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+        request = self._read_json()
+        if request is None:
+            return
+
+        session_id = request.get("session_id")
+        history = request.get("messages") or server.history(session_id)
+        token = CancellationToken(timeout=request.get("timeout"))
+        turn = server.runner.iter_turn(request["prompt"], history, session_id, token)
+
+        if not request.get("stream"):
+            done = threading.Event()
+            watcher = threading.Thread(target=self._watch_disconnect, args=(token, done), daemon=True)
+            watcher.start()
+            try:
+                messages = [serialize_message(message) for message in turn]
+            except DeadlineExceeded:
+                self._send_json(504, {"error": {"message": "Deadline exceeded"}})
+                return
+            except CancellationError:
+                # Only a disconnect cancels a plain turn, and nobody is left to answer
+                self.close_connection = True
+                return
+            except Exception as e:
+                log.exception("Conversation failed")
+                self._send_json(502, {"error": {"message": str(e)}})
+                return
+            finally:
+                done.set()
+                watcher.join()
+            if token.cancelled and not token.expired:
+                # The client left while the tools ran; their cancelled results are not a turn
+                self.close_connection = True
+                return
+            server.save(session_id, messages)
+            self._send_json(200, {"messages": messages, "result": message_content(messages[-1])})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        messages = []
+        try:
+            for message in turn:
+                message = serialize_message(message)
+                messages.append(message)
+                self._send_event("message", message)
+        except (BrokenPipeError, ConnectionResetError):
+            log.info("Client disconnected, cancelling the turn")
+            token.cancel("client disconnected")
+            turn.close()
+            return
+        except CancellationError as e:
+            self._send_event("error", {"message": str(e)})
+            return
+        except Exception as e:
+            log.exception("Conversation failed")
+            self._send_event("error", {"message": str(e)})
+            return
+        server.save(session_id, messages)
+        self._send_event("done", {"result": message_content(messages[-1])})
+
+
+class ToolServer:
+    """HTTP server running conversations against a warm ConversationRunner."""
+
+    def __init__(self, runner: ConversationRunner, host: str = "127.0.0.1", port: int = 8000,
+                 session_store: Optional[SessionStore] = None, history_turns: int = DEFAULT_HISTORY_TURNS,
+                 auth_token: Optional[str] = None):
+        """
+        Initialize the server.
+
+        Arguments:
+            runner: The runner every request is served with
+            host: Interface to bind
+            port: Port to bind; 0 picks a free port
+            session_store: Store used to resume conversations by session_id
+            history_turns: Number of earlier turns of a session sent with a new prompt
+            auth_token: Bearer token required by every endpoint but /health
+        """
+        self.runner = runner
+        self.auth_token = auth_token
+        self.session_store = session_store
+        self.history_turns = history_turns
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.tool_server = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server."""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def history(self, session_id: Optional[str]):
+        """Load the recent turns of a session, or nothing without a store or session."""
+        if self.session_store is None or not session_id:
+            return []
+        return self.session_store.load_turns(session_id, self.history_turns)
+
+    def save(self, session_id: Optional[str], messages) -> None:
+        """Append a turn's messages to a session if a store is configured."""
+        if self.session_store is not None and session_id:
+            self.session_store.append(session_id, messages)
+
+    def serve_forever(self) -> None:
+        """Serve requests on the calling thread until shutdown."""
+        log.info("Serving %d tools on %s", len(self.runner.functions), self.url)
+        self.httpd.serve_forever()
+
+    def start(self) -> "ToolServer":
+        """Start serving on a background thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="arg_gpt_server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the server."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "ToolServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def create_server(functions: Iterable[callable], client_factory: Callable[[], Any], model: str = DEFAULT_MODEL,
+                  host: str = "127.0.0.1", port: int = 8000, **options) -> ToolServer:
+    """
+    Build a server for a tool set, creating the client and cached schemas up front.
+
+    Arguments:
+        functions: The functions exposed to the model
+        client_factory: Creates the OpenAI compatible client, e.g. ``openai.OpenAI``
+        model: The model to use
+        host: Interface to bind
+        port: Port to bind
+        options: Further ToolServer arguments
+
+    Returns:
+        The server, not yet started
+    """
+    runner = ConversationRunner(client_factory(), functions, model=model)
+    return ToolServer(runner, host=host, port=port, **options)
@@ -0,0 +1,327 @@
+"""
+Module for persisting conversations so a worker can resume them after a restart.
+
+Stores keep every session as an append-only sequence of provider payload dicts: SDK
+message objects such as ``ChatCompletionMessage`` are serialized on the way in, and the
+dict tool messages from ``interpret_response`` are stored as they are. Appends only write
+the new messages, and loads read backwards from the end of a session so that resuming
+the most recent turns costs time proportional to those turns, not the whole history.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import quote
+
+from .messages import Message, to_messages
+
+log = logging.getLogger(__name__)
+
+# Block size used when reading JSONL session files backwards
+_READ_BLOCK = 64 * 1024
+
+
+def _to_plain(value: Any) -> Any:
+    """Convert SDK objects nested in a message into JSON compatible values."""
+    if isinstance(value, dict):
+        return {key: _to_plain(item) for key, item in value.items() if item is not None}
+    if isinstance(value, (list, tuple)):
+        return [_to_plain(item) for item in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if hasattr(value, "to_payload"):
+        return _to_plain(value.to_payload())
+    if hasattr(value, "model_dump"):
+        return _to_plain(value.model_dump(exclude_none=True))
+    if hasattr(value, "__dict__"):
+        return _to_plain({key: item for key, item in vars(value).items() if not key.startswith("_")})
+    return str(value)
+
+
+def serialize_message(message: Any) -> Dict[str, Any]:
+    """
+    Convert a conversation message into a provider payload dict.
+
+    Arguments:
+        message: A message dict or an SDK message object such as ChatCompletionMessage
+
+    Returns:
+        A JSON compatible dict that can be sent back to the provider
+    """
+    return _to_plain(message)
+
+
+class SessionStore(ABC):
+    """
+    Base class of conversation stores.
+
+    Subclasses implement ``append``, ``iter_reversed`` and ``delete``; loading the most
+    recent messages or turns is built on reading a session backwards.
+    """
+
+    @abstractmethod
+    def append(self, session_id: str, messages: Iterable[Any]) -> None:
+        """
+        Append messages to a session.
+
+        Arguments:
+            session_id: The session to append to; created if it doesn't exist
+            messages: Message dicts or SDK message objects
+        """
+
+    @abstractmethod
+    def iter_reversed(self, session_id: str) -> Iterator[Dict[str, Any]]:
+        """Iterate lazily over a session's messages, newest first."""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Delete a session."""
+
+    def load(self, session_id: str, last: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Load a session's messages in conversation order.
+
+        Arguments:
+            session_id: The session to load
+            last: Only load this many of the most recent messages
+
+        Returns:
+            The messages, oldest first; empty for an unknown session
+        """
+        messages = list(islice(self.iter_reversed(session_id), last))
+        messages.reverse()
+        return messages
+
+    def load_turns(self, session_id: str, turns: int) -> List[Dict[str, Any]]:
+        """
+        Load the most recent turns of a session.
+
+        A turn starts at a user message, so assistant tool calls are never separated
+        from the tool messages answering them.
+
+        Arguments:
+            session_id: The session to load
+            turns: Number of turns to load
+
+        Returns:
+            The messages of those turns, oldest first
+        """
+        messages = []
+        for message in self.iter_reversed(session_id):
+            messages.append(message)
+            if message.get("role") == "user":
+                turns -= 1
+                if turns <= 0:
+                    break
+        messages.reverse()
+        return messages
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Process-local store keeping the most recently used sessions.
+
+    Messages are kept as compact Message instances and converted back to payload dicts
+    only as they are loaded.
+    """
+
+    def __init__(self, max_sessions: int = 1024):
+        """
+        Initialize the store.
+
+        Arguments:
+            max_sessions: Number of sessions kept before the least recently used is evicted
+        """
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, List[Message]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def append(self, session_id: str, messages: Iterable[Any]) -> None:
+        compact = to_messages(list(messages))
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = []
+            else:
+                self._sessions.move_to_end(session_id)
+            session.extend(compact)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def iter_reversed(self, session_id: str) -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return iter(())
+            self._sessions.move_to_end(session_id)
+            session = list(session)
+        return (serialize_message(message) for message in reversed(session))
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Store keeping every session in one SQLite database."""
+
+    def __init__(self, path: str):
+        """
+        Initialize the store, creating its table if needed.
+
+        Arguments:
+            path: Path of the SQLite database file
+        """
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "session_id TEXT NOT NULL, seq INTEGER NOT NULL, payload TEXT NOT NULL, "
+            "PRIMARY KEY (session_id, seq))"
+        )
+        self._lock = threading.Lock()
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM messages WHERE session_id = ? LIMIT 1", (session_id,)
+            ).fetchone()
+        return row is not None
+
+    def append(self, session_id: str, messages: Iterable[Any]) -> None:
+        payloads = [json.dumps(serialize_message(message)) for message in messages]
+        if not payloads:
+            return
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                (last_seq,) = self._connection.execute(
+                    "SELECT COALESCE(MAX(seq), -1) FROM messages WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                self._connection.executemany(
+                    "INSERT INTO messages VALUES (?, ?, ?)",
+                    [(session_id, last_seq + 1 + index, payload) for index, payload in enumerate(payloads)]
+                )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def iter_reversed(self, session_id: str) -> Iterator[Dict[str, Any]]:
+        # Fetch in pages so a short resume does not read the whole session
+        upper = None
+        page = 64
+        while True:
+            with self._lock:
+                if upper is None:
+                    rows = self._connection.execute(
+                        "SELECT seq, payload FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+                        (session_id, page)
+                    ).fetchall()
+                else:
+                    rows = self._connection.execute(
+                        "SELECT seq, payload FROM messages WHERE session_id = ? AND seq < ? "
+                        "ORDER BY seq DESC LIMIT ?",
+                        (session_id, upper, page)
+                    ).fetchall()
+            for seq, payload in rows:
+                yield json.loads(payload)
+            if len(rows) < page:
+                return
+            upper = rows[-1][0]
+            page = min(page * 2, 4096)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._connection.close()
+
+
+class JsonlSessionStore(SessionStore):
+    """Store keeping each session as an append-only JSON lines file."""
+
+    def __init__(self, directory: str):
+        """
+        Initialize the store.
+
+        Arguments:
+            directory: Directory holding one ``.jsonl`` file per session; created if needed
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def path(self, session_id: str) -> str:
+        """Get the file path of a session."""
+        return os.path.join(self.directory, quote(session_id, safe="") + ".jsonl")
+
+    def __contains__(self, session_id: str) -> bool:
+        return os.path.exists(self.path(session_id))
+
+    def append(self, session_id: str, messages: Iterable[Any]) -> None:
+        data = "".join(json.dumps(serialize_message(message)) + "\n" for message in messages)
+        if not data:
+            return
+        with self._lock:
+            with open(self.path(session_id), "a+b") as file:
+                # A line left incomplete by a crash would otherwise swallow the next message
+                size = file.seek(0, os.SEEK_END)
+                if size:
+                    file.seek(size - 1)
+                    if file.read(1) != b"\n":
+                        log.warning("Dropping the incomplete last line of session %s", session_id)
+                        file.truncate(size - len(next(_reversed_lines(file, size))))
+                file.write(data.encode("utf-8"))
+
+    def iter_reversed(self, session_id: str) -> Iterator[Dict[str, Any]]:
+        try:
+            file = open(self.path(session_id), "rb")
+        except FileNotFoundError:
+            return
+        with file:
+            size = file.seek(0, os.SEEK_END)
+            if not size:
+                return
+            file.seek(size - 1)
+            # The file ends in the middle of a line when a crash interrupted an append
+            torn = file.read(1) != b"\n"
+            for line in _reversed_lines(file, size):
+                if torn:
+                    torn = False
+                    log.warning("Skipping the incomplete last line of session %s", session_id)
+                elif line.strip():
+                    yield json.loads(line)
+
+    def delete(self, session_id: str) -> None:
+        try:
+            os.remove(self.path(session_id))
+        except FileNotFoundError:
+            pass
+
+
+def _reversed_lines(file, size: int) -> Iterator[bytes]:
+    """Iterate over the lines of a binary file backwards, starting with the piece after the last newline."""
+    position = size
+    remainder = b""
+    while position > 0:
+        block = min(_READ_BLOCK, position)
+        position -= block
+        file.seek(position)
+        lines = (file.read(block) + remainder).split(b"\n")
+        # The first piece may be the end of a line that starts in an earlier block
+        remainder = lines.pop(0)
+        yield from reversed(lines)
+    yield remainder
@@ -0,0 +1,300 @@
+"""
+Module for speculative execution of tools from streamed tool call arguments.
+
+When a completion is streamed, the tool call name and its argument fragments arrive
+well before the message is finished. Tools marked ``@ai_func(speculative=True)`` are
+read-only and idempotent, so they can be started as soon as every argument's value has
+been fully received, even before the argument object closes, or once it has closed with
+the required ones present. When the stream ends the final arguments are compared with
+the speculated ones: a match reuses the early result, a mismatch discards it and
+runs the call normally. Speculative calls go through the dispatcher like any other,
+so their arguments are decoded, tokens injected and circuit breakers consulted before
+they start; tools that run in a sandbox or on a backend are never speculated.
+"""
+
+import inspect
+import json
+import logging
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from .cancellation import CancellationToken
+from .dispatcher import ToolCall, ToolDispatcher, ToolEntry, get_dispatcher
+from .gpt_helpers import DEFAULT_MODEL, create_tools_dict
+
+log = logging.getLogger(__name__)
+
+SPECULATION_WORKERS = 8
+
+_default_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_default_executor() -> ThreadPoolExecutor:
+    global _default_executor
+    if _default_executor is None:
+        _default_executor = ThreadPoolExecutor(
+            max_workers=SPECULATION_WORKERS,
+            thread_name_prefix="arg_gpt_speculative"
+        )
+    return _default_executor
+
+
+def _scan_fields(partial: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """Parse the complete fields of a JSON object prefix and report whether it is closed."""
+    text = partial.lstrip()
+    if not text:
+        return {}, False
+    if text[0] != "{":
+        return None, False
+
+    depth = 0
+    in_string = False
+    escaped = False
+    awaiting_value = False
+    # Kind of the top-level value being received: "string", "container" or "scalar"
+    value_kind = None
+    value_start = 0
+    complete_end = None
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+                if depth == 1 and value_kind == "string":
+                    complete_end, value_kind = index + 1, None
+            continue
+        if value_kind == "scalar":
+            # A number may still gain digits until a delimiter arrives
+            if not (char.isspace() or char in ",}"):
+                continue
+            complete_end, value_kind = index, None
+        if depth == 1 and awaiting_value and not char.isspace():
+            awaiting_value = False
+            value_start = index
+            value_kind = "string" if char == '"' else "container" if char in "{[" else "scalar"
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                try:
+                    value = json.loads(text[:index + 1])
+                except ValueError:
+                    return None, False
+                return (value, True) if isinstance(value, dict) else (None, False)
+            if depth == 1 and value_kind == "container":
+                complete_end, value_kind = index + 1, None
+        elif char == ":" and depth == 1:
+            awaiting_value = True
+
+    if value_kind == "scalar" and text[value_start:] in ("true", "false", "null"):
+        complete_end = len(text)
+    if complete_end is None:
+        return {}, False
+    try:
+        return json.loads(text[:complete_end] + "}"), False
+    except ValueError:
+        return None, False
+
+
+def completed_fields(partial: str) -> Optional[Dict[str, Any]]:
+    """
+    Extract the fields of a partially streamed JSON object whose values are complete.
+
+    A top-level field is complete once its string, object or array has closed, its
+    literal is spelled out or its number is followed by a delimiter, so a value still
+    being streamed is never reported.
+
+    Arguments:
+        partial: The argument text received so far
+
+    Returns:
+        A dict of the complete fields, or None if the text is not a JSON object prefix
+    """
+    return _scan_fields(partial)[0]
+
+
+@dataclass
+class SpeculationStats:
+    """Counters describing how much speculative work was useful."""
+    started: int = 0
+    confirmed: int = 0
+    wasted: int = 0
+
+    @property
+    def wasted_ratio(self) -> float:
+        """Fraction of started speculative calls whose result was discarded."""
+        return self.wasted / self.started if self.started else 0.0
+
+
+@dataclass
+class _StreamedCall:
+    """Accumulated state of one streamed tool call."""
+    id: Optional[str] = None
+    name: str = ""
+    arguments: List[str] = field(default_factory=list)
+    # Resolves to the tool message of the speculative call
+    future: Optional[Future] = None
+    speculated_args: Optional[Dict[str, Any]] = None
+
+
+class SpeculativeToolRunner:
+    """Consumes a streamed completion and runs speculative tools early."""
+
+    def __init__(self, functions, executor: Optional[Executor] = None,
+                 stats: Optional[SpeculationStats] = None, token: Optional[CancellationToken] = None):
+        """
+        Initialize the runner.
+
+        Arguments:
+            functions: List of available functions, or a prebuilt ToolDispatcher
+            executor: Executor for speculative calls; a shared thread pool by default
+            stats: Counters to update; a new SpeculationStats by default
+            token: Cancels the turn's tool calls, speculative or not
+        """
+        self.dispatcher = functions if isinstance(functions, ToolDispatcher) else get_dispatcher(functions)
+        self.executor = executor or _get_default_executor()
+        self.stats = stats if stats is not None else SpeculationStats()
+        self.token = token
+        self.content: List[str] = []
+        self.calls: Dict[int, _StreamedCall] = {}
+        self._parameters: Dict[str, Tuple[FrozenSet[str], FrozenSet[str]]] = {}
+
+    def _parameter_names(self, entry: ToolEntry) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+        """Get the (all, required) keyword parameter names of a tool."""
+        name = entry.func.__name__
+        if name not in self._parameters:
+            params = [
+                param for param in inspect.signature(entry.func).parameters.values()
+                if param.kind not in (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD)
+                and param.name not in entry.injected
+            ]
+            self._parameters[name] = (
+                frozenset(param.name for param in params),
+                frozenset(param.name for param in params if param.default is inspect.Parameter.empty)
+            )
+        return self._parameters[name]
+
+    def feed(self, chunk) -> None:
+        """
+        Process one streamed completion chunk.
+
+        Arguments:
+            chunk: A chat completion chunk with ``choices[0].delta``
+        """
+        if not chunk.choices:
+            return
+        delta = chunk.choices[0].delta
+        if getattr(delta, "content", None):
+            self.content.append(delta.content)
+        for call_delta in getattr(delta, "tool_calls", None) or ():
+            call = self.calls.setdefault(call_delta.index, _StreamedCall())
+            if call_delta.id:
+                call.id = call_delta.id
+            function = call_delta.function
+            if function is not None:
+                if function.name:
+                    call.name += function.name
+                if function.arguments:
+                    call.arguments.append(function.arguments)
+            if call.future is None:
+                self._maybe_speculate(call)
+
+    def _maybe_speculate(self, call: _StreamedCall) -> None:
+        entry = self.dispatcher.table.get(call.name)
+        if entry is None or not entry.options.speculative:
+            return
+        # Sandboxed and remote tools run elsewhere and are only started once the message is final
+        if entry.options.sandbox or call.name in self.dispatcher.remote:
+            return
+        fields, closed = _scan_fields("".join(call.arguments))
+        if fields is None:
+            return
+        # Optional arguments may still follow, so wait for every parameter or the closing brace
+        all_params, required = self._parameter_names(entry)
+        if not (all_params <= fields.keys() or (closed and required <= fields.keys())):
+            return
+        log.debug("Speculatively executing %s with args: %s", call.name, fields)
+        call.speculated_args = fields
+        call.future = self.executor.submit(
+            self.dispatcher.call, call.id, call.name, json.dumps(fields), self.token
+        )
+        self.stats.started += 1
+
+    def assistant_message(self) -> Dict[str, Any]:
+        """Build the assistant message reassembled from the stream."""
+        message = {"role": "assistant", "content": "".join(self.content) or None}
+        if self.calls:
+            message["tool_calls"] = [
+                {
+                    "id": call.id,
+                    "type": "function",
+                    "function": {"name": call.name, "arguments": "".join(call.arguments)}
+                }
+                for _, call in sorted(self.calls.items())
+            ]
+        return message
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """
+        Complete the turn once the stream has ended.
+
+        Returns:
+            The assistant message followed by one tool message per tool call
+        """
+        messages = [self.assistant_message()]
+        for _, call in sorted(self.calls.items()):
+            arguments = "".join(call.arguments)
+            if call.future is not None:
+                try:
+                    final_args = json.loads(arguments)
+                except ValueError:
+                    final_args = None
+                if final_args == call.speculated_args:
+                    self.stats.confirmed += 1
+                    message = call.future.result()
+                    # The id may only have arrived after the call was started
+                    message["tool_call_id"] = call.id
+                    messages.append(message)
+                    continue
+                log.debug("Discarding speculative call of %s, arguments changed", call.name)
+                call.future.cancel()
+                self.stats.wasted += 1
+            messages.append(self.dispatcher.call_tool(ToolCall(call.id, call.name, arguments), self.token))
+        return messages
+
+
+def run_speculative_turn(client, functions, messages, model=DEFAULT_MODEL,
+                         stats: Optional[SpeculationStats] = None,
+                         token: Optional[CancellationToken] = None) -> List[Dict[str, Any]]:
+    """
+    Stream a completion and execute its tool calls, speculating where allowed.
+
+    Arguments:
+        client: The OpenAI compatible client
+        functions: List of available functions that can be called
+        messages: The conversation so far
+        model: The model to use
+        stats: Optional counters to accumulate speculation results into
+        token: Cancels the tool calls of the turn
+
+    Returns:
+        The assistant message and tool messages, like interpret_response
+    """
+    runner = SpeculativeToolRunner(functions, stats=stats, token=token)
+    stream = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        tools=create_tools_dict(runner.dispatcher.functions),
+        max_tokens=500,
+        stream=True
+    )
+    for chunk in stream:
+        runner.feed(chunk)
+    return runner.finish()
@@ -0,0 +1,65 @@
+"""
+Module for cheap token estimates of text and JSON payloads.
+
+Uses ``tiktoken`` when it is installed and falls back to a characters-per-token
+heuristic otherwise, so the estimate is always available without extra dependencies.
+"""
+
+import json
+from functools import lru_cache
+from typing import Any
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+# Rough average for English text and JSON with the OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """Load the tokenizer once, or return None if it is unavailable."""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:  # pragma: no cover - encoding download may fail offline
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a piece of text.
+    
+    Arguments:
+        text: The text to estimate
+        
+    Returns:
+        The estimated token count
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def estimate_json_tokens(value: Any) -> int:
+    """
+    Estimate the number of tokens of a value once serialized as compact JSON.
+    
+    Arguments:
+        value: Any JSON serializable value
+        
+    Returns:
+        The estimated token count
+    """
+    return estimate_tokens(json.dumps(value, separators=(",", ":"), default=str))
+
+
+def tokens_to_bytes(tokens: int) -> int:
+    """Convert a token budget into an approximate byte budget."""
+    return tokens * CHARS_PER_TOKEN
@@ -0,0 +1,58 @@
+"""
+Per-function options attached to tools by the ``@ai_func`` decorator.
+
+The options live on the function object itself so that any code path holding
+only the callable (such as ``interpret_response``) can look them up.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+OPTIONS_ATTRIBUTE = "__ai_options__"
+
+
+@dataclass(frozen=True)
+class ToolOptions:
+    """
+    Execution options for a tool registered with ``@ai_func``.
+
+    Attributes:
+        max_output_bytes: Maximum size of the tool message content in bytes
+        max_output_tokens: Maximum size of the tool message content in estimated tokens
+        speculative: The tool is read-only and idempotent, so it may be started from
+            partially streamed arguments and its result discarded if they change
+        timeout: Seconds after which a call is abandoned and reported as timed out
+        failure_threshold: Recent failures after which the tool's circuit breaker opens
+        reset_timeout: Seconds an open circuit breaker waits before a trial call
+        slow_call_seconds: Latency above which a call counts as a failure for the breaker
+        backend: Name of the dispatcher backend that executes the tool, e.g. a remote
+            worker queue; None runs it in-process
+        batch: Batched implementation receiving the argument dicts of all calls to the
+            tool in one message and returning one result per call, in order; a result
+            that is an Exception reports that call as failed
+        sandbox: Run the tool in a worker process of a SandboxPool; True for the default
+            limits or a SandboxLimits
+    """
+    max_output_bytes: Optional[int] = None
+    max_output_tokens: Optional[int] = None
+    speculative: bool = False
+    timeout: Optional[float] = None
+    failure_threshold: Optional[int] = None
+    reset_timeout: float = 30.0
+    slow_call_seconds: Optional[float] = None
+    backend: Optional[str] = None
+    batch: Optional[Callable[[List[Dict[str, Any]]], Sequence[Any]]] = None
+    sandbox: Any = False
+
+
+DEFAULT_TOOL_OPTIONS = ToolOptions()
+
+
+def get_tool_options(func: callable) -> ToolOptions:
+    """Get the options of a tool, falling back to the defaults for plain functions."""
+    return getattr(func, OPTIONS_ATTRIBUTE, DEFAULT_TOOL_OPTIONS)
+
+
+def set_tool_options(func: callable, options: ToolOptions) -> None:
+    """Attach options to a tool function."""
+    setattr(func, OPTIONS_ATTRIBUTE, options)
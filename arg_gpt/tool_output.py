@@ -0,0 +1,375 @@
+"""
+Module for turning tool return values into bounded message content.
+
+Tool results are sent back to the model as the content of a tool message, so a
+function returning a large list or a long report can silently produce megabytes of
+prompt. This module serializes results JSON-aware, caps them at a byte budget and
+keeps a head and tail sample of anything that does not fit. Generators and async
+generators are consumed into a capped buffer so a large streamed result is never fully
+held in memory, and each chunk can be reported as it arrives for progress display.
+Coroutines returned by ``async def`` tools are run to completion.
+"""
+
+import asyncio
+import inspect
+import json
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, Mapping, Optional
+
+from .token_estimation import tokens_to_bytes
+from .tool_options import ToolOptions
+
+DEFAULT_MAX_OUTPUT_BYTES = 16 * 1024
+SUCCESS_MESSAGE = "Function executed successfully"
+
+# Space kept free for the truncation marker when splitting a budget into head and tail
+_MARKER_RESERVE = 64
+
+
+def resolve_output_limit(options: ToolOptions) -> int:
+    """
+    Work out the effective byte budget for a tool's output.
+
+    Arguments:
+        options: The tool's options
+
+    Returns:
+        The smallest of the byte limit, the token limit converted to bytes and the default
+    """
+    limits = [
+        limit for limit in (
+            options.max_output_bytes,
+            tokens_to_bytes(options.max_output_tokens) if options.max_output_tokens else None
+        )
+        if limit is not None
+    ]
+    return min(limits) if limits else DEFAULT_MAX_OUTPUT_BYTES
+
+
+def _byte_len(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+def _clip_head(text: str, max_bytes: int) -> str:
+    return text.encode("utf-8")[:max(max_bytes, 0)].decode("utf-8", errors="ignore")
+
+
+def _clip_tail(text: str, max_bytes: int) -> str:
+    if max_bytes <= 0:
+        return ""
+    return text.encode("utf-8")[-max_bytes:].decode("utf-8", errors="ignore")
+
+
+def _split_budget(max_bytes: int):
+    usable = max(max_bytes - _MARKER_RESERVE, 0)
+    head = usable // 2
+    return head, usable - head
+
+
+def _text_marker(omitted: int) -> str:
+    return f"\n[... {omitted} bytes truncated ...]\n"
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def truncate_text(text: str, max_bytes: int) -> str:
+    """
+    Truncate text to a byte budget keeping its beginning and end.
+
+    Arguments:
+        text: The text to truncate
+        max_bytes: Maximum size of the result in UTF-8 bytes
+
+    Returns:
+        The text unchanged if it fits, otherwise a head and tail sample around a marker
+    """
+    size = _byte_len(text)
+    if size <= max_bytes:
+        return text
+    if max_bytes <= _MARKER_RESERVE:
+        return _clip_head(text, max_bytes)
+    head_budget, tail_budget = _split_budget(max_bytes)
+    head = _clip_head(text, head_budget)
+    tail = _clip_tail(text, tail_budget)
+    omitted = size - _byte_len(head) - _byte_len(tail)
+    return head + _text_marker(omitted) + tail
+
+
+def _sample_pieces(pieces: list, max_bytes: int):
+    """
+    Select leading and trailing serialized pieces that fit a budget.
+
+    Returns None when every piece fits, otherwise a (head, tail) pair of piece lists.
+    """
+    total = 0
+    for piece in pieces:
+        total += _byte_len(piece) + 2
+        if total > max_bytes:
+            break
+    else:
+        return None
+
+    head_budget, tail_budget = _split_budget(max_bytes)
+    head, used = [], 0
+    for piece in pieces:
+        size = _byte_len(piece) + 2
+        if used + size > head_budget:
+            break
+        head.append(piece)
+        used += size
+
+    tail, used = [], 0
+    for piece in reversed(pieces[len(head):]):
+        size = _byte_len(piece) + 2
+        if used + size > tail_budget:
+            break
+        tail.append(piece)
+        used += size
+    tail.reverse()
+    return head, tail
+
+
+class _LazyPieces:
+    """Sequence view that serializes items only when they are accessed."""
+
+    def __init__(self, items, render):
+        self.items = items
+        self.render = render
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return _LazyPieces(self.items[index], self.render)
+        return self.render(self.items[index])
+
+    def __iter__(self):
+        return (self.render(item) for item in self.items)
+
+    def __reversed__(self):
+        return (self.render(item) for item in reversed(self.items))
+
+
+def _serialize_sequence(items: list, max_bytes: int) -> str:
+    pieces = _LazyPieces(items, _dumps)
+    sample = _sample_pieces(pieces, max_bytes)
+    if sample is None:
+        return "[" + ", ".join(pieces) + "]"
+    head, tail = sample
+    omitted = len(items) - len(head) - len(tail)
+    marker = _dumps(f"... {omitted} items omitted ...")
+    return "[" + ", ".join(head + [marker] + tail) + "]"
+
+
+def _serialize_mapping(mapping: Mapping, max_bytes: int) -> str:
+    pieces = _LazyPieces(list(mapping.items()), lambda item: f"{_dumps(str(item[0]))}: {_dumps(item[1])}")
+    sample = _sample_pieces(pieces, max_bytes)
+    if sample is None:
+        return "{" + ", ".join(pieces) + "}"
+    head, tail = sample
+    omitted = len(mapping) - len(head) - len(tail)
+    marker = f'"...": {_dumps(f"{omitted} keys omitted")}'
+    return "{" + ", ".join(head + [marker] + tail) + "}"
+
+
+def serialize_value(value: Any, max_bytes: Optional[int] = None) -> str:
+    """
+    Serialize a tool result to text, JSON-aware for containers.
+
+    Arguments:
+        value: The value returned by the tool
+        max_bytes: Optional budget; large containers are sampled item by item
+
+    Returns:
+        The serialized value
+    """
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, tuple, set, frozenset, Mapping)):
+        limit = max_bytes if max_bytes is not None else float("inf")
+        try:
+            if isinstance(value, Mapping):
+                return _serialize_mapping(value, limit)
+            items = value if isinstance(value, (list, tuple)) else list(value)
+            return _serialize_sequence(items, limit)
+        except (TypeError, ValueError):
+            return str(value)
+    return str(value)
+
+
+class CappedBuffer:
+    """
+    Text buffer that keeps at most a fixed number of bytes.
+
+    The first half of the budget holds the beginning of the stream and the second
+    half a rolling window of its end; everything in between is counted and dropped.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_OUTPUT_BYTES):
+        self.max_bytes = max_bytes
+        self.head_budget, self.tail_budget = _split_budget(max_bytes)
+        self.total_bytes = 0
+        self._head = []
+        self._head_bytes = 0
+        self._tail = deque()
+        self._tail_bytes = 0
+
+    @property
+    def truncated(self) -> bool:
+        """Whether any part of the stream has been dropped."""
+        return self.total_bytes > self.max_bytes
+
+    def write(self, text: str) -> None:
+        """Append a piece of text to the buffer."""
+        if not text:
+            return
+        size = _byte_len(text)
+        self.total_bytes += size
+        if self._head_bytes < self.head_budget:
+            room = self.head_budget - self._head_bytes
+            if size <= room:
+                self._head.append(text)
+                self._head_bytes += size
+                return
+            head_part = _clip_head(text, room)
+            self._head.append(head_part)
+            self._head_bytes += _byte_len(head_part)
+            text = text[len(head_part):]
+            size = _byte_len(text)
+        self._tail.append(text)
+        self._tail_bytes += size
+        # Keep enough tail to fill the whole budget in case the stream ends early
+        while self._tail and self._tail_bytes - _byte_len(self._tail[0]) >= self.max_bytes:
+            self._tail_bytes -= _byte_len(self._tail.popleft())
+
+    def getvalue(self) -> str:
+        """Get the buffered text, with a truncation marker if anything was dropped."""
+        head = "".join(self._head)
+        tail = "".join(self._tail)
+        if not self.truncated:
+            return head + tail
+        tail = _clip_tail(tail, self.tail_budget)
+        omitted = self.total_bytes - self._head_bytes - _byte_len(tail)
+        return head + _text_marker(omitted) + tail
+
+
+def _render_chunk(chunk: Any) -> str:
+    if isinstance(chunk, str):
+        return chunk
+    return serialize_value(chunk) + "\n"
+
+
+def stream_to_buffer(chunks: Iterable[Any], max_bytes: int = DEFAULT_MAX_OUTPUT_BYTES,
+                     on_chunk: Optional[Callable[[Any], None]] = None) -> CappedBuffer:
+    """
+    Consume an iterable of chunks into a capped buffer.
+
+    Arguments:
+        chunks: The chunks to consume; strings are concatenated, other values are serialized one per line
+        max_bytes: The byte budget of the buffer
+        on_chunk: Called with every chunk as soon as it is produced
+
+    Returns:
+        The filled buffer
+    """
+    buffer = CappedBuffer(max_bytes)
+    for chunk in chunks:
+        if on_chunk is not None:
+            on_chunk(chunk)
+        buffer.write(_render_chunk(chunk))
+    return buffer
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _require_no_running_loop(name: str) -> None:
+    """Refuse to block a running event loop with synchronous waiting."""
+    if _running_loop() is not None:
+        raise RuntimeError(
+            f"{name} cannot run inside a running event loop; await the coroutine or stream instead, "
+            f"or call the synchronous code from a worker thread with loop.run_in_executor"
+        )
+
+
+def iterate_async(stream: AsyncIterator[Any]) -> Iterator[Any]:
+    """
+    Iterate over an async iterator from synchronous code, one item at a time.
+
+    The stream runs on a private event loop, and is closed when iteration stops early.
+
+    Arguments:
+        stream: The async iterator, e.g. an async generator
+
+    Yields:
+        The stream's items as soon as they are produced
+
+    Raises:
+        RuntimeError: If the calling thread is running an event loop
+    """
+    _require_no_running_loop("iterate_async")
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(stream.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        if hasattr(stream, "aclose"):
+            loop.run_until_complete(stream.aclose())
+        loop.close()
+
+
+def run_coroutine(coroutine) -> Any:
+    """
+    Run a coroutine to completion from synchronous code and return its result.
+
+    Raises:
+        RuntimeError: If the calling thread is running an event loop
+    """
+    if _running_loop() is not None:
+        coroutine.close()
+        _require_no_running_loop("run_coroutine")
+    return asyncio.run(coroutine)
+
+
+def is_stream(value: Any) -> bool:
+    """Check whether a tool result is a lazy stream such as a generator."""
+    return isinstance(value, Iterator) and not isinstance(value, (str, bytes))
+
+
+def is_async_stream(value: Any) -> bool:
+    """Check whether a tool result is an async stream such as an async generator."""
+    return isinstance(value, AsyncIterator)
+
+
+def render_tool_output(value: Any, max_bytes: int = DEFAULT_MAX_OUTPUT_BYTES,
+                       on_chunk: Optional[Callable[[Any], None]] = None) -> str:
+    """
+    Render a tool's return value as bounded tool message content.
+
+    Arguments:
+        value: The value returned by the tool
+        max_bytes: Maximum size of the content in UTF-8 bytes
+        on_chunk: Called with every chunk of a streamed result as it is produced
+
+    Returns:
+        The message content
+    """
+    if inspect.iscoroutine(value):
+        value = run_coroutine(value)
+    if value is None:
+        return SUCCESS_MESSAGE
+    if is_async_stream(value):
+        value = iterate_async(value)
+    if is_stream(value):
+        return stream_to_buffer(value, max_bytes, on_chunk).getvalue()
+    return truncate_text(serialize_value(value, max_bytes), max_bytes)
@@ -0,0 +1,276 @@
+"""
+Module for decoding JSON tool arguments back into annotated Python types.
+
+The model sends arguments as plain JSON, so a parameter annotated with a dataclass,
+Enum or pydantic model receives a dict or a string unless it is converted. Decoders
+are built once per type and cached; parameters that need no conversion are skipped
+entirely so functions with only simple types pay nothing.
+"""
+
+import collections.abc
+import dataclasses
+import inspect
+import threading
+import typing
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Literal, Optional, Union, get_args, get_origin
+
+from .gpt_function_reflection import (
+    UnionType,
+    is_enum,
+    is_pydantic_model,
+    is_typeddict
+)
+
+
+class ArgumentValidationError(ValueError):
+    """Raised when a tool argument does not match its annotated type."""
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _type_name(type_hint: Any) -> str:
+    return getattr(type_hint, "__name__", str(type_hint))
+
+
+def _scalar_decoder(type_hint: type) -> Callable[[Any], Any]:
+    def decode(value):
+        if isinstance(value, type_hint) and not (type_hint is not bool and isinstance(value, bool)):
+            return value
+        # JSON has a single number type, so accept integral floats for int and ints for float
+        if type_hint is int and isinstance(value, float) and value.is_integer():
+            return int(value)
+        if type_hint is float and isinstance(value, int) and not isinstance(value, bool):
+            return float(value)
+        raise ArgumentValidationError(f"Expected {_type_name(type_hint)}, got {type(value).__name__}")
+    return decode
+
+
+# Named types whose decoder is being built, mapped to a decoder deferring to it
+_building: Dict[Any, Callable[[Any], Any]] = {}
+_building_lock = threading.RLock()
+
+
+def _named_decoder(type_hint: Any, build: Callable[[], Callable[[Any], Any]]) -> Callable[[Any], Any]:
+    """
+    Build the decoder of a dataclass or TypedDict, which may refer to itself.
+
+    While the decoder is built, nested references to the same type get a placeholder
+    calling the finished decoder, like the $ref reserved by SchemaDefinitions.
+
+    Arguments:
+        type_hint: The named type
+        build: Callable producing the type's decoder
+
+    Returns:
+        The decoder
+    """
+    with _building_lock:
+        placeholder = _building.get(type_hint)
+        if placeholder is not None:
+            return placeholder
+        resolved: List[Callable[[Any], Any]] = []
+
+        def decode_recursive(value):
+            return resolved[0](value)
+
+        _building[type_hint] = decode_recursive
+        try:
+            decoder = build()
+        finally:
+            del _building[type_hint]
+        resolved.append(decoder)
+        return decoder
+
+
+@lru_cache(maxsize=None)
+def build_decoder(type_hint: Any) -> Callable[[Any], Any]:
+    """
+    Build a function converting a JSON value into the given type.
+
+    Arguments:
+        type_hint: The annotated type
+
+    Returns:
+        The decoder; the identity function when no conversion is needed
+    """
+    if type_hint in (Any, inspect.Parameter.empty, None, type(None)):
+        return _identity
+    if type_hint in (str, int, float, bool):
+        return _scalar_decoder(type_hint)
+
+    if is_enum(type_hint):
+        def decode_enum(value):
+            try:
+                return type_hint(value)
+            except ValueError:
+                raise ArgumentValidationError(f"{value!r} is not a valid {type_hint.__name__}") from None
+        return decode_enum
+
+    if is_pydantic_model(type_hint):
+        validate = getattr(type_hint, "model_validate", None) or type_hint.parse_obj
+
+        def decode_model(value):
+            try:
+                return validate(value)
+            except Exception as e:
+                raise ArgumentValidationError(str(e)) from None
+        return decode_model
+
+    if isinstance(type_hint, type) and dataclasses.is_dataclass(type_hint):
+        return _named_decoder(type_hint, lambda: _dataclass_decoder(type_hint))
+
+    if is_typeddict(type_hint):
+        return _named_decoder(type_hint, lambda: _typeddict_decoder(type_hint))
+
+    origin = get_origin(type_hint)
+    args = get_args(type_hint)
+
+    if origin is Literal:
+        allowed = args
+
+        def decode_literal(value):
+            if value not in allowed:
+                raise ArgumentValidationError(f"{value!r} is not one of {list(allowed)}")
+            return value
+        return decode_literal
+
+    if origin is Union or (UnionType is not None and origin is UnionType):
+        decoders = [build_decoder(arg) for arg in args if arg is not type(None)]
+        nullable = type(None) in args
+
+        def decode_union(value):
+            if value is None and nullable:
+                return None
+            for decoder in decoders:
+                try:
+                    return decoder(value)
+                except (ArgumentValidationError, TypeError, ValueError):
+                    continue
+            raise ArgumentValidationError(f"{value!r} does not match {type_hint}")
+        return decode_union
+
+    if origin in (list, set, frozenset, tuple, collections.abc.Sequence, collections.abc.Set,
+                  collections.abc.MutableSequence, collections.abc.MutableSet,
+                  collections.abc.Iterable, collections.abc.Collection):
+        container = origin if origin in (list, set, frozenset, tuple) else list
+        if origin is tuple and args and args[-1] is not Ellipsis:
+            item_decoders = [build_decoder(arg) for arg in args]
+
+            def decode_fixed_tuple(value):
+                if not isinstance(value, list) or len(value) != len(item_decoders):
+                    raise ArgumentValidationError(f"Expected an array of {len(item_decoders)} items")
+                return tuple(decoder(item) for decoder, item in zip(item_decoders, value))
+            return decode_fixed_tuple
+
+        item_decoder = build_decoder(args[0]) if args else _identity
+
+        def decode_array(value):
+            if not isinstance(value, list):
+                raise ArgumentValidationError(f"Expected an array, got {type(value).__name__}")
+            if item_decoder is _identity and container is list:
+                return value
+            return container(item_decoder(item) for item in value)
+        return decode_array
+
+    if origin in (dict, collections.abc.Mapping, collections.abc.MutableMapping):
+        value_decoder = build_decoder(args[1]) if args else _identity
+
+        def decode_mapping(value):
+            if not isinstance(value, dict):
+                raise ArgumentValidationError(f"Expected an object, got {type(value).__name__}")
+            if value_decoder is _identity:
+                return value
+            return {key: value_decoder(item) for key, item in value.items()}
+        return decode_mapping
+
+    return _identity
+
+
+def _dataclass_decoder(type_hint: type) -> Callable[[Any], Any]:
+    hints = typing.get_type_hints(type_hint)
+    field_decoders = {
+        field.name: build_decoder(hints.get(field.name, Any))
+        for field in dataclasses.fields(type_hint) if field.init
+    }
+
+    def decode_dataclass(value):
+        if not isinstance(value, dict):
+            raise ArgumentValidationError(f"Expected an object for {type_hint.__name__}")
+        try:
+            return type_hint(**{
+                name: field_decoders[name](item) for name, item in value.items() if name in field_decoders
+            })
+        except TypeError as e:
+            raise ArgumentValidationError(str(e)) from None
+    return decode_dataclass
+
+
+def _typeddict_decoder(type_hint: type) -> Callable[[Any], Any]:
+    value_decoders = {name: build_decoder(hint) for name, hint in typing.get_type_hints(type_hint).items()}
+
+    def decode_typeddict(value):
+        if not isinstance(value, dict):
+            raise ArgumentValidationError(f"Expected an object for {type_hint.__name__}")
+        return {name: value_decoders.get(name, _identity)(item) for name, item in value.items()}
+    return decode_typeddict
+
+
+def _needs_conversion(type_hint: Any) -> bool:
+    """Check whether values of a type may differ from their JSON form."""
+    if type_hint in (Any, inspect.Parameter.empty, str, int, float, bool, None, type(None)):
+        return False
+    if type_hint in (list, dict, tuple, set, frozenset):
+        return False
+    origin = get_origin(type_hint)
+    if origin in (list, dict, Union, collections.abc.Sequence, collections.abc.Mapping) or \
+            (UnionType is not None and origin is UnionType):
+        return any(_needs_conversion(arg) for arg in get_args(type_hint))
+    return build_decoder(type_hint) is not _identity
+
+
+def build_argument_decoder(func: Callable,
+                           strict: bool = False) -> Optional[Callable[[Dict[str, Any]], Dict[str, Any]]]:
+    """
+    Build a function converting a tool's JSON arguments into its parameter types.
+
+    Only parameters whose values differ from their JSON form (named types, Literals,
+    tuples, sets and containers of them) are converted and validated; simple types
+    are passed through unchecked unless ``strict`` is set. A null value for a
+    parameter defaulting to None is always accepted.
+
+    Arguments:
+        func: The tool function
+        strict: Also validate str, int, float and bool values and containers of them
+
+    Returns:
+        The argument decoder, or None if no parameter needs converting
+    """
+    try:
+        hints = typing.get_type_hints(func)
+        parameters = inspect.signature(func).parameters
+    except (TypeError, ValueError, NameError):
+        return None
+
+    decoders = {
+        name: build_decoder(hints[name])
+        for name in parameters
+        if name in hints and (_needs_conversion(hints[name]) or strict)
+    }
+    decoders = {name: decoder for name, decoder in decoders.items() if decoder is not _identity}
+    if not decoders:
+        return None
+    nullable = frozenset(name for name, parameter in parameters.items() if parameter.default is None)
+
+    def decode_arguments(arguments: Dict[str, Any]) -> Dict[str, Any]:
+        if not isinstance(arguments, dict):
+            return arguments
+        decoded = dict(arguments)
+        for name, decoder in decoders.items():
+            if name in decoded and not (decoded[name] is None and name in nullable):
+                decoded[name] = decoder(decoded[name])
+        return decoded
+
+    return decode_arguments
@@ -0,0 +1,241 @@
+"""
+Module for accounting token usage and cost per model, tool and session.
+
+UsageTracker records the ``usage`` of every completion and attributes part of each
+request's prompt tokens to the tools whose schemas were sent with it, estimated from
+the size of each tool's entry in the tools payload. Totals are kept in memory under a
+lock and handed to an exporter periodically on a background thread, so recording costs
+a few dictionary updates per request and the expensive schemas worth pruning stand out.
+Per-session totals are kept for the most recently active sessions only.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .token_estimation import estimate_json_tokens
+
+log = logging.getLogger(__name__)
+
+# Number of distinct tools payloads whose per-tool token estimates are kept
+SHARE_CACHE_SIZE = 32
+# Number of most recently active sessions whose totals are kept
+MAX_SESSIONS = 10000
+
+Exporter = Callable[[Dict[str, Any]], None]
+
+
+@dataclass
+class UsageTotals:
+    """Accumulated usage of a model or session."""
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    cost: float = 0.0
+
+
+@dataclass
+class ToolUsage:
+    """Accumulated prompt tokens spent on sending a tool's schema."""
+    requests: int = 0
+    schema_tokens: int = 0
+    cost: float = 0.0
+
+
+_share_cache: "OrderedDict[int, Tuple[list, Dict[str, int]]]" = OrderedDict()
+_share_cache_lock = threading.Lock()
+
+
+def tool_token_shares(tools: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Estimate the prompt tokens each tool's schema adds to a request.
+
+    Estimates are cached per payload object, so the cached payloads of PromptAssembler
+    and ConversationRunner are only measured once.
+
+    Arguments:
+        tools: The tools payload, as built by create_tools_dict
+
+    Returns:
+        Estimated tokens by function name
+    """
+    key = id(tools)
+    with _share_cache_lock:
+        cached = _share_cache.get(key)
+        if cached is not None and cached[0] is tools:
+            _share_cache.move_to_end(key)
+            return cached[1]
+    shares = {tool.get("function", {}).get("name", ""): estimate_json_tokens(tool) for tool in tools}
+    with _share_cache_lock:
+        _share_cache[key] = (tools, shares)
+        if len(_share_cache) > SHARE_CACHE_SIZE:
+            _share_cache.popitem(last=False)
+    return shares
+
+
+def json_lines_exporter(path: str) -> Exporter:
+    """Exporter appending every snapshot as a line to a JSON lines file."""
+    lock = threading.Lock()
+
+    def export(snapshot: Dict[str, Any]) -> None:
+        with lock:
+            with open(path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(snapshot) + "\n")
+    return export
+
+
+def log_exporter(snapshot: Dict[str, Any]) -> None:
+    """Exporter logging every snapshot."""
+    log.info("Usage: %s", json.dumps(snapshot))
+
+
+class UsageTracker:
+    """In-process usage and cost totals by model, tool and session."""
+
+    def __init__(self, prices: Optional[Dict[str, Tuple[float, float]]] = None,
+                 export: Optional[Exporter] = None, export_interval: float = 60.0,
+                 max_sessions: int = MAX_SESSIONS, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the tracker.
+
+        Arguments:
+            prices: Prompt and completion price per 1000 tokens by model
+            export: Called on a background thread with a snapshot of the totals every
+                ``export_interval`` seconds
+            export_interval: Seconds between exports
+            max_sessions: Sessions whose totals are kept; the least recently active are dropped
+            clock: Monotonic clock, replaceable for tests
+        """
+        self.prices = prices or {}
+        self.export = export
+        self.export_interval = export_interval
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._last_export = clock()
+        self._export_thread: Optional[threading.Thread] = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Clear all totals."""
+        with self._lock:
+            self.models: Dict[str, UsageTotals] = {}
+            self.tools: Dict[str, ToolUsage] = {}
+            self.sessions: "OrderedDict[str, UsageTotals]" = OrderedDict()
+            self.dropped_sessions = 0
+
+    def _cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        prompt_price, completion_price = self.prices.get(model, (0.0, 0.0))
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+    def record(self, model: str, usage: Any, tools: Optional[List[Dict[str, Any]]] = None,
+               session_id: Optional[str] = None) -> None:
+        """
+        Record the usage of one completion.
+
+        Arguments:
+            model: The model of the request
+            usage: The response's ``usage`` object or dict; requests without usage are skipped
+            tools: The tools payload sent with the request
+            session_id: The conversation the request belongs to
+        """
+        if usage is None:
+            return
+        if isinstance(usage, dict):
+            prompt_tokens, completion_tokens = usage.get("prompt_tokens"), usage.get("completion_tokens")
+        else:
+            prompt_tokens, completion_tokens = getattr(usage, "prompt_tokens", 0), getattr(usage, "completion_tokens", 0)
+        prompt_tokens = prompt_tokens if isinstance(prompt_tokens, int) else 0
+        completion_tokens = completion_tokens if isinstance(completion_tokens, int) else 0
+        cost = self._cost(model, prompt_tokens, completion_tokens)
+        shares = tool_token_shares(tools) if tools else {}
+        prompt_price = self.prices.get(model, (0.0, 0.0))[0]
+
+        with self._lock:
+            totals = [self.models.setdefault(model, UsageTotals())]
+            if session_id is not None:
+                totals.append(self._session_totals(session_id))
+            for total in totals:
+                total.requests += 1
+                total.prompt_tokens += prompt_tokens
+                total.completion_tokens += completion_tokens
+                total.total_tokens += prompt_tokens + completion_tokens
+                total.cost += cost
+            for name, tokens in shares.items():
+                tool = self.tools.get(name)
+                if tool is None:
+                    tool = self.tools[name] = ToolUsage()
+                tool.requests += 1
+                tool.schema_tokens += tokens
+                tool.cost += tokens * prompt_price / 1000
+            export_due = self.export is not None and self._claim_export()
+
+        if export_due:
+            # Exporting writes files or sends metrics, which must not delay the request
+            self._export_thread = threading.Thread(target=self._export, name="arg_gpt_usage_export", daemon=True)
+            self._export_thread.start()
+
+    def _session_totals(self, session_id: str) -> UsageTotals:
+        """Get the totals of a session as the most recently active one; called with the lock held."""
+        totals = self.sessions.get(session_id)
+        if totals is not None:
+            self.sessions.move_to_end(session_id)
+            return totals
+        totals = self.sessions[session_id] = UsageTotals()
+        if len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+            self.dropped_sessions += 1
+        return totals
+
+    def _claim_export(self) -> bool:
+        """Check whether an export is due and claim it; called with the lock held."""
+        now = self.clock()
+        if now - self._last_export < self.export_interval:
+            return False
+        self._last_export = now
+        return True
+
+    def record_response(self, model: str, response: Any, tools: Optional[List[Dict[str, Any]]] = None,
+                        session_id: Optional[str] = None) -> None:
+        """Record the usage of a chat completion response."""
+        self.record(model, getattr(response, "usage", None), tools, session_id)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get a JSON compatible copy of the totals.
+
+        Returns:
+            Totals by model, tool and session; tools are ordered by schema tokens, largest first
+        """
+        with self._lock:
+            tools = sorted(self.tools.items(), key=lambda item: item[1].schema_tokens, reverse=True)
+            return {
+                "time": time.time(),
+                "models": {name: asdict(total) for name, total in self.models.items()},
+                "tools": {name: asdict(total) for name, total in tools},
+                "sessions": {name: asdict(total) for name, total in self.sessions.items()},
+            }
+
+    def flush(self) -> None:
+        """Export the totals now, on the calling thread."""
+        with self._lock:
+            self._last_export = self.clock()
+        if self.export is not None:
+            self._export()
+
+    def wait_for_export(self, timeout: Optional[float] = None) -> None:
+        """Wait until a background export has finished."""
+        thread = self._export_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _export(self) -> None:
+        try:
+            self.export(self.snapshot())
+        except Exception as e:
+            log.error("Usage export failed: %s", e)
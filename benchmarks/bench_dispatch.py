@@ -0,0 +1,61 @@
+"""
+Microbenchmark of the per-call overhead of interpret_response.
+
+Compares rebuilding the function lookup on every call against the cached
+ToolDispatcher, for a single tool call and for a message with several calls.
+
+Run with: python benchmarks/bench_dispatch.py
+"""
+
+import json
+import timeit
+from types import SimpleNamespace
+
+from arg_gpt.dispatcher import ToolDispatcher
+from arg_gpt.gpt_helpers import interpret_response
+
+
+def make_functions(count):
+    functions = []
+    for i in range(count):
+        def func(x: int, y: int) -> int:
+            return x + y
+        func.__name__ = f"func_{i}"
+        functions.append(func)
+    return functions
+
+
+def make_response(calls):
+    tool_calls = [
+        SimpleNamespace(id=f"call_{i}", function=SimpleNamespace(name=name, arguments=json.dumps({"x": i, "y": 1})))
+        for i, name in enumerate(calls)
+    ]
+    message = SimpleNamespace(role="assistant", content=None, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def rebuild_each_call(response, functions):
+    """Baseline: build the lookup table from the function list on every call."""
+    return ToolDispatcher(functions).interpret(response)
+
+
+def bench(label, stmt, number):
+    seconds = min(timeit.repeat(stmt, number=number, repeat=5))
+    print(f"{label:<45} {seconds / number * 1e6:8.2f} us/call")
+
+
+def main(number=20000):
+    functions = make_functions(50)
+    dispatcher = ToolDispatcher(functions)
+    single = make_response(["func_7"])
+    multi = make_response([f"func_{i}" for i in range(5)])
+
+    bench("single call, rebuild table", lambda: rebuild_each_call(single, functions), number)
+    bench("single call, interpret_response (cached)", lambda: interpret_response(single, functions), number)
+    bench("single call, prebuilt dispatcher", lambda: dispatcher.interpret(single), number)
+    bench("5 calls, rebuild table", lambda: rebuild_each_call(multi, functions), number // 5)
+    bench("5 calls, prebuilt dispatcher", lambda: dispatcher.interpret(multi), number // 5)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Load test of the library's overhead against the local mock model.
+
+Drives call_gpt_with_function and interpret_response against the in-process
+MockClient, which has no network or latency, and against the HTTP MockServer with
+several worker threads and a simulated latency.
+
+Run with: python benchmarks/bench_mock_server.py
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+
+from arg_gpt.dispatcher import ToolDispatcher
+from arg_gpt.gpt_helpers import call_gpt_with_function, create_tools_dict, interpret_response
+from arg_gpt.mock_server import MockClient, MockLLM, MockServer, uniform_latency
+
+
+def spell_word(word: str) -> str:
+    """Spell a word.
+
+    Arguments:
+        word: The word to spell
+    """
+    return "-".join(word)
+
+
+MESSAGES = [{"role": "user", "content": "spell test"}]
+
+
+def run_turn(client, functions, tools, dispatcher):
+    response = call_gpt_with_function(client, functions, MESSAGES, tools_dict=tools)
+    return interpret_response(response, dispatcher)
+
+
+def bench_in_process(requests=5000):
+    client = MockClient()
+    functions = [spell_word]
+    tools = create_tools_dict(functions)
+    dispatcher = ToolDispatcher(functions)
+    started = time.perf_counter()
+    for _ in range(requests):
+        run_turn(client, functions, tools, dispatcher)
+    elapsed = time.perf_counter() - started
+    print(f"in-process mock: {requests / elapsed:9.0f} req/s, {elapsed / requests * 1e6:7.1f} us/turn")
+
+
+def bench_http(requests=1000, workers=16):
+    functions = [spell_word]
+    tools = create_tools_dict(functions)
+    dispatcher = ToolDispatcher(functions)
+    with MockServer(MockLLM(latency=uniform_latency(0.005, 0.015, seed=1))) as server:
+        client = openai.OpenAI(base_url=server.url, api_key="mock", max_retries=0)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(workers) as pool:
+            list(pool.map(lambda _: run_turn(client, functions, tools, dispatcher), range(requests)))
+        elapsed = time.perf_counter() - started
+    print(f"HTTP mock, {workers} workers, 5-15ms latency: {requests / elapsed:9.0f} req/s")
+
+
+if __name__ == "__main__":
+    bench_in_process()
+    bench_http()
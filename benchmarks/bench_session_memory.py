@@ -0,0 +1,71 @@
+"""
+Memory benchmark of idle sessions held in one process.
+
+Builds many sessions of the same shape, the system prompts followed by a few turns with
+a tool call each, and measures the bytes allocated per session for provider payload
+dicts, SDK message objects and compact Message instances.
+
+Run with: python benchmarks/bench_session_memory.py [sessions]
+"""
+
+import gc
+import sys
+import tracemalloc
+
+from openai.types.chat import ChatCompletionMessage
+
+from arg_gpt import prompts
+from arg_gpt.messages import to_messages
+
+TURNS = 4
+
+
+def payload_session(index):
+    messages = prompts.request_detailed_result() + prompts.remain_functional()
+    for turn in range(TURNS):
+        call_id = f"call_{index}_{turn}"
+        messages += [
+            {"role": "user", "content": f"spell word number {turn} for session {index}"},
+            {"role": "assistant", "content": None, "tool_calls": [{
+                "id": call_id, "type": "function",
+                "function": {"name": "spell_word", "arguments": f'{{"word": "w{turn}"}}'}
+            }]},
+            {"tool_call_id": call_id, "role": "tool", "name": "spell_word", "content": f"w-{turn}"},
+        ]
+    return messages
+
+
+def sdk_session(index):
+    return [
+        ChatCompletionMessage.model_validate(message) if message["role"] == "assistant" else message
+        for message in payload_session(index)
+    ]
+
+
+def compact_session(index):
+    return to_messages(payload_session(index))
+
+
+def measure(build, sessions):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = [build(index) for index in range(sessions)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return (after - before) / sessions
+
+
+def main(sessions=10000):
+    print(f"{sessions} sessions of {len(payload_session(0))} messages")
+    baseline = None
+    for label, build in (("payload dicts", payload_session), ("SDK messages", sdk_session),
+                         ("compact Message", compact_session)):
+        per_session = measure(build, sessions)
+        baseline = baseline or per_session
+        print(f"{label:<20} {per_session:10.0f} bytes/session  {per_session / baseline:6.2f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,59 @@
+"""
+Startup cost of a one-shot command compared with a warm daemon.
+
+Measures the wall time of a fresh interpreter importing the example command line
+script (SDK import, environment loading and ``@ai_func`` reflection, without any model
+call) against a thin client answered by a daemon backed by the mock model, so the
+difference is the startup that the daemon amortizes.
+
+Run with: python benchmarks/bench_startup.py
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from arg_gpt.conversation import ConversationRunner
+from arg_gpt.daemon import DaemonServer, send_prompt
+from arg_gpt.mock_server import MockClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def spell_word(word: str) -> str:
+    """Spell a word.
+
+    Arguments:
+        word: The word to spell
+    """
+    return "-".join(word)
+
+
+def time_command(command, runs):
+    env = {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "x")}
+    start = time.perf_counter()
+    for _ in range(runs):
+        subprocess.run(command, cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - start) / runs
+
+
+def main(runs=5):
+    cold = time_command([sys.executable, "-c", "import examples.example_cmd"], runs)
+    print(f"one-shot command startup:  {cold * 1000:8.1f} ms")
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.sock")
+    with DaemonServer(ConversationRunner(MockClient(), [spell_word]), path):
+        client = time_command([sys.executable, "-m", "arg_gpt.daemon", "--socket", path, "spell"], runs)
+        print(f"thin client round trip:    {client * 1000:8.1f} ms")
+
+        start = time.perf_counter()
+        for _ in range(runs * 100):
+            send_prompt("spell", path)
+        warm = (time.perf_counter() - start) / (runs * 100)
+        print(f"in-process daemon request: {warm * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
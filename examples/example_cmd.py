@@ -3,6 +3,10 @@ import typer
 import arg_gpt.prompts as prompts
 import arg_gpt.gpt_helpers as gpt_helpers
 from arg_gpt.ai_func import get_ai_functions, ai_func
+from arg_gpt.prompt_prefix import PromptAssembler
+from arg_gpt.conversation import ConversationRunner
+from arg_gpt.daemon import DEFAULT_SOCKET_PATH, DaemonServer, run_repl
+from arg_gpt.session_store import InMemorySessionStore
 from dotenv import load_dotenv
 import logging
 
@@ -13,12 +17,15 @@ load_dotenv()
 
 log = logging.getLogger(__name__)
 
+# Builds the system prompts and tools once, in a byte-stable order for prompt caching
+assembler = PromptAssembler()
+
 def run_conversation(prompt: str, functions: list):
     client = openai.Client()
     # Get functions at runtime instead of function definition time
-    messages = prompts.request_detailed_result() + prompts.remain_functional() + prompts.user_prompt(prompt)
+    messages, tools = assembler.assemble(functions, prompt)
         
-    response = gpt_helpers.call_gpt_with_function(client, functions, messages)
+    response = gpt_helpers.call_gpt_with_function(client, functions, messages, tools_dict=tools)
     messages.extend(gpt_helpers.interpret_response(response, functions))
     
     # Handle both dictionary and ChatCompletionMessage objects
@@ -41,8 +48,24 @@ def calculate_sum(a: int, b: int) -> int:
     """
     return a + b
 
+def main(prompt: str = typer.Argument(None), repl: bool = False, daemon: bool = False,
+         socket: str = DEFAULT_SOCKET_PATH):
+    # The REPL and the daemon pay for startup once; send prompts to the daemon with
+    # `python -m arg_gpt.daemon "prompt"`
+    if repl:
+        run_repl(ConversationRunner(openai.Client(), get_ai_functions()))
+    elif daemon:
+        logging.basicConfig(level=logging.INFO)
+        runner = ConversationRunner(openai.Client(), get_ai_functions())
+        try:
+            DaemonServer(runner, socket, session_store=InMemorySessionStore()).serve_forever()
+        except KeyboardInterrupt:
+            pass
+    elif prompt is not None:
+        run_conversation(prompt, functions=get_ai_functions())
+
 def run_arg_prompt():
-    typer.run(lambda x : run_conversation(x, functions=get_ai_functions()))
+    typer.run(main)
 
 if __name__ == "__main__":
     run_arg_prompt()
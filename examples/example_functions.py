@@ -1,6 +1,6 @@
 # Functions must be documented using demonstrated style
 import arg_gpt
-import os
+import subprocess
 from arg_gpt.ai_func import ai_func
 
 @ai_func
@@ -16,7 +16,8 @@ def get_sky_color(time_of_day: str):
     else:
         return "unknown"
 
-@ai_func
+# Runs in a warm, resource limited sandbox worker; its output is captured as the result
+@ai_func(sandbox=True)
 def call_commands(commands: list[str]):
     """
     Iterates through and calls each command from a list of Unix commands.
@@ -26,8 +27,8 @@ def call_commands(commands: list[str]):
         commands: A list of strings, each representing a Unix command.
     """
     for command in commands:
-        print(command)
-        os.system(command)
+        print(f"$ {command}", flush=True)
+        subprocess.run(command, shell=True, stderr=subprocess.STDOUT)
 
 @ai_func
 def hello_world(append_string):
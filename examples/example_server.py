@@ -0,0 +1,36 @@
+from typing import Optional
+import openai
+import typer
+from arg_gpt.ai_func import get_ai_functions
+from arg_gpt.server import create_server
+from arg_gpt.session_store import InMemorySessionStore
+from dotenv import load_dotenv
+import logging
+
+# Import to ensure functions are registered
+from examples.example_functions import *
+
+load_dotenv()
+
+log = logging.getLogger(__name__)
+
+# Tools that must never be reachable over HTTP
+UNSERVED_FUNCTIONS = {"call_commands"}
+
+def serve(host: str = "127.0.0.1", port: int = 8000, model: str = "gpt-3.5-turbo-1106",
+          auth_token: Optional[str] = typer.Option(None, envvar="ARG_GPT_SERVER_TOKEN")):
+    # The registry, client and tools payload are built once and reused for every request
+    functions = [func for func in get_ai_functions() if func.__name__ not in UNSERVED_FUNCTIONS]
+    server = create_server(functions, openai.Client, model=model, host=host, port=port,
+                           session_store=InMemorySessionStore(), auth_token=auth_token)
+    logging.basicConfig(level=logging.INFO)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+def run_server():
+    typer.run(serve)
+
+if __name__ == "__main__":
+    run_server()
@@ -0,0 +1,21 @@
+import typer
+from arg_gpt.ai_func import get_ai_functions
+from arg_gpt.remote import RemoteWorker, SQLiteTaskQueue
+import logging
+
+# Import to ensure functions are registered
+from examples.example_functions import *
+
+log = logging.getLogger(__name__)
+
+def work(queue_path: str = "tool_queue.db", queue: str = "default", batch_size: int = 16):
+    # Runs the registered tools for dispatchers configured with a RemoteBackend on the same queue
+    logging.basicConfig(level=logging.INFO)
+    worker = RemoteWorker(SQLiteTaskQueue(queue_path, queue), get_ai_functions(), batch_size=batch_size)
+    try:
+        worker.run_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    typer.run(work)
@@ -8,6 +8,7 @@ from arg_gpt.ai_func import (
     get_function_by_name,
     clear_registry
 )
+from arg_gpt.tool_options import ToolOptions, get_tool_options
 
 @pytest.fixture(autouse=True)
 def setup_teardown():
@@ -158,3 +159,17 @@ def test_multiple_functions():
 
 def test_function_not_found():
     """Test error handling for unknown function names."""
+
+def test_decorator_with_options():
+    """Test that options passed to the decorator are attached to the function."""
+
+    @ai_func(max_output_bytes=128)
+    def limited(x: int) -> int:
+        """Limited output function."""
+        return x
+
+    assert limited(2) == 2
+    assert get_tool_options(get_function_by_name("limited")) == ToolOptions(max_output_bytes=128)
+
+    with pytest.raises(TypeError):
+        ai_func(not_an_option=True)(lambda: None)
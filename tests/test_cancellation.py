@@ -0,0 +1,199 @@
+"""Tests for cancellation module."""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+import pytest
+from arg_gpt.cancellation import CancellationError, CancellationToken, DeadlineExceeded, injected_parameters
+from arg_gpt.conversation import ConversationRunner
+from arg_gpt.dispatcher import ToolCall, ToolDispatcher
+from arg_gpt.gpt_helpers import call_gpt_with_function, create_tools_dict
+from arg_gpt.mock_server import MockClient, MockLLM, MockScript, ScriptedReply
+from arg_gpt.rate_limit import RateLimiter
+from arg_gpt.tool_options import ToolOptions
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class CapturingLLM(MockLLM):
+    """MockLLM remembering the requests it answered."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.seen = []
+
+    def complete(self, request):
+        self.seen.append(request)
+        return super().complete(request)
+
+def wait_for_stop(seconds: float, token: CancellationToken) -> str:
+    """Wait until stopped.
+
+    Arguments:
+        seconds: Longest time to wait
+    """
+    return "cancelled" if token.wait(seconds) else "finished"
+
+def hang(seconds: float) -> str:
+    """Sleep.
+
+    Arguments:
+        seconds: Time to sleep
+    """
+    time.sleep(seconds)
+    return "done"
+
+def test_token_deadline_and_children():
+    """Test deadlines, cancellation callbacks and child tokens."""
+    clock = FakeClock()
+    token = CancellationToken(timeout=5, clock=clock)
+    child = token.child(timeout=2)
+    assert child.deadline == 2 and token.remaining() == 5
+    clock.now = 3
+    assert child.cancelled and not token.cancelled
+    with pytest.raises(DeadlineExceeded):
+        child.raise_if_cancelled()
+
+    calls = []
+    token = CancellationToken()
+    child = token.child()
+    unregister = child.on_cancel(lambda: calls.append("first"))
+    child.on_cancel(lambda: calls.append("second"))
+    unregister()
+    token.cancel("client disconnected")
+    assert calls == ["second"] and child.reason == "client disconnected"
+    with pytest.raises(CancellationError):
+        child.raise_if_cancelled()
+
+def test_injected_parameter_is_hidden_and_injected():
+    """Test that a CancellationToken parameter is left out of the schema and receives the turn's token."""
+    parameters = create_tools_dict([wait_for_stop])[0]["function"]["parameters"]
+    assert list(parameters["properties"]) == ["seconds"]
+    assert parameters["required"] == ["seconds"]
+    assert injected_parameters(wait_for_stop) == frozenset({"token"})
+
+    dispatcher = ToolDispatcher([wait_for_stop])
+    assert dispatcher.call("1", "wait_for_stop", '{"seconds": 0}')["content"] == "finished"
+    token = CancellationToken()
+    threading.Timer(0.05, token.cancel).start()
+    started = time.monotonic()
+    message = dispatcher.call("2", "wait_for_stop", '{"seconds": 5}', token)
+    assert time.monotonic() - started < 2
+    # Either the tool saw the token first or the dispatcher abandoned it
+    assert message["content"] == "cancelled" or json.loads(message["content"])["error"]["type"] == "cancelled"
+
+def test_running_and_pending_tools_stop():
+    """Test that a running tool is abandoned at the deadline and later calls are not run."""
+    dispatcher = ToolDispatcher([hang])
+    calls = [ToolCall("1", "hang", '{"seconds": 5}'), ToolCall("2", "hang", '{"seconds": 5}')]
+    token = CancellationToken(timeout=0.1)
+    started = time.monotonic()
+    messages = list(dispatcher.iter_tool_messages(calls, token))
+    assert time.monotonic() - started < 2
+    assert [json.loads(m["content"])["error"]["type"] for m in messages] == ["cancelled", "cancelled"]
+    assert [m["tool_call_id"] for m in messages] == ["1", "2"]
+
+def give_up() -> str:
+    """Stop on its own."""
+    raise CancellationError("gave up")
+
+def test_tool_cancelling_itself_without_token():
+    """Test that a tool raising CancellationError without a token only fails its own call."""
+    dispatcher = ToolDispatcher([give_up, current_thread_name])
+    calls = [ToolCall("1", "give_up", "{}"), ToolCall("2", "current_thread_name", "{}")]
+    messages = dispatcher.iter_tool_messages(calls)
+    assert json.loads(next(messages)["content"])["error"]["type"] == "cancelled"
+    assert next(messages)["tool_call_id"] == "2"
+
+def test_batched_tools_stop_at_deadline():
+    """Test that batched calls run under the turn's token."""
+    released = threading.Event()
+
+    def slow_batch(calls):
+        released.wait(5)
+        return [call["x"] for call in calls]
+
+    def batched(x: int) -> int:
+        """Return a number.
+
+        Arguments:
+            x: The number
+        """
+        return x
+    batched.__ai_options__ = ToolOptions(batch=slow_batch)
+
+    dispatcher = ToolDispatcher([batched])
+    calls = [ToolCall("1", "batched", '{"x": 1}'), ToolCall("2", "batched", '{"x": 2}')]
+    started = time.monotonic()
+    try:
+        messages = list(dispatcher.iter_tool_messages(calls, CancellationToken(timeout=0.1)))
+    finally:
+        released.set()
+    assert time.monotonic() - started < 2
+    assert [json.loads(m["content"])["error"]["type"] for m in messages] == ["cancelled", "cancelled"]
+
+def current_thread_name() -> str:
+    """Get the name of the thread running the tool."""
+    return threading.current_thread().name
+
+def test_token_without_deadline_runs_inline():
+    """Test that only tokens with a deadline move tool calls onto a thread of their own."""
+    dispatcher = ToolDispatcher([current_thread_name])
+    assert dispatcher.call("1", "current_thread_name", "{}", CancellationToken())["content"] == current_thread_name()
+    assert dispatcher.call("2", "current_thread_name", "{}", CancellationToken(timeout=5))["content"] == "arg_gpt_tool"
+
+def test_completion_respects_token():
+    """Test that cancelled turns send no request and deadlines bound the request."""
+    llm = CapturingLLM()
+    client = MockClient(llm)
+    token = CancellationToken()
+    token.cancel()
+    with pytest.raises(CancellationError):
+        call_gpt_with_function(client, [hang], [{"role": "user", "content": "hi"}], token=token)
+    assert llm.requests == 0
+
+    call_gpt_with_function(client, [hang], [{"role": "user", "content": "hi"}], token=CancellationToken(timeout=30))
+    assert 0 < llm.seen[-1]["timeout"] <= 30
+
+def test_request_timeout_excludes_rate_limit_wait():
+    """Test that the request timeout is what is left of the deadline after waiting for capacity."""
+    class SlowLimiter:
+        @contextmanager
+        def limit(self, tokens, token=None):
+            time.sleep(0.3)
+            yield SimpleNamespace(settle=lambda total: None)
+
+    llm = CapturingLLM()
+    call_gpt_with_function(MockClient(llm), [hang], [{"role": "user", "content": "hi"}],
+                           rate_limiter=SlowLimiter(), token=CancellationToken(timeout=1))
+    assert 0 < llm.seen[-1]["timeout"] <= 0.7
+
+def test_rate_limit_wait_is_cancellable():
+    """Test that waiting for rate limit capacity stops when the token is cancelled."""
+    limiter = RateLimiter(requests_per_minute=1, max_in_flight=1)
+    with limiter.limit(1):
+        pass
+    token = CancellationToken(timeout=0.1)
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        with limiter.limit(1, token):
+            pass
+    assert time.monotonic() - started < 2
+    # The in-flight slot was released
+    assert limiter._semaphore.acquire(blocking=False)
+
+def test_runner_turn_with_token():
+    """Test that a runner turn passes its token to the tools."""
+    client = MockClient(MockLLM(MockScript([ScriptedReply(tool_calls=[("wait_for_stop", {"seconds": 5})])])))
+    runner = ConversationRunner(client, [wait_for_stop])
+    token = CancellationToken(timeout=0.2)
+    started = time.monotonic()
+    content = runner.run("wait", token=token)[-1]["content"]
+    assert time.monotonic() - started < 2
+    assert content == "cancelled" or json.loads(content)["error"]["type"] == "cancelled"
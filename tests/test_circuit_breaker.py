@@ -0,0 +1,122 @@
+"""Tests for circuit_breaker module."""
+
+import json
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from arg_gpt.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    MAX_IDLE_TOOL_THREADS,
+    OPEN,
+    CircuitBreaker,
+    ToolTimeoutError,
+    run_with_timeout
+)
+from arg_gpt.dispatcher import ToolDispatcher
+from arg_gpt.tool_options import ToolOptions
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_response(name, arguments="{}"):
+    tool_call = SimpleNamespace(id="call_1", function=SimpleNamespace(name=name, arguments=arguments))
+    message = SimpleNamespace(role="assistant", content=None, tool_calls=[tool_call])
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+def test_breaker_opens_and_recovers():
+    """Test the closed, open, half open cycle."""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, window=10, reset_timeout=5, clock=clock)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.retry_after() == 5
+
+    clock.now = 5
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()  # Only one trial call
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+def test_breaker_window_forgets_old_failures():
+    """Test that failures outside the window do not count."""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, window=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 20
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+def test_slow_calls_count_as_failures():
+    """Test that calls above the latency threshold open the breaker."""
+    breaker = CircuitBreaker(failure_threshold=1, slow_call_seconds=0.5, clock=FakeClock())
+    breaker.record_success(0.1)
+    assert breaker.state == CLOSED
+    breaker.record_success(1.0)
+    assert breaker.state == OPEN
+
+def test_run_with_timeout():
+    """Test that a hanging call raises after the timeout."""
+    release = threading.Event()
+    assert run_with_timeout(lambda: 42, 1) == 42
+    with pytest.raises(ToolTimeoutError):
+        run_with_timeout(lambda: release.wait(5), 0.05)
+    release.set()
+
+def test_abandoned_calls_do_not_block_later_calls():
+    """Test that more hung calls than idle threads leave later timeout calls running."""
+    release = threading.Event()
+    for _ in range(MAX_IDLE_TOOL_THREADS + 8):
+        with pytest.raises(ToolTimeoutError):
+            run_with_timeout(lambda: release.wait(10), 0.001)
+    started = time.monotonic()
+    assert run_with_timeout(lambda: 42, 1) == 42
+    assert time.monotonic() - started < 0.5
+    release.set()
+
+def test_dispatcher_timeout_message():
+    """Test that a hanging tool returns a structured timeout error."""
+    release = threading.Event()
+
+    def hang():
+        release.wait(5)
+
+    hang.__ai_options__ = ToolOptions(timeout=0.05)
+    started = time.monotonic()
+    messages = ToolDispatcher([hang]).interpret(make_response("hang"))
+    release.set()
+
+    assert time.monotonic() - started < 1
+    error = json.loads(messages[1]["content"])["error"]
+    assert error["type"] == "timeout"
+    assert error["tool"] == "hang"
+
+def test_dispatcher_fast_fails_open_circuit():
+    """Test that a repeatedly failing tool is rejected without running."""
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        raise RuntimeError("backend down")
+
+    flaky.__ai_options__ = ToolOptions(failure_threshold=2, reset_timeout=60)
+    dispatcher = ToolDispatcher([flaky])
+    for _ in range(2):
+        assert "backend down" in dispatcher.interpret(make_response("flaky"))[1]["content"]
+
+    content = dispatcher.interpret(make_response("flaky"))[1]["content"]
+    assert len(calls) == 2
+    error = json.loads(content)["error"]
+    assert error["type"] == "circuit_open"
+    assert error["retry_after"] > 0
+    # The breaker is shared by every dispatcher of the same function
+    assert json.loads(ToolDispatcher([flaky]).interpret(make_response("flaky"))[1]["content"])["error"]
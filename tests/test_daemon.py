@@ -0,0 +1,77 @@
+"""Tests for daemon module."""
+
+import os
+import socket
+import stat
+import subprocess
+import sys
+import pytest
+from arg_gpt.conversation import ConversationRunner
+from arg_gpt.daemon import DaemonError, DaemonServer, main, run_repl, send_prompt
+from arg_gpt.mock_server import MockClient, MockLLM, MockScript, ScriptedReply
+from arg_gpt.session_store import InMemorySessionStore
+
+def spell_word(word: str) -> str:
+    """Spell a word.
+
+    Arguments:
+        word: The word to spell
+    """
+    return "-".join(word)
+
+def make_runner(*replies):
+    return ConversationRunner(MockClient(MockLLM(MockScript(list(replies)))), [spell_word])
+
+def test_daemon_round_trip(tmp_path):
+    """Test that the thin client streams messages and gets the result."""
+    path = str(tmp_path / "d.sock")
+    store = InMemorySessionStore()
+    runner = make_runner(ScriptedReply(tool_calls=[("spell_word", {"word": "hi"})]))
+    with DaemonServer(runner, path, session_store=store):
+        seen = []
+        assert send_prompt("spell hi", path, session_id="s", on_message=seen.append) == "h-i"
+        assert [m["role"] for m in seen] == ["user", "assistant", "tool"]
+        assert len(store.load("s")) == 3
+        assert main(["spell hi", "--socket", path]) == 0
+    assert not os.path.exists(path)
+
+def test_socket_path_checks(tmp_path):
+    """Test that only stale sockets are replaced and new sockets are owner-only."""
+    path = str(tmp_path / "d.sock")
+    other = tmp_path / "notes.txt"
+    other.write_text("keep me")
+    with pytest.raises(DaemonError, match="not a socket"):
+        DaemonServer(make_runner(), str(other))
+    assert other.read_text() == "keep me"
+
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+    with DaemonServer(make_runner(), path):
+        assert stat.S_IMODE(os.stat(path).st_mode) & 0o077 == 0
+        with pytest.raises(DaemonError, match="already listening"):
+            DaemonServer(make_runner(), path)
+
+def test_client_without_daemon(tmp_path):
+    """Test that a missing daemon is reported as a connection error."""
+    with pytest.raises(ConnectionError):
+        send_prompt("hello", str(tmp_path / "missing.sock"))
+    assert main(["hello", "--socket", str(tmp_path / "missing.sock")]) == 1
+
+def test_repl_keeps_history():
+    """Test that the REPL continues the conversation until /exit."""
+    runner = make_runner(ScriptedReply(content="first"), ScriptedReply(content="second"))
+    lines = iter(["hello", "", "again", "/exit", "never"])
+    output = []
+    run_repl(runner, read=lambda prompt: next(lines), write=output.append)
+    assert output == ["first", "second"]
+
+def test_client_imports_stay_light():
+    """Test that the thin client loads neither the SDK, the environment nor the tool registry."""
+    code = (
+        "import sys, arg_gpt.daemon\n"
+        "print(sorted(m for m in sys.modules if m.split('.')[0] in ('openai', 'dotenv', 'pydantic', 'orjson')"
+        " or m == 'arg_gpt.ai_func'))"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "[]"
@@ -0,0 +1,106 @@
+"""Tests for dispatcher module."""
+
+from types import SimpleNamespace
+from arg_gpt.dispatcher import ToolDispatcher, get_dispatcher, clear_dispatcher_cache, tool_failed
+from arg_gpt.ai_func import ai_func
+from arg_gpt.gpt_helpers import interpret_response
+
+def make_tool_call(name, arguments, call_id="call_1"):
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments=arguments))
+
+def make_response(*tool_calls):
+    message = SimpleNamespace(role="assistant", content=None, tool_calls=list(tool_calls) or None)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+def add(x: int, y: int) -> int:
+    return x + y
+
+def test_dispatcher_lookup():
+    """Test that the dispatch table is built from function names."""
+    dispatcher = ToolDispatcher([add])
+    assert "add" in dispatcher
+    assert "missing" not in dispatcher
+    assert len(dispatcher) == 1
+
+def test_get_dispatcher_cached():
+    """Test that the same tool set reuses one dispatcher."""
+    clear_dispatcher_cache()
+    assert get_dispatcher([add]) is get_dispatcher([add])
+    assert get_dispatcher([add]) is not get_dispatcher([add, make_response])
+
+def test_multiple_tool_calls():
+    """Test that every tool call produces a message in order."""
+    dispatcher = ToolDispatcher([add])
+    response = make_response(
+        make_tool_call("add", '{"x": 1, "y": 2}', "call_1"),
+        make_tool_call("add", '{"x": 3, "y": 4}', "call_2"),
+        make_tool_call("nope", '{}', "call_3")
+    )
+    messages = dispatcher.interpret(response)
+    assert [m["content"] for m in messages[1:3]] == ["3", "7"]
+    assert [m["tool_call_id"] for m in messages[1:]] == ["call_1", "call_2", "call_3"]
+    assert "Unknown function" in messages[3]["content"]
+    assert [tool_failed(m) for m in messages[1:]] == [False, False, True]
+    assert dict(messages[1]) == {"tool_call_id": "call_1", "role": "tool", "name": "add", "content": "3"}
+
+def test_interpret_response_accepts_dispatcher():
+    """Test that interpret_response accepts a prebuilt dispatcher."""
+    dispatcher = ToolDispatcher([add])
+    messages = interpret_response(make_response(make_tool_call("add", '{"x": 2, "y": 2}')), dispatcher)
+    assert messages[1]["content"] == "4"
+
+def test_bad_argument_names():
+    """Test that arguments not matching the signature report an execution error."""
+    messages = ToolDispatcher([add]).interpret(make_response(make_tool_call("add", '{"z": 1}')))
+    assert "Error executing function" in messages[1]["content"]
+    assert tool_failed(messages[1])
+
+def test_batched_calls():
+    """Test that same-tool calls in a message run as one batch and fan back out."""
+    batches = []
+
+    def lookup_batch(calls):
+        batches.append(calls)
+        return [ValueError("no such item") if call["item"] == "bad" else call["item"].upper() for call in calls]
+
+    @ai_func(batch=lookup_batch)
+    def lookup(item: str) -> str:
+        """Look up an item.
+
+        Arguments:
+            item: The item
+        """
+        return item.upper()
+
+    dispatcher = ToolDispatcher([lookup, add])
+    response = make_response(
+        make_tool_call("lookup", '{"item": "a"}', "call_1"),
+        make_tool_call("add", '{"x": 1, "y": 2}', "call_2"),
+        make_tool_call("lookup", '{"item": "bad"}', "call_3"),
+        make_tool_call("lookup", '{"item": 1 2}', "call_4"),
+        make_tool_call("lookup", '{"item": "c"}', "call_5")
+    )
+    messages = dispatcher.interpret(response)[1:]
+    assert [m["tool_call_id"] for m in messages] == ["call_1", "call_2", "call_3", "call_4", "call_5"]
+    assert [m["content"] for m in messages[:2]] == ["A", "3"]
+    assert "no such item" in messages[2]["content"]
+    assert "Invalid function arguments" in messages[3]["content"]
+    assert messages[4]["content"] == "C"
+    assert batches == [[{"item": "a"}, {"item": "bad"}, {"item": "c"}]]
+
+    # A single call uses the plain implementation
+    assert dispatcher.interpret(make_response(make_tool_call("lookup", '{"item": "d"}')))[1]["content"] == "D"
+    assert len(batches) == 1
+
+def test_streamed_progress():
+    """Test that streamed chunks are reported with their time to first output."""
+    async def count(n: int):
+        for i in range(n):
+            yield i
+
+    progress = []
+    dispatcher = ToolDispatcher([count], on_progress=progress.append)
+    messages = dispatcher.interpret(make_response(make_tool_call("count", '{"n": 3}')))
+    assert messages[1]["content"] == "0\n1\n2\n"
+    assert [(p.tool_call_id, p.chunk, p.index) for p in progress] == [("call_1", 0, 0), ("call_1", 1, 1), ("call_1", 2, 2)]
+    assert 0 <= progress[0].elapsed <= progress[-1].elapsed
@@ -0,0 +1,95 @@
+"""Tests for extraction module."""
+
+from dataclasses import dataclass
+import pytest
+from arg_gpt.cancellation import CancellationError, CancellationToken
+from arg_gpt.extraction import (
+    JSON_SCHEMA,
+    ExtractionError,
+    extract,
+    extraction_request,
+    validate_arguments
+)
+from arg_gpt.mock_server import MockClient, MockLLM, MockScript, ScriptedReply
+from arg_gpt.type_decoding import ArgumentValidationError
+
+@dataclass
+class Address:
+    street: str
+    city: str
+
+def save_contact(name: str, address: Address, age: int = 0) -> str:
+    """Save a contact.
+
+    Arguments:
+        name: The contact's name
+        address: The contact's address
+        age: The contact's age
+    """
+    return f"{name} lives in {address.city}"
+
+def test_tool_choice_forces_function():
+    """Test that the function is forced and its arguments are decoded and run."""
+    llm = MockLLM(MockScript([ScriptedReply(tool_calls=[
+        ("save_contact", {"name": "Ada", "address": {"street": "1 Main", "city": "Leeds"}})
+    ])]))
+    result = extract(MockClient(llm), save_contact, "Ada lives at 1 Main, Leeds")
+    assert result.arguments["address"] == Address("1 Main", "Leeds")
+    assert result.value == "Ada lives in Leeds"
+
+    options = extraction_request(save_contact)
+    assert options["tool_choice"] == {"type": "function", "function": {"name": "save_contact"}}
+
+def test_json_schema_mode():
+    """Test extraction from a JSON response format without running the function."""
+    content = '{"name": "Bob", "address": {"street": "2 High", "city": "York"}, "age": 40}'
+    llm = MockLLM(MockScript([ScriptedReply(content=content)]))
+    result = extract(MockClient(llm), save_contact, "Bob, 40, 2 High York", mode=JSON_SCHEMA, run=False)
+    assert result.arguments["age"] == 40
+    assert result.value is None
+    assert extraction_request(save_contact, JSON_SCHEMA)["tools_dict"] == []
+
+def test_default_mock_answers_extraction():
+    """Test that the mock model fills the forced tool and the schema format."""
+    for mode in ("tool_choice", JSON_SCHEMA):
+        result = extract(MockClient(), save_contact, "anything", mode=mode, run=False)
+        assert result.arguments["name"] == "test"
+
+def test_validation_errors():
+    """Test missing, unexpected and malformed arguments."""
+    with pytest.raises(ArgumentValidationError):
+        validate_arguments(save_contact, {"name": "x"})
+    with pytest.raises(ArgumentValidationError):
+        validate_arguments(save_contact, {"name": "x", "address": {"street": "a", "city": "b"}, "extra": 1})
+    llm = MockLLM(MockScript([ScriptedReply(content="not json")]))
+    with pytest.raises(ExtractionError):
+        extract(MockClient(llm), save_contact, "x", mode=JSON_SCHEMA)
+
+def count_items(n: int, flag: bool, token: CancellationToken, limit: int = None) -> int:
+    """Count items.
+
+    Arguments:
+        n: The number of items
+        flag: Whether to count
+        limit: Optional upper bound
+    """
+    return n if flag and not token.cancelled else 0
+
+def test_scalar_validation_and_token_injection():
+    """Test that simple types are validated and the token reaches the function."""
+    with pytest.raises(ArgumentValidationError):
+        validate_arguments(count_items, {"n": "abc", "flag": True})
+    with pytest.raises(ArgumentValidationError):
+        validate_arguments(count_items, {"n": 1, "flag": "nope"})
+    with pytest.raises(ArgumentValidationError):
+        validate_arguments(count_items, {"n": 1, "flag": True, "token": "x"})
+    assert validate_arguments(count_items, {"n": 2.0, "flag": False, "limit": None}) == {
+        "n": 2, "flag": False, "limit": None
+    }
+
+    llm = MockLLM(MockScript([ScriptedReply(tool_calls=[("count_items", {"n": 3, "flag": True})])]))
+    token = CancellationToken()
+    assert extract(MockClient(llm), count_items, "count three", token=token).value == 3
+    token.cancel()
+    with pytest.raises(CancellationError):
+        extract(MockClient(llm), count_items, "count three", token=token)
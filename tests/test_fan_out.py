@@ -0,0 +1,131 @@
+"""Tests for fan_out module."""
+
+import asyncio
+import threading
+import time
+import pytest
+from arg_gpt.cancellation import CancellationToken
+from arg_gpt.conversation import ConversationRunner
+from arg_gpt.fan_out import FanOut, fan_out
+from arg_gpt.mock_server import MockClient, MockLLM, MockScript, ScriptedReply
+
+class ConcurrencyProbe:
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def enter(self):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+    def exit(self):
+        with self.lock:
+            self.active -= 1
+
+probe = ConcurrencyProbe()
+
+def slow_upper(word: str) -> str:
+    """Uppercase a word slowly.
+
+    Arguments:
+        word: The word
+    """
+    probe.enter()
+    try:
+        time.sleep(0.05)
+        return word.upper()
+    finally:
+        probe.exit()
+
+class FailingLLM(MockLLM):
+    """MockLLM failing prompts that ask it to."""
+
+    def complete(self, request):
+        if request["messages"][-1]["content"] == "fail":
+            raise RuntimeError("model unavailable")
+        return super().complete(request)
+
+def make_runner(llm=None):
+    llm = llm or MockLLM(MockScript([ScriptedReply(tool_calls=[("slow_upper", {"word": "hi"})])]))
+    return ConversationRunner(MockClient(llm), [slow_upper])
+
+def test_results_in_order_with_bounded_concurrency():
+    """Test that results keep prompt order and at most max_concurrency turns run at once."""
+    probe.peak = 0
+    prompts = [f"prompt {index}" for index in range(8)]
+    with FanOut(make_runner(), max_concurrency=3) as runner:
+        started = time.monotonic()
+        results = runner.run(prompts)
+        elapsed = time.monotonic() - started
+    assert [result.prompt for result in results] == prompts
+    assert [result.index for result in results] == list(range(8))
+    assert all(result.ok and result.result == "HI" for result in results)
+    assert [result.messages[0]["content"] for result in results] == prompts
+    assert probe.peak == 3
+    # Eight 50 ms tools three at a time take three rounds, not eight
+    assert elapsed < 8 * 0.05
+    assert runner.stats.prompts == 8 and runner.stats.failed == 0
+    assert runner.stats.throughput > 0 and 0 < runner.stats.mean_latency <= runner.stats.max_latency
+
+def test_as_completed_and_errors():
+    """Test streaming results as they finish and capturing per-prompt errors."""
+    runner = FanOut(make_runner(FailingLLM(MockScript([ScriptedReply(content="done")]))), max_concurrency=2)
+    results = list(runner.as_completed(["a", "fail", "b"]))
+    runner.close()
+    assert sorted(result.index for result in results) == [0, 1, 2]
+    failed = [result for result in results if not result.ok]
+    assert len(failed) == 1 and failed[0].prompt == "fail"
+    assert isinstance(failed[0].error, RuntimeError) and failed[0].messages == []
+    assert runner.stats.prompts == 3 and runner.stats.failed == 1
+
+class SlowPromptLLM(MockLLM):
+    """MockLLM taking a while to answer the prompt "slow"."""
+
+    def complete(self, request):
+        if request["messages"][-1]["content"] == "slow":
+            time.sleep(0.3)
+        return super().complete(request)
+
+def test_stopping_early_cancels_running_turns():
+    """Test that turns already running stop when the consumer stops iterating."""
+    probe.peak = 0
+    llm = SlowPromptLLM(MockScript([ScriptedReply(tool_calls=[("slow_upper", {"word": "hi"})])]))
+    runner = FanOut(make_runner(llm), max_concurrency=2)
+    results = runner.as_completed(["fast", "slow"])
+    first = next(results)
+    results.close()
+    runner.close()
+    assert first.prompt == "fast"
+    # The slow turn got its completion after the fan-out stopped, so its tool never ran
+    assert probe.peak == 1 and runner.stats.failed == 1
+
+    with pytest.raises(RuntimeError, match="running event loop"):
+        async def synchronous_inside_loop():
+            return runner.run(["a"])
+        asyncio.run(synchronous_inside_loop())
+
+def test_async_api_shares_runner():
+    """Test the async API inside a running loop and that turns share one client and payload."""
+    llm = MockLLM(MockScript([ScriptedReply(content="done")]))
+    runner = make_runner(llm)
+    with FanOut(runner, max_concurrency=4) as fan:
+        results = asyncio.run(fan.run_async(["a", "b", "c"]))
+    assert [result.result for result in results] == ["done"] * 3
+    assert llm.requests == 3
+    assert fan.stats.prompts == 3
+
+def test_cancelled_token_and_convenience_function():
+    """Test that a cancelled token fails every prompt and the one-call helper."""
+    token = CancellationToken()
+    token.cancel()
+    with FanOut(make_runner()) as runner:
+        results = runner.run(["a", "b"], token)
+    assert [type(result.error).__name__ for result in results] == ["CancellationError"] * 2
+
+    client = MockClient(MockLLM(MockScript([ScriptedReply(content="done")])))
+    results = fan_out(client, [slow_upper], ["x", "y"], max_concurrency=2)
+    assert [result.result for result in results] == ["done", "done"]
+    with pytest.raises(ValueError):
+        FanOut(make_runner(), max_concurrency=0)
@@ -1,6 +1,8 @@
 """Tests for the gpt_function_reflection module."""
 
-from typing import List, Dict, Optional, Union, Tuple
+from dataclasses import dataclass
+from enum import Enum
+from typing import List, Dict, Literal, Optional, TypedDict, Union, Tuple
 import pytest
 from arg_gpt.gpt_function_reflection import doc_to_gpt_dict
 
@@ -178,3 +180,92 @@ def test_invalid_function():
     
     with pytest.raises(ValueError):
         doc_to_gpt_dict(42)
+
+class Color(Enum):
+    """Available colors."""
+    RED = "red"
+    BLUE = "blue"
+
+@dataclass
+class Point:
+    """A point in 2D space."""
+    x: float
+    y: float
+    label: str = "origin"
+
+@dataclass
+class Segment:
+    start: Point
+    end: Point
+    color: Color = Color.RED
+
+class Address(TypedDict):
+    street: str
+    city: str
+
+def test_literal_and_enum_types():
+    """Test that Literal and Enum parameters become enums."""
+    def paint(mode: Literal["fast", "slow"], color: Color = Color.BLUE) -> None:
+        """Paint something."""
+
+    params = doc_to_gpt_dict(paint)["function"]["parameters"]
+    assert params["properties"]["mode"] == {"type": "string", "enum": ["fast", "slow"]}
+    assert params["properties"]["color"]["$ref"] == "#/$defs/Color"
+    assert params["properties"]["color"]["default"] == "blue"
+    assert params["$defs"]["Color"] == {"enum": ["red", "blue"], "type": "string"}
+
+def test_dataclass_types_deduplicated():
+    """Test that nested dataclasses are defined once and referenced."""
+    def draw(segments: List[Segment], anchor: Optional[Point] = None) -> None:
+        """Draw segments."""
+
+    params = doc_to_gpt_dict(draw)["function"]["parameters"]
+    assert params["properties"]["segments"]["items"] == {"$ref": "#/$defs/Segment"}
+    assert params["properties"]["anchor"]["$ref"] == "#/$defs/Point"
+    assert params["properties"]["anchor"]["nullable"] is True
+    assert set(params["$defs"]) == {"Segment", "Point", "Color"}
+
+    point = params["$defs"]["Point"]
+    assert point["type"] == "object"
+    assert point["description"] == "A point in 2D space."
+    assert point["required"] == ["x", "y"]
+    assert point["properties"]["label"]["default"] == "origin"
+    assert params["$defs"]["Segment"]["properties"]["start"] == {"$ref": "#/$defs/Point"}
+
+def test_typeddict_type():
+    """Test that TypedDict parameters list their keys."""
+    def ship(address: Address) -> None:
+        """Ship a parcel."""
+
+    params = doc_to_gpt_dict(ship)["function"]["parameters"]
+    address = params["$defs"]["Address"]
+    assert address["properties"]["city"]["type"] == "string"
+    assert sorted(address["required"]) == ["city", "street"]
+
+def test_pydantic_model_type():
+    """Test that pydantic models use their own JSON schema."""
+    pydantic = pytest.importorskip("pydantic")
+
+    class Item(pydantic.BaseModel):
+        name: str
+        tags: List[str] = []
+
+    class Order(pydantic.BaseModel):
+        items: List[Item]
+
+    def place(order: Order) -> None:
+        """Place an order."""
+
+    params = doc_to_gpt_dict(place)["function"]["parameters"]
+    assert params["properties"]["order"] == {"$ref": "#/$defs/Order"}
+    assert params["$defs"]["Order"]["properties"]["items"]["items"] == {"$ref": "#/$defs/Item"}
+    assert "name" in params["$defs"]["Item"]["properties"]
+
+def test_return_type_definitions():
+    """Test that named return types carry their own definitions."""
+    def locate() -> Point:
+        """Locate the point."""
+
+    returns = doc_to_gpt_dict(locate)["function"]["returns"]
+    assert returns["$ref"] == "#/$defs/Point"
+    assert "Point" in returns["$defs"]
@@ -3,6 +3,7 @@
 import pytest
 from unittest.mock import Mock, patch
 from arg_gpt.gpt_helpers import interpret_response, call_gpt_with_function
+from arg_gpt.tool_options import ToolOptions
 
 def test_successful_function_call():
     """Test successful function execution."""
@@ -181,3 +182,24 @@ def test_call_gpt_with_function():
 
     # Verify the response is returned
     assert response == mock_response
+
+def test_output_limit_applied():
+    """Test that large function results are truncated to the tool's limit."""
+    def big_func():
+        return "x" * 100000
+
+    big_func.__ai_options__ = ToolOptions(max_output_bytes=1000)
+
+    response = Mock()
+    response.choices = [Mock()]
+    response.choices[0].message = Mock()
+    response.choices[0].message.tool_calls = [Mock()]
+    response.choices[0].message.tool_calls[0].function = Mock()
+    response.choices[0].message.tool_calls[0].function.name = "big_func"
+    response.choices[0].message.tool_calls[0].function.arguments = '{}'
+    response.choices[0].message.tool_calls[0].id = "call_1"
+
+    messages = interpret_response(response, [big_func])
+
+    assert len(messages[1]["content"].encode()) <= 1000
+    assert "bytes truncated" in messages[1]["content"]
@@ -0,0 +1,54 @@
+"""Tests for introspect module."""
+
+import json
+from typer.testing import CliRunner
+from arg_gpt.ai_func import clear_registry
+from arg_gpt.introspect import app, profile_tools, schema_warnings
+
+def documented(word: str) -> str:
+    """Spell a word.
+
+    Arguments:
+        word: The word to spell
+    """
+    return word
+
+def undocumented(value, count: int = 1):
+    return value
+
+def test_schema_warnings():
+    """Test that missing descriptions and null types are reported."""
+    reports = {report.name: report for report in profile_tools([documented, undocumented], repeat=1)}
+    assert reports["documented"].warnings == []
+    warnings = reports["undocumented"].warnings
+    assert "missing description" in warnings
+    assert "parameter 'count' has no description" in warnings
+    assert "parameters.properties.value has type null, is an annotation missing?" in warnings
+    assert reports["documented"].schema_bytes > 0 and reports["documented"].schema_tokens > 0
+    assert reports["documented"].reflection_seconds >= 0
+    assert schema_warnings({"function": {"description": "x", "parameters": {}}}) == []
+
+def test_cli_list_and_payload(tmp_path, monkeypatch):
+    """Test that the CLI lists a module's tools and dumps its payload."""
+    module = tmp_path / "introspect_tools.py"
+    module.write_text(
+        "from arg_gpt.ai_func import ai_func\n"
+        "@ai_func\n"
+        "def shout(word: str) -> str:\n"
+        "    \"\"\"Shout a word.\"\"\"\n"
+        "    return word.upper()\n"
+    )
+    monkeypatch.chdir(tmp_path)
+    clear_registry()
+    try:
+        runner = CliRunner()
+        result = runner.invoke(app, ["list", "introspect_tools", "--json"])
+        assert result.exit_code == 0, result.output
+        assert [report["name"] for report in json.loads(result.output)] == ["shout"]
+        result = runner.invoke(app, ["payload", "introspect_tools", "--output", str(tmp_path / "tools.json")])
+        assert result.exit_code == 0, result.output
+        tools = json.loads((tmp_path / "tools.json").read_text())
+        assert tools[0]["function"]["name"] == "shout"
+        assert runner.invoke(app, ["list", "introspect_tools", "--sort", "size"]).exit_code != 0
+    finally:
+        clear_registry()
@@ -0,0 +1,72 @@
+"""Tests for json_repair module."""
+
+import pytest
+from types import SimpleNamespace
+from arg_gpt.dispatcher import ToolDispatcher
+from arg_gpt.json_repair import (
+    MAX_REPAIR_CHARS,
+    RepairStats,
+    decode_arguments,
+    repair_json,
+    repair_stats
+)
+
+@pytest.mark.parametrize("text, expected, kinds", [
+    ('{"a": 1,}', {"a": 1}, ["trailing_comma"]),
+    ("{'a': 'it\\'s', 'b': True}", {"a": "it's", "b": True}, ["invalid_escape", "python_literal", "single_quotes"]),
+    ('```json\n{"a": [1, 2,]}\n```', {"a": [1, 2]}, ["code_fence", "trailing_comma"]),
+    ('{"query": "weather in London"', {"query": "weather in London"}, ["truncated"]),
+    ('{"a": {"b": [1, true', {"a": {"b": [1, True]}}, ["truncated"]),
+    ('{"a": [1, 2,]', {"a": [1, 2]}, ["trailing_comma", "truncated"]),
+    ('{"a": None}', {"a": None}, ["python_literal"]),
+])
+def test_repairs(text, expected, kinds):
+    """Test the common malformations."""
+    assert repair_json(text) == (expected, kinds)
+
+@pytest.mark.parametrize("text", [
+    '{"commands": ["rm -rf /tmp/build',
+    '{"x": 1, "y": 25',
+    '{"n": 1, "confirm": tr',
+    '{"a": 1, "b',
+    '{"a": 1, "b": ',
+    '{"a": 1,',
+    '{"a": [',
+])
+def test_cut_off_values_are_rejected(text):
+    """Test that output cut off inside a string, number or member is not guessed."""
+    with pytest.raises(ValueError, match="cut off"):
+        repair_json(text)
+
+def test_unrepairable_and_bounded():
+    """Test that unrepairable and oversized inputs are rejected."""
+    with pytest.raises(ValueError):
+        repair_json('{"a": 1 "b": 2}')
+    with pytest.raises(ValueError):
+        repair_json("[" * (MAX_REPAIR_CHARS + 1))
+
+def test_decode_counts():
+    """Test that decodes, repairs and failures are counted."""
+    stats = RepairStats()
+    assert decode_arguments('{"a": 1}', stats) == {"a": 1}
+    assert decode_arguments("{'a': 1,}", stats) == {"a": 1}
+    with pytest.raises(ValueError):
+        decode_arguments("nope nope", stats)
+    with pytest.raises(ValueError):
+        decode_arguments("{'a': 1}", stats, repair=False)
+    assert (stats.decoded, stats.repaired, stats.failed) == (2, 1, 2)
+    assert stats.kinds == {"single_quotes": 1, "trailing_comma": 1}
+
+def test_dispatcher_repairs_truncated_arguments():
+    """Test that the dispatcher closes arguments cut off after a value but rejects cut off values."""
+    def greet(name: str, loud: bool) -> str:
+        return f"Hello {name}" + ("!" if loud else "")
+
+    before = repair_stats.repaired
+    dispatcher = ToolDispatcher([greet])
+    tool_call = SimpleNamespace(id="call_1", function=SimpleNamespace(name="greet", arguments='{"name": "Ada", "loud": true'))
+    assert dispatcher.call_tool(tool_call)["content"] == "Hello Ada!"
+    assert repair_stats.repaired == before + 1
+    for arguments in ('{"name": "Ada", "loud": tr', '{"name": "Ad', '{"name": "Ada",'):
+        tool_call.function.arguments = arguments
+        assert "Invalid function arguments" in dispatcher.call_tool(tool_call)["content"]
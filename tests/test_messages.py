@@ -0,0 +1,54 @@
+"""Tests for messages module."""
+
+from openai.types.chat import ChatCompletionMessage
+from arg_gpt.messages import Message, ToolCall, system_message, to_messages, to_payloads
+from arg_gpt.session_store import InMemorySessionStore, serialize_message
+
+def assistant_message():
+    return ChatCompletionMessage.model_validate({
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [{
+            "id": "call_1",
+            "type": "function",
+            "function": {"name": "spell_word", "arguments": '{"word": "hi"}'}
+        }]
+    })
+
+def test_round_trip():
+    """Test that payload dicts and SDK messages convert back to the same payloads."""
+    tool = {"tool_call_id": "call_1", "role": "tool", "name": "spell_word", "content": "h-i"}
+    user = {"role": "user", "content": "spell hi", "cache_hint": "x"}
+    sdk = assistant_message()
+    compact = to_messages([user, sdk, tool])
+    assert [message.to_payload() for message in compact] == [user, serialize_message(sdk), tool]
+    assert compact[1].tool_calls[0].function.name == "spell_word"
+    assert compact[2].get("role") == "tool" and compact[2].get("missing", 1) == 1
+    assert compact[0] == user
+    assert serialize_message(compact[1]) == serialize_message(sdk)
+
+def test_shared_instances():
+    """Test that system prompts are shared and roles and names are interned."""
+    first = Message.from_payload({"role": "system", "content": "Be brief"})
+    second = Message.from_payload({"role": "system", "content": "Be brief"})
+    assert first is second is system_message("Be brief")
+    assert Message.from_payload({"role": "system", "content": "Be brief", "name": "x"}) is not first
+    role = "".join(["assis", "tant"])
+    assert Message(role).role is Message("assistant").role
+    assert ToolCall("a", "".join(["spell", "_word"]), "{}").function.name is ToolCall("b", "spell_word", "{}").function.name
+
+def test_to_payloads_is_lazy():
+    """Test that requests without compact messages are passed through unchanged."""
+    plain = [{"role": "user", "content": "hi"}]
+    assert to_payloads(plain) is plain
+    assert to_payloads([system_message("Be brief"), *plain]) == [{"role": "system", "content": "Be brief"}, *plain]
+
+def test_store_keeps_compact_messages():
+    """Test that the in-memory store keeps Message instances and loads payload dicts."""
+    store = InMemorySessionStore()
+    store.append("s", [{"role": "system", "content": "Be brief"}, {"role": "user", "content": "hi"}, assistant_message()])
+    assert all(isinstance(message, Message) for message in store._sessions["s"])
+    assert store._sessions["s"][0] is system_message("Be brief")
+    loaded = store.load("s")
+    assert loaded[1] == {"role": "user", "content": "hi"}
+    assert loaded[2]["tool_calls"][0]["function"]["arguments"] == '{"word": "hi"}'
@@ -0,0 +1,122 @@
+"""Tests for mock_server module."""
+
+import json
+import threading
+import openai
+import pytest
+from arg_gpt.gpt_helpers import call_gpt_with_function, interpret_response
+from arg_gpt.mock_server import (
+    MockAPIError,
+    MockClient,
+    MockLLM,
+    MockScript,
+    MockServer,
+    RecordingClient,
+    ScriptedReply,
+    constant_latency,
+    lognormal_latency,
+    placeholder_arguments
+)
+from arg_gpt.speculative import SpeculationStats, run_speculative_turn
+from arg_gpt.tool_options import ToolOptions
+
+def spell_word(word: str) -> str:
+    """Spell a word.
+
+    Arguments:
+        word: The word to spell
+    """
+    return "-".join(word)
+
+MESSAGES = [{"role": "user", "content": "spell hello"}]
+
+def test_default_answer_calls_first_tool():
+    """Test that without a script the first tool is called with placeholders."""
+    client = MockClient()
+    response = call_gpt_with_function(client, [spell_word], MESSAGES)
+    messages = interpret_response(response, [spell_word])
+    assert messages[1]["content"] == "t-e-s-t"
+    assert response.usage.total_tokens > 0
+
+def test_scripted_replies_and_errors():
+    """Test scripted tool calls, text and injected errors."""
+    script = MockScript([
+        ScriptedReply(tool_calls=[("spell_word", {"word": "hi"}), ("spell_word", {"word": "yo"})]),
+        ScriptedReply(error=429),
+        ScriptedReply(content="done")
+    ], loop=False)
+    client = MockClient(MockLLM(script))
+
+    messages = interpret_response(call_gpt_with_function(client, [spell_word], MESSAGES), [spell_word])
+    assert [m["content"] for m in messages[1:]] == ["h-i", "y-o"]
+    with pytest.raises(MockAPIError) as error:
+        call_gpt_with_function(client, [spell_word], MESSAGES)
+    assert error.value.status_code == 429
+    assert call_gpt_with_function(client, [spell_word], MESSAGES).choices[0].message.content == "done"
+    # The script is exhausted, so the default answer is used
+    assert call_gpt_with_function(client, [spell_word], MESSAGES).choices[0].message.tool_calls
+
+def test_error_rate():
+    """Test random error injection."""
+    llm = MockLLM(error_rate=0.5, seed=1)
+    client = MockClient(llm)
+    for _ in range(100):
+        try:
+            client.chat.completions.create(model="m", messages=MESSAGES)
+        except MockAPIError:
+            pass
+    assert 30 < llm.errors < 70
+    assert llm.requests == 100
+
+def test_latency_models():
+    """Test that latency is drawn from the model and waited for."""
+    waits = []
+    client = MockClient(MockLLM(latency=constant_latency(0.25)), sleep=waits.append)
+    client.chat.completions.create(model="m", messages=MESSAGES)
+    assert waits == [0.25]
+    draws = [lognormal_latency(0.1, seed=3)() for _ in range(5)]
+    assert all(d > 0 for d in draws)
+
+def test_placeholder_arguments():
+    """Test argument generation from schemas."""
+    schema = {"properties": {"a": {"type": "integer"}, "b": {"enum": ["x"]}, "c": {"type": "string"}},
+              "required": ["a", "b"]}
+    assert placeholder_arguments(schema) == {"a": 1, "b": "x"}
+
+def test_streaming_in_process():
+    """Test that streamed chunks drive the speculative runner."""
+    def lookup(key: str) -> str:
+        return key.upper()
+    lookup.__ai_options__ = ToolOptions(speculative=True)
+    client = MockClient(MockLLM(MockScript([ScriptedReply(tool_calls=[("lookup", {"key": "abcdefghijkl"})])])))
+    stats = SpeculationStats()
+    messages = run_speculative_turn(client, [lookup], MESSAGES, stats=stats)
+    assert messages[1]["content"] == "ABCDEFGHIJKL"
+    assert stats.confirmed == 1
+
+def test_http_server_with_sdk():
+    """Test that the OpenAI SDK works against the HTTP server."""
+    script = MockScript([ScriptedReply(tool_calls=[("spell_word", {"word": "ok"})]), ScriptedReply(error=500)])
+    with MockServer(MockLLM(script)) as server:
+        client = openai.OpenAI(base_url=server.url, api_key="mock", max_retries=0)
+        response = call_gpt_with_function(client, [spell_word], MESSAGES)
+        assert interpret_response(response, [spell_word])[1]["content"] == "o-k"
+        with pytest.raises(openai.InternalServerError):
+            call_gpt_with_function(client, [spell_word], MESSAGES)
+        stream = client.chat.completions.create(model="m", messages=MESSAGES, stream=True,
+                                                tools=[{"type": "function", "function": {"name": "f", "parameters": {}}}])
+        chunks = list(stream)
+        assert chunks[-1].choices[0].finish_reason == "tool_calls"
+
+def test_record_and_replay(tmp_path):
+    """Test that recorded sessions replay the same responses."""
+    path = str(tmp_path / "session.jsonl")
+    source = MockClient(MockLLM(MockScript([ScriptedReply(tool_calls=[("spell_word", {"word": "abc"})])])))
+    recorder = RecordingClient(source, path)
+    original = call_gpt_with_function(recorder, [spell_word], MESSAGES)
+
+    replay = MockClient(MockLLM(MockScript.from_recording(path)))
+    replayed = call_gpt_with_function(replay, [spell_word], MESSAGES)
+    assert replayed.choices[0].message.tool_calls[0].function.arguments == \
+        original.choices[0].message.tool_calls[0].function.arguments
+    assert replayed.id == original.id
@@ -0,0 +1,111 @@
+"""Tests for plan_cache module."""
+
+from arg_gpt.conversation import ConversationRunner, result_text
+from arg_gpt.dispatcher import ToolCall
+from arg_gpt.mock_server import MockClient, MockLLM, MockScript, ScriptedReply
+from arg_gpt.plan_cache import PlanCache, normalize_prompt, plan_of
+
+def spell_word(word: str) -> str:
+    """Spell a word.
+
+    Arguments:
+        word: The word to spell
+    """
+    if word == "fail":
+        raise ValueError("cannot spell")
+    return "-".join(word)
+
+def lint(path: str) -> str:
+    """Lint a file.
+
+    Arguments:
+        path: The file to lint
+    """
+    return "Error: line 3 is too long"
+
+def shout(word: str) -> str:
+    """Shout a word.
+
+    Arguments:
+        word: The word to shout
+    """
+    return word.upper()
+
+def test_normalize_and_plan():
+    """Test prompt normalization and that plans ignore argument key order and whitespace."""
+    assert normalize_prompt("  spell\n  hi ") == "spell hi"
+    first = plan_of([ToolCall("a", "f", '{"x": 1, "y": 2}')])
+    second = plan_of([{"function": {"name": "f", "arguments": '{"y":2,"x":1}'}}])
+    assert first == second
+    assert plan_of([ToolCall("a", "f", "{not json")]) is None
+
+def test_confirmations_and_confidence():
+    """Test that plans are served only after enough agreeing observations."""
+    cache = PlanCache(min_confirmations=2, min_confidence=0.75)
+    calls = [ToolCall("a", "spell_word", '{"word": "hi"}')]
+    cache.observe("fp", "spell hi", calls)
+    assert cache.lookup("fp", "spell hi") is None
+    cache.observe("fp", "spell  hi", calls)
+    served = cache.lookup("fp", "spell hi")
+    assert [(call.function.name, call.function.arguments) for call in served] == [("spell_word", '{"word":"hi"}')]
+    # A disagreeing answer lowers the confidence below the threshold
+    cache.observe("fp", "spell hi", [ToolCall("b", "spell_word", '{"word": "HI"}')])
+    assert cache.lookup("fp", "spell hi") is None
+    # Other prompt prefixes never see the plan
+    assert cache.lookup("other", "spell hi") is None
+    assert cache.stats.hits == 1 and cache.stats.misses == 3
+
+def test_bounded_and_invalidation():
+    """Test LRU eviction, rejection and invalidation by fingerprint."""
+    cache = PlanCache(min_confirmations=1, max_entries=2)
+    for prompt in ("a", "b", "c"):
+        cache.observe("fp", prompt, [ToolCall("x", "shout", '{"word": "%s"}' % prompt)])
+    assert len(cache) == 2 and cache.stats.evictions == 1
+    assert cache.lookup("fp", "a") is None
+    cache.reject("fp", "b")
+    assert cache.lookup("fp", "b") is None
+    cache.invalidate("fp")
+    assert len(cache) == 0
+
+def test_runner_serves_learned_plan():
+    """Test that a runner skips the completion once a plan is confirmed."""
+    llm = MockLLM(MockScript([ScriptedReply(tool_calls=[("spell_word", {"word": "hi"})])]))
+    cache = PlanCache(min_confirmations=2)
+    runner = ConversationRunner(MockClient(llm), [spell_word], plan_cache=cache)
+    for _ in range(2):
+        assert result_text(runner.run("spell hi")) == "h-i"
+    assert llm.requests == 2
+    messages = runner.run("spell hi")
+    assert llm.requests == 2
+    assert messages[1]["tool_calls"][0]["function"]["name"] == "spell_word"
+    assert messages[2]["tool_call_id"] == messages[1]["tool_calls"][0]["id"]
+    assert result_text(messages) == "h-i"
+    # Turns with history always go to the model
+    runner.run("spell hi", history=[{"role": "user", "content": "hello"}])
+    assert llm.requests == 3
+
+def test_runner_skips_failures_and_schema_changes():
+    """Test that failed turns are not learned and a changed registry starts over."""
+    llm = MockLLM(MockScript([ScriptedReply(tool_calls=[("spell_word", {"word": "fail"})])]))
+    cache = PlanCache(min_confirmations=1)
+    runner = ConversationRunner(MockClient(llm), [spell_word], plan_cache=cache)
+    runner.run("spell fail")
+    assert len(cache) == 0
+
+    llm = MockLLM(MockScript([ScriptedReply(tool_calls=[("shout", {"word": "hi"})])]))
+    runner = ConversationRunner(MockClient(llm), [shout], plan_cache=cache)
+    runner.run("shout hi")
+    runner.run("shout hi")
+    assert llm.requests == 1
+    extended = ConversationRunner(MockClient(llm), [shout, spell_word], plan_cache=cache)
+    extended.run("shout hi")
+    assert llm.requests == 2
+
+def test_results_reading_like_errors_are_learned():
+    """Test that a tool returning error-like text is learned; only dispatcher failures are skipped."""
+    llm = MockLLM(MockScript([ScriptedReply(tool_calls=[("lint", {"path": "a.py"})])]))
+    cache = PlanCache(min_confirmations=1)
+    runner = ConversationRunner(MockClient(llm), [lint], plan_cache=cache)
+    runner.run("lint a.py")
+    assert result_text(runner.run("lint a.py")) == "Error: line 3 is too long"
+    assert llm.requests == 1
@@ -0,0 +1,79 @@
+"""Tests for prompt_prefix module."""
+
+import json
+import os
+import subprocess
+import sys
+from arg_gpt.prompt_prefix import PromptAssembler, canonical_tools, canonicalize
+
+def alpha(x: int, label: str = "a") -> str:
+    """First tool.
+
+    Arguments:
+        x: A number
+        label: A label
+    """
+    return label * x
+
+def beta(items: list) -> int:
+    """Second tool."""
+    return len(items)
+
+def test_canonicalize_sorts_keys():
+    """Test that key order does not affect serialization."""
+    first = canonicalize({"b": 1, "a": {"d": [{"y": 1, "x": 2}], "c": 3}})
+    second = canonicalize({"a": {"c": 3, "d": [{"x": 2, "y": 1}]}, "b": 1})
+    assert json.dumps(first) == json.dumps(second)
+
+def test_tools_order_independent():
+    """Test that registration order does not change the prefix."""
+    assembler = PromptAssembler()
+    assert assembler.prefix([alpha, beta]).serialized == PromptAssembler().prefix([beta, alpha]).serialized
+    names = [tool["function"]["name"] for tool in assembler.prefix([beta, alpha]).tools]
+    assert names == ["alpha", "beta"]
+
+def test_prefix_cached():
+    """Test that the prefix is built once per tool set."""
+    assembler = PromptAssembler()
+    assert assembler.prefix([alpha, beta]) is assembler.prefix([alpha, beta])
+    assert assembler.prefix([beta, alpha]) is assembler.prefix([alpha, beta])
+    assert len(assembler._cache) == 1
+
+def test_assemble_messages():
+    """Test that requests start with the shared system messages."""
+    assembler = PromptAssembler(system_messages=[{"role": "system", "content": "Be brief"}])
+    history = [{"role": "user", "content": "earlier"}]
+    messages, tools = assembler.assemble([alpha], "hello", history)
+    assert messages[0] == {"content": "Be brief", "role": "system"}
+    assert messages[1:] == history + [{"role": "user", "content": "hello"}]
+    assert tools is assembler.prefix([alpha]).tools
+    second, _ = assembler.assemble([alpha], "again")
+    assert second[0] is messages[0]
+
+def test_canonical_tools_sorted():
+    """Test sorting of a raw tools payload."""
+    tools = [{"function": {"name": "b"}, "type": "function"}, {"type": "function", "function": {"name": "a"}}]
+    assert [t["function"]["name"] for t in canonical_tools(tools)] == ["a", "b"]
+
+PREFIX_SCRIPT = """
+import sys
+sys.path.insert(0, {tests_dir!r})
+from test_prompt_prefix import alpha, beta
+from arg_gpt.prompt_prefix import PromptAssembler
+functions = [alpha, beta] if sys.argv[1] == "forward" else [beta, alpha]
+print(PromptAssembler().prefix(functions).fingerprint)
+"""
+
+def test_prefix_stable_across_processes():
+    """Test that separate interpreters with different hash seeds build identical prefixes."""
+    script = PREFIX_SCRIPT.format(tests_dir=os.path.dirname(os.path.abspath(__file__)))
+    fingerprints = set()
+    for seed, order in (("1", "forward"), ("2", "reverse"), ("3", "forward")):
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        output = subprocess.run(
+            [sys.executable, "-c", script, order], env=env, check=True,
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        )
+        fingerprints.add(output.stdout.strip())
+    assert len(fingerprints) == 1
+    assert fingerprints == {PromptAssembler().prefix([alpha, beta]).fingerprint}
@@ -0,0 +1,193 @@
+"""Tests for rate_limit module."""
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import Mock
+import pytest
+from arg_gpt.cancellation import CancellationError, CancellationToken
+from arg_gpt.gpt_helpers import call_gpt_with_function
+from arg_gpt.rate_limit import (
+    RateLimiter,
+    SQLiteLeaseSemaphore,
+    SQLiteTokenBucket,
+    TokenBucket,
+    estimate_request_tokens
+)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_token_bucket_reservations():
+    """Test that reservations beyond the capacity wait for the refill."""
+    clock = FakeClock()
+    bucket = TokenBucket(capacity=10, refill_per_second=5, clock=clock)
+    assert bucket.reserve(10) == 0.0
+    assert bucket.reserve(5) == 1.0
+    clock.now = 1.0
+    assert bucket.reserve(5) == 1.0
+    bucket.refund(5)
+    clock.now = 2.0
+    assert bucket.reserve(5) == 0.0
+
+def test_token_bucket_clamps_to_capacity():
+    """Test that an oversized request can still eventually be served."""
+    bucket = TokenBucket(capacity=10, refill_per_second=10, clock=FakeClock())
+    assert bucket.reserve(1000) == 0.0
+
+def test_estimate_request_tokens():
+    """Test that messages, tools and completion budget are counted."""
+    messages = [{"role": "user", "content": "x" * 400}]
+    base = estimate_request_tokens(messages)
+    assert base >= 100
+    tools = [{"type": "function", "function": {"name": "f", "description": "y" * 400}}]
+    assert estimate_request_tokens(messages, tools) > base + 90
+    assert estimate_request_tokens(messages, max_tokens=500) == base + 500
+    message_object = SimpleNamespace(content="x" * 400, tool_calls=None)
+    assert estimate_request_tokens([message_object]) == base
+
+def test_max_in_flight():
+    """Test that the limiter caps concurrent requests."""
+    limiter = RateLimiter(max_in_flight=2)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def work():
+        with limiter.limit():
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.pop()
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(peak) == 2
+
+def test_async_limit():
+    """Test the async in-flight limit."""
+    limiter = RateLimiter(requests_per_minute=6000, max_in_flight=1)
+    active = []
+
+    async def work():
+        async with limiter.limit_async(10):
+            active.append(1)
+            assert len(active) == 1
+            await asyncio.sleep(0.001)
+            active.pop()
+
+    async def main():
+        await asyncio.gather(*(work() for _ in range(5)))
+
+    asyncio.run(main())
+
+def test_sync_and_async_share_in_flight_limit():
+    """Test that sync and async callers together stay within max_in_flight."""
+    limiter = RateLimiter(max_in_flight=1)
+    released = threading.Event()
+    holding = threading.Event()
+
+    def hold():
+        with limiter.limit():
+            holding.set()
+            released.wait(5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    holding.wait(5)
+
+    async def acquire():
+        async with limiter.limit_async():
+            return True
+
+    async def main():
+        waiter = asyncio.ensure_future(acquire())
+        await asyncio.sleep(0.2)
+        # The sync caller holds the only slot
+        assert not waiter.done()
+        released.set()
+        assert await asyncio.wait_for(waiter, 5)
+
+    asyncio.run(main())
+    holder.join()
+
+def test_shared_bucket(tmp_path):
+    """Test that two handles on the same file share one bucket."""
+    path = str(tmp_path / "limits.db")
+    first = SQLiteTokenBucket(path, "tokens", capacity=100, refill_per_second=1)
+    second = SQLiteTokenBucket(path, "tokens", capacity=100, refill_per_second=1)
+    assert first.reserve(60) == 0.0
+    assert second.reserve(60) > 15
+
+def test_lease_semaphore(tmp_path):
+    """Test that leases are limited and expire."""
+    path = str(tmp_path / "limits.db")
+    semaphore = SQLiteLeaseSemaphore(path, "in_flight", limit=1)
+    lease = semaphore.try_acquire()
+    assert lease is not None
+    assert SQLiteLeaseSemaphore(path, "in_flight", limit=1).try_acquire() is None
+    semaphore.release(lease)
+    assert semaphore.try_acquire() is not None
+
+    expiring = SQLiteLeaseSemaphore(path, "short", limit=1, lease_seconds=-1)
+    assert expiring.try_acquire() is not None
+    assert expiring.try_acquire() is not None
+
+def test_abandoned_requests_refund_their_reservation():
+    """Test that a wait cancelled before the request is sent gives the tokens back."""
+    limiter = RateLimiter(tokens_per_minute=60)
+    with limiter.limit(60):
+        pass
+    with pytest.raises(CancellationError):
+        with limiter.limit(30, CancellationToken(timeout=0.05)):
+            pass
+
+    async def cancelled_wait():
+        task = asyncio.ensure_future(limiter.limit_async(30).__aenter__())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(cancelled_wait())
+    # Only the first request's debt is left: another 30 tokens wait about 30 seconds, not 90
+    assert limiter.reserve(30) < 35
+
+def test_cancelled_async_waiter_keeps_no_lease(tmp_path):
+    """Test that a cancelled async wait for a shared in-flight slot does not take it later."""
+    path = str(tmp_path / "limits.db")
+    limiter = RateLimiter(max_in_flight=1, shared_path=path)
+    held = limiter._lease_semaphore.acquire()
+
+    async def cancelled_wait():
+        task = asyncio.ensure_future(limiter.limit_async().__aenter__())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        limiter._lease_semaphore.release(held)
+        await asyncio.sleep(0.2)
+    asyncio.run(cancelled_wait())
+    assert SQLiteLeaseSemaphore(path, "default:in_flight", limit=1).try_acquire() is not None
+
+def test_call_gpt_with_rate_limiter():
+    """Test that the estimate is reserved and settled with the actual usage."""
+    limiter = RateLimiter(tokens_per_minute=10000)
+    limiter.token_bucket.clock = FakeClock()
+    limiter.token_bucket._updated = 0.0
+    client = Mock()
+    client.chat.completions.create.return_value = SimpleNamespace(usage=SimpleNamespace(total_tokens=50))
+
+    call_gpt_with_function(client, [], [{"role": "user", "content": "hi"}], rate_limiter=limiter)
+
+    client.chat.completions.create.assert_called_once()
+    assert limiter.token_bucket._tokens == 10000 - 50
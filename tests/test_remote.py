@@ -0,0 +1,128 @@
+"""Tests for remote module."""
+
+import json
+import sqlite3
+import threading
+import time
+import pytest
+from types import SimpleNamespace
+from arg_gpt.ai_func import ai_func
+from arg_gpt.cancellation import CancellationToken
+from arg_gpt.dispatcher import ToolDispatcher, tool_failed
+from arg_gpt.remote import QueueFullError, RemoteBackend, RemoteWorker, SQLiteTaskQueue
+
+@ai_func(backend="workers")
+def remote_square(x: int) -> int:
+    """Square a number on a worker.
+
+    Arguments:
+        x: The number
+    """
+    return x * x
+
+def local_echo(text: str) -> str:
+    """Echo text.
+
+    Arguments:
+        text: The text
+    """
+    return text
+
+def tool_call(call_id, name, arguments):
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+
+def test_queue_claim_complete_and_lease(tmp_path):
+    """Test batching, correlation by tool_call_id and reclaiming expired leases."""
+    queue = SQLiteTaskQueue(str(tmp_path / "q.db"))
+    batch = queue.submit([("a", "remote_square", "{}"), ("b", "remote_square", "{}")])
+    assert queue.pending() == 2
+
+    tasks = queue.claim("w1", limit=10, lease_seconds=-1)
+    assert [task.tool_call_id for task in tasks] == ["a", "b"]
+    # The lease already expired, so another worker takes the tasks over
+    tasks = queue.claim("w2", limit=10)
+    assert len(tasks) == 2
+    queue.complete("w1", [(tasks[0].id, "stale")])
+    queue.complete("w2", [(task.id, task.tool_call_id.upper()) for task in tasks])
+    assert queue.collect(batch) == {"a": "A", "b": "B"}
+    queue.discard(batch)
+    assert queue.pending() == 0
+
+def test_backpressure(tmp_path):
+    """Test that a full queue rejects submissions after the timeout."""
+    queue = SQLiteTaskQueue(str(tmp_path / "q.db"), max_pending=2)
+    queue.submit([("a", "f", "{}"), ("b", "f", "{}")])
+    with pytest.raises(QueueFullError):
+        queue.submit([("c", "f", "{}")], timeout=0.05)
+
+    dispatcher = ToolDispatcher([remote_square], backends={"workers": RemoteBackend(queue, submit_timeout=0)})
+    content = json.loads(dispatcher.call_tool(tool_call("c", "remote_square", {"x": 2}))["content"])
+    assert content["error"]["type"] == "backpressure"
+
+def test_full_queue_wait_is_cancellable(tmp_path):
+    """Test that waiting for room in a full queue stops with the turn's token."""
+    queue = SQLiteTaskQueue(str(tmp_path / "q.db"), max_pending=1, poll_interval=0.01)
+    queue.submit([("a", "f", "{}")])
+    dispatcher = ToolDispatcher([remote_square], backends={"workers": RemoteBackend(queue, submit_timeout=None)})
+    started = time.monotonic()
+    message = dispatcher.call_tool(tool_call("b", "remote_square", {"x": 2}), CancellationToken(timeout=0.1))
+    assert time.monotonic() - started < 2
+    assert json.loads(message["content"])["error"]["type"] == "cancelled"
+    assert queue.pending() == 1
+
+def test_dispatch_through_workers(tmp_path):
+    """Test that remote and local calls of one message are answered in order."""
+    queue = SQLiteTaskQueue(str(tmp_path / "q.db"))
+    stop = threading.Event()
+    worker = threading.Thread(target=RemoteWorker(queue, [remote_square], idle_interval=0.01).run_forever, args=(stop,))
+    worker.start()
+    try:
+        dispatcher = ToolDispatcher([remote_square, local_echo], backends={"workers": RemoteBackend(queue, timeout=10)})
+        calls = [
+            tool_call("1", "remote_square", {"x": 3}),
+            tool_call("2", "local_echo", {"text": "hi"}),
+            tool_call("3", "remote_square", {"x": 4})
+        ]
+        messages = list(dispatcher.iter_tool_messages(calls))
+    finally:
+        stop.set()
+        worker.join()
+    assert [(m["tool_call_id"], m["content"]) for m in messages] == [("1", "9"), ("2", "hi"), ("3", "16")]
+    assert queue.pending() == 0
+
+def test_timeout_and_missing_backend(tmp_path):
+    """Test calls nobody serves and tools whose backend is not configured."""
+    queue = SQLiteTaskQueue(str(tmp_path / "q.db"))
+    dispatcher = ToolDispatcher([remote_square], backends={"workers": RemoteBackend(queue, timeout=0.05)})
+    content = json.loads(dispatcher.call_tool(tool_call("1", "remote_square", {"x": 3}))["content"])
+    assert content["error"]["type"] == "timeout"
+    assert queue.pending() == 0
+
+    dispatcher = ToolDispatcher([remote_square], backends={})
+    content = json.loads(dispatcher.call_tool(tool_call("1", "remote_square", {"x": 3}))["content"])
+    assert content["error"]["type"] == "backend_unavailable"
+    # Without backends the tool runs in-process, as on a worker
+    assert ToolDispatcher([remote_square]).call_tool(tool_call("1", "remote_square", {"x": 3}))["content"] == "9"
+
+def test_worker_failures_cross_the_queue(tmp_path):
+    """Test that a call failing on a worker is reported as failed, also in queue files from before."""
+    path = str(tmp_path / "q.db")
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            "CREATE TABLE tool_tasks (id INTEGER PRIMARY KEY AUTOINCREMENT, queue TEXT NOT NULL, "
+            "batch TEXT NOT NULL, tool_call_id TEXT NOT NULL, name TEXT NOT NULL, arguments TEXT NOT NULL, "
+            "status INTEGER NOT NULL, worker TEXT, lease_until REAL, result TEXT)"
+        )
+    queue = SQLiteTaskQueue(path)
+    dispatcher = ToolDispatcher([remote_square], backends={"workers": RemoteBackend(queue, timeout=5)})
+    calls = [tool_call("1", "remote_square", {"x": 3}), tool_call("2", "remote_square", {"y": 1})]
+    stop = threading.Event()
+    worker = threading.Thread(target=RemoteWorker(queue, [remote_square], idle_interval=0.01).run_forever, args=(stop,))
+    worker.start()
+    try:
+        first, second = list(dispatcher.iter_tool_messages(calls))
+    finally:
+        stop.set()
+        worker.join()
+    assert first["content"] == "9" and not tool_failed(first)
+    assert "Error" in second["content"] and tool_failed(second)
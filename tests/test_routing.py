@@ -0,0 +1,71 @@
+"""Tests for routing module."""
+
+import pytest
+from arg_gpt.mock_server import MockClient, MockLLM, MockScript, ScriptedReply
+from arg_gpt.routing import INVALID_JSON, UNKNOWN_FUNCTION, VALIDATION_FAILED, ModelRouter
+
+def add(x: int, y: int) -> int:
+    """Add two numbers.
+
+    Arguments:
+        x: First number
+        y: Second number
+    """
+    return x + y
+
+MESSAGES = [{"role": "user", "content": "add 1 and 2"}]
+
+def raw_reply(arguments, name="add"):
+    return ScriptedReply(response={
+        "id": "chatcmpl-raw", "object": "chat.completion", "created": 0, "model": "mock",
+        "choices": [{"index": 0, "finish_reason": "tool_calls", "message": {
+            "role": "assistant", "content": None,
+            "tool_calls": [{"id": "call_1", "type": "function", "function": {"name": name, "arguments": arguments}}]
+        }}]
+    })
+
+class ModelLLM(MockLLM):
+    """MockLLM remembering which model each request was sent to."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.models = []
+
+    def complete(self, request):
+        self.models.append(request["model"])
+        return super().complete(request)
+
+def test_cheap_model_answer_accepted():
+    """Test that a usable answer from the first model is not escalated."""
+    llm = ModelLLM(MockScript([ScriptedReply(tool_calls=[("add", {"x": 1, "y": 2})])]))
+    router = ModelRouter(["small", "large"])
+    messages = router.run(MockClient(llm), [add], MESSAGES)
+    assert messages[1]["content"] == "3"
+    assert llm.models == ["small"]
+    assert router.stats.escalation_rate == 0.0
+    assert router.stats.models["small"].requests == 1
+
+@pytest.mark.parametrize("reply, reason", [
+    (ScriptedReply(tool_calls=[("subtract", {"x": 1})]), UNKNOWN_FUNCTION),
+    (raw_reply('{"x": 1 "y": 2}'), INVALID_JSON),
+    (ScriptedReply(tool_calls=[("add", {"x": 1})]), VALIDATION_FAILED),
+])
+def test_escalation(reply, reason):
+    """Test that unusable answers are sent to the next model."""
+    llm = ModelLLM(MockScript([reply, ScriptedReply(tool_calls=[("add", {"x": 1, "y": 2})])], loop=False))
+    router = ModelRouter(["small", "large"])
+    routed = router.complete(MockClient(llm), [add], MESSAGES)
+    assert routed.model == "large"
+    assert routed.escalations == [reason]
+    assert llm.models == ["small", "large"]
+    assert router.stats.reasons == {reason: 1}
+    assert router.stats.escalation_rate == 1.0
+    assert router.stats.models["small"].escalation_rate == 1.0
+
+def test_last_model_accepted_as_is():
+    """Test that the strongest model's answer is never escalated."""
+    llm = ModelLLM(MockScript([ScriptedReply(tool_calls=[("subtract", {})])]))
+    routed = ModelRouter(["only"]).complete(MockClient(llm), [add], MESSAGES)
+    assert routed.model == "only" and routed.escalations == []
+    with pytest.raises(ValueError):
+        ModelRouter([])
@@ -0,0 +1,151 @@
+"""Tests for sandbox module."""
+
+import os
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from enum import Enum
+import pytest
+from arg_gpt.ai_func import ai_func
+from arg_gpt.cancellation import CancellationError, CancellationToken
+from arg_gpt.circuit_breaker import ToolTimeoutError
+from arg_gpt.dispatcher import ToolDispatcher
+from arg_gpt.sandbox import SandboxError, SandboxLimits, SandboxPool
+
+def shell(command: str) -> None:
+    """Run a shell command.
+
+    Arguments:
+        command: The command
+    """
+    subprocess.run(command, shell=True)
+
+def pid_and_print(text: str) -> int:
+    """Print text and return the process id.
+
+    Arguments:
+        text: Text to print
+    """
+    print(text)
+    return os.getpid()
+
+def busy() -> None:
+    """Spin forever."""
+    while True:
+        pass
+
+def allocate(megabytes: int) -> int:
+    """Allocate memory.
+
+    Arguments:
+        megabytes: Amount to allocate
+    """
+    return len(bytearray(megabytes * 1024 * 1024))
+
+def fail() -> None:
+    """Raise an error."""
+    raise ValueError("broken tool")
+
+class Color(Enum):
+    RED = "red"
+    BLUE = "blue"
+
+@dataclass
+class Point:
+    x: int
+    y: int
+
+@ai_func(sandbox=True)
+def paint(color: Color, at: Point) -> str:
+    """Paint a pixel.
+
+    Arguments:
+        color: The color
+        at: Where to paint
+    """
+    return f"{color.name} at {at.x},{at.y}"
+
+@ai_func(sandbox=SandboxLimits(wall_seconds=5))
+def sandboxed_pid() -> int:
+    """Return the process id."""
+    return os.getpid()
+
+@pytest.fixture(scope="module")
+def pool():
+    with SandboxPool(size=1) as pool:
+        yield pool
+
+def test_runs_in_worker_and_captures_output(pool):
+    """Test that calls run in a warm worker and output of the tool and its children is captured."""
+    result = pool.call(pid_and_print, {"text": "hello"})
+    assert result["output"] == "hello\n"
+    assert int(result["result"]) != os.getpid()
+    # The warm worker is reused
+    assert pool.call(pid_and_print, {"text": "again"})["result"] == result["result"]
+    assert pool.call(shell, {"command": "echo from the shell"}) == "from the shell\n"
+    with pytest.raises(SandboxError, match="ValueError: broken tool"):
+        pool.call(fail, {})
+
+def test_output_is_capped(pool):
+    """Test that large output is truncated to the output limit."""
+    output = pool.call(shell, {"command": "yes | head -c 100000"}, SandboxLimits(max_output_bytes=1024))
+    assert len(output.encode()) <= 1024
+    assert "truncated" in output
+
+def test_limits_kill_and_replace_worker(pool):
+    """Test the wall clock, CPU and memory limits."""
+    started = time.monotonic()
+    with pytest.raises(ToolTimeoutError):
+        pool.call(shell, {"command": "sleep 30"}, SandboxLimits(wall_seconds=0.5))
+    assert time.monotonic() - started < 10
+    with pytest.raises(SandboxError, match="CPU time"):
+        pool.call(busy, {}, SandboxLimits(cpu_seconds=1))
+    with pytest.raises(SandboxError, match="memory"):
+        pool.call(allocate, {"megabytes": 2048}, SandboxLimits(memory_bytes=512 * 1024 * 1024))
+    assert pool.call(allocate, {"megabytes": 1}) == "1048576"
+
+def test_cancellation_kills_call(pool):
+    """Test that cancelling the token stops a sandboxed call promptly."""
+    token = CancellationToken(timeout=0.3)
+    started = time.monotonic()
+    with pytest.raises(CancellationError):
+        pool.call(shell, {"command": "sleep 30"}, token=token)
+    assert time.monotonic() - started < 10
+
+def test_dispatcher_runs_sandboxed_tools(pool):
+    """Test that tools registered with sandbox=True run through the dispatcher's pool."""
+    dispatcher = ToolDispatcher([sandboxed_pid], sandbox_pool=pool)
+    content = dispatcher.call("1", "sandboxed_pid", "{}")["content"]
+    assert int(content) != os.getpid()
+
+    def local():
+        return 1
+    with pytest.raises(SandboxError, match="module level"):
+        pool.call(local, {})
+
+def test_typed_arguments_are_decoded_in_worker(pool):
+    """Test that sandboxed tools with Enum and dataclass parameters receive decoded values."""
+    dispatcher = ToolDispatcher([paint], sandbox_pool=pool)
+    content = dispatcher.call("1", "paint", '{"color": "red", "at": {"x": 1, "y": 2}}')["content"]
+    assert content == "RED at 1,2"
+    assert "Invalid function arguments" in dispatcher.call("2", "paint", '{"color": "green", "at": {"x": 1, "y": 2}}')["content"]
+
+def test_unserializable_arguments_keep_worker(pool):
+    """Test that arguments that are not JSON fail before a worker is taken."""
+    before = pool.call(pid_and_print, {"text": ""})["result"]
+    with pytest.raises(SandboxError, match="not JSON"):
+        pool.call(pid_and_print, {"text": object()})
+    assert pool.call(pid_and_print, {"text": ""})["result"] == before
+
+def test_waiting_for_busy_worker_is_cancellable(pool):
+    """Test that a call waiting for a free worker stops when its token is cancelled."""
+    pool.call(pid_and_print, {"text": ""})
+    busy_call = threading.Thread(target=pool.call, args=(shell, {"command": "sleep 1"}))
+    busy_call.start()
+    time.sleep(0.2)
+    started = time.monotonic()
+    with pytest.raises(CancellationError):
+        pool.call(pid_and_print, {"text": ""}, token=CancellationToken(timeout=0.2))
+    assert time.monotonic() - started < 0.8
+    busy_call.join()
@@ -0,0 +1,89 @@
+"""Tests for schema_dedup module."""
+
+import json
+from dataclasses import dataclass
+from typing import Dict, List
+from arg_gpt.gpt_helpers import create_tools_dict
+from arg_gpt.schema_dedup import (
+    SchemaInterner,
+    build_tools_payload,
+    canonical_json,
+    deduplicate_tools,
+    iter_subschemas
+)
+
+@dataclass
+class Address:
+    street: str
+    city: str
+    postcode: str
+    country: str = "NO"
+
+def ship(to: Address, sender: Address, notes: Dict[str, List[str]]) -> None:
+    """Ship a parcel."""
+
+def bill(customer: Address, items: List[str]) -> None:
+    """Bill a customer."""
+
+def resolve(parameters, schema):
+    """Follow a $ref within a tool's parameters."""
+    if "$ref" in schema:
+        return parameters["$defs"][schema["$ref"].rsplit("/", 1)[1]]
+    return schema
+
+def test_interner_shares_identical_fragments():
+    """Test that equal fragments become the same object."""
+    interner = SchemaInterner()
+    first = interner.intern({"type": "object", "properties": {"a": {"type": "string"}}})
+    second = interner.intern({"type": "object", "properties": {"a": {"type": "string"}}})
+    other = interner.intern({"type": "object", "properties": {"a": {"type": "integer"}}})
+    assert first is second
+    assert first is not other
+    assert first["properties"]["a"] is not other["properties"]["a"]
+
+def test_iter_subschemas():
+    """Test that nested schemas are found in all schema positions."""
+    schema = {"type": "object", "properties": {"a": {"type": "array", "items": {"type": "string"}}},
+              "anyOf": [{"type": "null"}]}
+    found = [canonical_json(s) for s in iter_subschemas(schema)]
+    assert '{"type":"string"}' in found
+    assert '{"type":"null"}' in found
+    assert len(found) == 3
+
+def test_repeated_inline_schema_hoisted():
+    """Test that a large schema repeated within a tool is defined once."""
+    address = {"type": "object", "properties": {
+        "street": {"type": "string", "description": "Street and number"},
+        "city": {"type": "string", "description": "City name"}
+    }}
+    tools = [{"type": "function", "function": {"name": "ship", "parameters": {
+        "type": "object", "properties": {"to": dict(address), "sender": dict(address)}, "required": []
+    }}}]
+
+    result, stats = deduplicate_tools(tools)
+    parameters = result[0]["function"]["parameters"]
+    assert parameters["properties"]["to"] == parameters["properties"]["sender"]
+    assert "$ref" in parameters["properties"]["to"]
+    assert resolve(parameters, parameters["properties"]["to"]) == address
+    assert stats.shared_definitions == 1
+    assert stats.bytes_saved > 0
+
+def test_registry_payload_shares_memory():
+    """Test that definitions shared by several tools are one object in memory."""
+    result, stats = build_tools_payload([ship, bill])
+    ship_defs = result[0]["function"]["parameters"]["$defs"]
+    bill_defs = result[1]["function"]["parameters"]["$defs"]
+    assert ship_defs["Address"] is bill_defs["Address"]
+    assert stats.unique_fragments < stats.fragments
+    # Semantics are unchanged for the already minimal payload
+    assert json.loads(json.dumps(result)) == create_tools_dict([ship, bill])
+    assert stats.bytes_saved == 0
+
+def test_small_schemas_left_inline():
+    """Test that tiny repeated schemas are not hoisted."""
+    def pair(a: str, b: str, c: str) -> None:
+        """Pair strings."""
+
+    result, stats = build_tools_payload([pair])
+    assert "$defs" not in result[0]["function"]["parameters"]
+    assert stats.shared_definitions == 0
@@ -0,0 +1,123 @@
+"""Tests for session_store module."""
+
+import pytest
+from openai.types.chat import ChatCompletionMessage
+from arg_gpt.session_store import (
+    InMemorySessionStore,
+    JsonlSessionStore,
+    SessionStore,
+    SQLiteSessionStore,
+    serialize_message
+)
+
+def sample_turn(index):
+    assistant = ChatCompletionMessage.model_validate({
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [{
+            "id": f"call_{index}",
+            "type": "function",
+            "function": {"name": "spell_word", "arguments": '{"word": "hi"}'}
+        }]
+    })
+    return [
+        {"role": "user", "content": f"prompt {index}"},
+        assistant,
+        {"tool_call_id": f"call_{index}", "role": "tool", "name": "spell_word", "content": "h-i"}
+    ]
+
+@pytest.fixture(params=["memory", "sqlite", "jsonl"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield InMemorySessionStore()
+    elif request.param == "sqlite":
+        store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+        yield store
+        store.close()
+    else:
+        yield JsonlSessionStore(str(tmp_path / "sessions"))
+
+def test_serialize_sdk_message():
+    """Test that SDK messages become provider payload dicts."""
+    payload = serialize_message(sample_turn(1)[1])
+    assert payload["role"] == "assistant"
+    assert "content" not in payload
+    assert payload["tool_calls"][0]["function"]["name"] == "spell_word"
+
+def test_append_and_load(store):
+    """Test incremental appends and a full load."""
+    store.append("s1", sample_turn(1))
+    store.append("s1", sample_turn(2))
+    store.append("s2", sample_turn(3))
+
+    messages = store.load("s1")
+    assert len(messages) == 6
+    assert messages[0] == {"role": "user", "content": "prompt 1"}
+    assert messages[4]["tool_calls"][0]["id"] == "call_2"
+    assert messages[5]["content"] == "h-i"
+    assert "s1" in store
+    assert store.load("unknown") == []
+
+def test_load_recent(store):
+    """Test loading only the most recent messages and turns."""
+    for index in range(50):
+        store.append("s1", sample_turn(index))
+
+    last = store.load("s1", last=2)
+    assert last[0]["tool_calls"][0]["id"] == "call_49"
+    assert last[1]["content"] == "h-i"
+    turns = store.load_turns("s1", 2)
+    assert len(turns) == 6
+    assert turns[0] == {"role": "user", "content": "prompt 48"}
+    assert turns[3] == {"role": "user", "content": "prompt 49"}
+
+def test_delete(store):
+    """Test deleting a session."""
+    store.append("s1", sample_turn(1))
+    store.delete("s1")
+    assert store.load("s1") == []
+
+def test_memory_store_evicts_least_recent():
+    """Test the LRU bound of the in-memory store."""
+    store = InMemorySessionStore(max_sessions=2)
+    store.append("a", sample_turn(1))
+    store.append("b", sample_turn(1))
+    store.load("a")
+    store.append("c", sample_turn(1))
+    assert "a" in store
+    assert "b" not in store
+
+def test_jsonl_reads_across_blocks(tmp_path, monkeypatch):
+    """Test backward reading when lines span read blocks."""
+    import arg_gpt.session_store as session_store
+    monkeypatch.setattr(session_store, "_READ_BLOCK", 7)
+    store = JsonlSessionStore(str(tmp_path))
+    store.append("s/1", [{"role": "user", "content": f"message {i}"} for i in range(20)])
+    assert [m["content"] for m in store.load("s/1")] == [f"message {i}" for i in range(20)]
+    assert store.load("s/1", last=1) == [{"role": "user", "content": "message 19"}]
+
+def test_jsonl_skips_torn_last_line(tmp_path, monkeypatch):
+    """Test that a last line cut off by a crash is skipped and dropped by the next append."""
+    import arg_gpt.session_store as session_store
+    monkeypatch.setattr(session_store, "_READ_BLOCK", 7)
+    store = JsonlSessionStore(str(tmp_path))
+    store.append("s", [{"role": "user", "content": "kept"}])
+    with open(store.path("s"), "a", encoding="utf-8") as file:
+        file.write('{"role": "assistant", "con')
+    assert store.load("s") == [{"role": "user", "content": "kept"}]
+
+    store.append("s", [{"role": "user", "content": "next"}])
+    assert [m["content"] for m in store.load("s")] == ["kept", "next"]
+
+    with open(store.path("torn"), "w", encoding="utf-8") as file:
+        file.write('{"role": "us')
+    assert store.load("torn") == []
+
+def test_partial_store_cannot_be_created():
+    """Test that a store missing abstract methods fails when constructed."""
+    class AppendOnly(SessionStore):
+        def append(self, session_id, messages):
+            pass
+
+    with pytest.raises(TypeError):
+        AppendOnly()
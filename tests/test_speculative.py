@@ -0,0 +1,170 @@
+"""Tests for speculative module."""
+
+import json
+import threading
+from enum import Enum
+from types import SimpleNamespace
+from unittest.mock import Mock
+from arg_gpt.speculative import (
+    SpeculationStats,
+    SpeculativeToolRunner,
+    completed_fields,
+    run_speculative_turn
+)
+from arg_gpt.cancellation import CancellationToken
+from arg_gpt.tool_options import ToolOptions
+
+def chunk(index=None, call_id=None, name=None, arguments=None, content=None):
+    tool_calls = None
+    if index is not None:
+        tool_calls = [SimpleNamespace(
+            index=index, id=call_id,
+            function=SimpleNamespace(name=name, arguments=arguments)
+        )]
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+def stream_arguments(index, call_id, name, arguments, size=3):
+    yield chunk(index, call_id, name, "")
+    for start in range(0, len(arguments), size):
+        yield chunk(index, None, None, arguments[start:start + size])
+
+def test_completed_fields():
+    """Test that only fully received top-level fields are reported."""
+    assert completed_fields("") == {}
+    assert completed_fields('{"a": 1') == {}
+    assert completed_fields('{"a": 1 ') == {"a": 1}
+    assert completed_fields('{"a": "x"') == {"a": "x"}
+    assert completed_fields('{"a": [1, {"b": 2}]') == {"a": [1, {"b": 2}]}
+    assert completed_fields('{"a": tru') == {}
+    assert completed_fields('{"a": true') == {"a": True}
+    assert completed_fields('{"a": 1, "b": "x,y') == {"a": 1}
+    assert completed_fields('{"a": [1, 2], "b": {"c": 3},') == {"a": [1, 2], "b": {"c": 3}}
+    assert completed_fields('{"a": 1, "b": 2}') == {"a": 1, "b": 2}
+    assert completed_fields('[1, 2') is None
+
+def make_lookup(started):
+    def lookup(key: str, limit: int = 10) -> str:
+        started.set()
+        return f"{key}:{limit}"
+    lookup.__ai_options__ = ToolOptions(speculative=True)
+    return lookup
+
+def test_speculation_starts_before_stream_ends():
+    """Test that a speculative tool runs before the stream finishes and is confirmed."""
+    started = threading.Event()
+    stats = SpeculationStats()
+    runner = SpeculativeToolRunner([make_lookup(started)], stats=stats)
+
+    for part in stream_arguments(0, "call_1", "lookup", '{"key": "abc", "limit": 5}'):
+        runner.feed(part)
+    # The arguments are complete, so the call starts while the message is still streaming
+    assert started.wait(1)
+    runner.feed(chunk(content="done"))
+
+    messages = runner.finish()
+    assert messages[0]["content"] == "done"
+    assert messages[0]["tool_calls"][0]["function"]["arguments"] == '{"key": "abc", "limit": 5}'
+    assert messages[1]["content"] == "abc:5"
+    assert stats.started == 1
+    assert stats.confirmed == 1
+    assert stats.wasted_ratio == 0.0
+
+def test_speculation_starts_before_closing_brace():
+    """Test that a call starts once every argument's value is complete, before the object closes."""
+    started = threading.Event()
+    stats = SpeculationStats()
+    runner = SpeculativeToolRunner([make_lookup(started)], stats=stats)
+
+    for part in stream_arguments(0, "call_1", "lookup", '{"limit": 5, "key": "abc"'):
+        runner.feed(part)
+    assert started.wait(1)
+    runner.feed(chunk(0, None, None, "}"))
+    assert runner.finish()[1]["content"] == "abc:5"
+    assert stats.confirmed == 1
+
+def test_mismatched_speculation_is_wasted():
+    """Test that speculation on arguments that later change is discarded."""
+    stats = SpeculationStats()
+    runner = SpeculativeToolRunner([make_lookup(threading.Event())], stats=stats)
+
+    for part in stream_arguments(0, "call_1", "lookup", '{"key": "abc", "limit": 5}'):
+        runner.feed(part)
+    # Simulate the model having revised an argument after the call was started
+    runner.calls[0].speculated_args = {"key": "abd", "limit": 5}
+
+    messages = runner.finish()
+    assert messages[1]["content"] == "abc:5"
+    assert stats.wasted == 1
+    assert stats.wasted_ratio == 1.0
+
+def test_non_speculative_tools_wait_for_finish():
+    """Test that tools not marked speculative only run at the end."""
+    calls = []
+
+    def record(x: int) -> int:
+        calls.append(x)
+        return x
+
+    runner = SpeculativeToolRunner([record])
+    for part in stream_arguments(0, "call_1", "record", '{"x": 4}'):
+        runner.feed(part)
+    assert calls == []
+    messages = runner.finish()
+    assert calls == [4]
+    assert messages[1]["content"] == "4"
+
+class Color(Enum):
+    RED = "red"
+    BLUE = "blue"
+
+def test_speculation_uses_dispatcher_path():
+    """Test that speculative calls get decoded arguments and injected tokens."""
+    received = []
+
+    def paint(color: Color, token: CancellationToken) -> str:
+        received.append((color, token))
+        return color.name
+    paint.__ai_options__ = ToolOptions(speculative=True)
+
+    token = CancellationToken()
+    stats = SpeculationStats()
+    runner = SpeculativeToolRunner([paint], stats=stats, token=token)
+    for part in stream_arguments(0, "call_1", "paint", '{"color": "red"}'):
+        runner.feed(part)
+    messages = runner.finish()
+    assert messages[1]["content"] == "RED"
+    assert received == [(Color.RED, token)]
+    assert stats.confirmed == 1
+
+def test_sandboxed_tools_are_not_speculated():
+    """Test that tools running in a sandbox wait for the final message."""
+    calls = []
+
+    def isolated(x: int) -> int:
+        calls.append(x)
+        return x
+    isolated.__ai_options__ = ToolOptions(speculative=True, sandbox=True)
+
+    runner = SpeculativeToolRunner([isolated])
+    for part in stream_arguments(0, "call_1", "isolated", '{"x": 4}'):
+        runner.feed(part)
+    assert runner.calls[0].future is None
+    assert runner.stats.started == 0
+
+def test_run_speculative_turn():
+    """Test a full streamed turn through the client."""
+    lookup = make_lookup(threading.Event())
+    client = Mock()
+    client.chat.completions.create.return_value = iter(
+        list(stream_arguments(0, "call_1", "lookup", '{"key": "k"}'))
+        + list(stream_arguments(1, "call_2", "lookup", '{"key": "j", "limit": 2}'))
+    )
+    stats = SpeculationStats()
+
+    messages = run_speculative_turn(client, [lookup], [{"role": "user", "content": "hi"}], stats=stats)
+
+    assert client.chat.completions.create.call_args[1]["stream"] is True
+    assert [m["content"] for m in messages[1:]] == ["k:10", "j:2"]
+    assert [m["tool_call_id"] for m in messages[1:]] == ["call_1", "call_2"]
+    assert stats.confirmed == 2
@@ -0,0 +1,134 @@
+"""Tests for tool_output module."""
+
+import asyncio
+import json
+import pytest
+from arg_gpt.tool_options import ToolOptions
+from arg_gpt.tool_output import (
+    CappedBuffer,
+    DEFAULT_MAX_OUTPUT_BYTES,
+    iterate_async,
+    render_tool_output,
+    resolve_output_limit,
+    serialize_value,
+    truncate_text
+)
+
+def test_scalars_and_none():
+    """Test that scalars keep their str() form and None reports success."""
+    assert render_tool_output(3) == "3"
+    assert render_tool_output("blue") == "blue"
+    assert render_tool_output(None) == "Function executed successfully"
+
+def test_containers_serialized_as_json():
+    """Test that dicts and lists are serialized as JSON rather than repr."""
+    result = render_tool_output({"name": "sky", "colors": ["blue", None], "ok": True})
+    assert json.loads(result) == {"name": "sky", "colors": ["blue", None], "ok": True}
+    assert serialize_value((1, 2)) == "[1, 2]"
+
+def test_large_list_sampled_head_and_tail():
+    """Test that a large list keeps valid JSON with head and tail items."""
+    result = render_tool_output(list(range(100000)), max_bytes=1000)
+    assert len(result.encode()) <= 1000
+    items = json.loads(result)
+    assert items[0] == 0
+    assert items[-1] == 99999
+    omitted = next(item for item in items if isinstance(item, str))
+    assert "items omitted" in omitted
+
+def test_large_dict_sampled():
+    """Test that a large dict keeps valid JSON with an omission marker."""
+    result = render_tool_output({f"key{i}": i for i in range(10000)}, max_bytes=500)
+    assert len(result.encode()) <= 500
+    data = json.loads(result)
+    assert data["key0"] == 0
+    assert data["key9999"] == 9999
+    assert "keys omitted" in data["..."]
+
+def test_truncate_text_head_and_tail():
+    """Test text truncation keeps both ends and reports dropped bytes."""
+    text = "a" * 5000 + "b" * 5000
+    result = truncate_text(text, 500)
+    assert len(result.encode()) <= 500
+    assert result.startswith("a")
+    assert result.endswith("b")
+    assert "bytes truncated" in result
+    assert truncate_text("short", 500) == "short"
+
+def test_generator_streams_into_capped_buffer():
+    """Test that generators are consumed into a bounded buffer."""
+    def lines():
+        for i in range(100000):
+            yield f"line {i}\n"
+
+    result = render_tool_output(lines(), max_bytes=1000)
+    assert len(result.encode()) <= 1000
+    assert result.startswith("line 0\n")
+    assert result.endswith("line 99999\n")
+    assert "bytes truncated" in result
+
+def test_capped_buffer_without_truncation():
+    """Test that a small stream is returned unchanged."""
+    buffer = CappedBuffer(100)
+    for piece in ["ab", "cd", "ef"]:
+        buffer.write(piece)
+    assert not buffer.truncated
+    assert buffer.getvalue() == "abcdef"
+
+def test_generator_of_objects():
+    """Test that non-string chunks are serialized one per line."""
+    result = render_tool_output(iter([{"a": 1}, [2]]))
+    assert result == '{"a": 1}\n[2]\n'
+
+def test_resolve_output_limit():
+    """Test the effective limit from byte and token options."""
+    assert resolve_output_limit(ToolOptions()) == DEFAULT_MAX_OUTPUT_BYTES
+    assert resolve_output_limit(ToolOptions(max_output_bytes=100)) == 100
+    assert resolve_output_limit(ToolOptions(max_output_tokens=10)) == 40
+    assert resolve_output_limit(ToolOptions(max_output_bytes=30, max_output_tokens=10)) == 30
+
+def test_async_results():
+    """Test that async generators stream into the buffer and coroutines are awaited."""
+    async def lines():
+        for i in range(1000):
+            await asyncio.sleep(0)
+            yield f"line {i}\n"
+
+    async def answer():
+        await asyncio.sleep(0)
+        return {"answer": 42}
+
+    seen = []
+    result = render_tool_output(lines(), max_bytes=200, on_chunk=seen.append)
+    assert len(seen) == 1000
+    assert result.startswith("line 0\n") and result.endswith("line 999\n")
+    assert render_tool_output(answer()) == '{"answer": 42}'
+
+    async def inside_running_loop():
+        # Waiting synchronously would block the loop, so it is refused
+        with pytest.raises(RuntimeError, match="running event loop"):
+            render_tool_output(answer())
+        with pytest.raises(RuntimeError, match="running event loop"):
+            render_tool_output(lines())
+        loop = asyncio.get_running_loop()
+        return (await loop.run_in_executor(None, render_tool_output, lines(), 200),
+                await loop.run_in_executor(None, render_tool_output, answer()))
+    assert asyncio.run(inside_running_loop()) == (result, '{"answer": 42}')
+
+def test_iterate_async_closes_stream_when_stopped_early():
+    """Test that breaking out of iterate_async closes the async generator."""
+    closed = []
+
+    async def numbers():
+        try:
+            for i in range(100):
+                yield i
+        finally:
+            closed.append(True)
+
+    stream = iterate_async(numbers())
+    for number in stream:
+        if number == 2:
+            break
+    stream.close()
+    assert closed == [True]
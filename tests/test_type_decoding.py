@@ -0,0 +1,84 @@
+"""Tests for type_decoding module."""
+
+import json
+from dataclasses import dataclass
+from enum import Enum
+from types import SimpleNamespace
+from typing import Dict, List, Literal, Optional, Set, Tuple
+import pytest
+from arg_gpt.dispatcher import ToolDispatcher
+from arg_gpt.type_decoding import ArgumentValidationError, build_argument_decoder, build_decoder
+
+class Unit(Enum):
+    CELSIUS = "c"
+    FAHRENHEIT = "f"
+
+@dataclass
+class Location:
+    city: str
+    unit: Unit = Unit.CELSIUS
+
+def test_build_decoder_cached():
+    """Test that decoders are built once per type."""
+    assert build_decoder(List[Location]) is build_decoder(List[Location])
+
+def test_decode_named_types():
+    """Test decoding of enums, dataclasses and containers of them."""
+    assert build_decoder(Unit)("f") is Unit.FAHRENHEIT
+    assert build_decoder(Location)({"city": "Oslo", "unit": "f"}) == Location("Oslo", Unit.FAHRENHEIT)
+    assert build_decoder(List[Location])([{"city": "Oslo"}]) == [Location("Oslo")]
+    assert build_decoder(Dict[str, Unit])({"a": "c"}) == {"a": Unit.CELSIUS}
+    assert build_decoder(Optional[Unit])(None) is None
+    assert build_decoder(Tuple[int, Unit])([1, "c"]) == (1, Unit.CELSIUS)
+    assert build_decoder(Set[str])(["a", "a"]) == {"a"}
+
+def test_decode_errors():
+    """Test that invalid values raise validation errors."""
+    with pytest.raises(ArgumentValidationError):
+        build_decoder(Unit)("kelvin")
+    with pytest.raises(ArgumentValidationError):
+        build_decoder(Literal["a", "b"])("c")
+    with pytest.raises(ArgumentValidationError):
+        build_decoder(Location)({"unit": "c"})
+
+def test_simple_functions_need_no_decoder():
+    """Test that functions with only simple types skip decoding."""
+    def simple(x: int, names: List[str], extra: Optional[Dict[str, int]] = None):
+        pass
+
+    assert build_argument_decoder(simple) is None
+
+def test_dispatcher_decodes_arguments():
+    """Test that the dispatcher passes decoded values to the tool."""
+    def weather(location: Location, units: List[Unit]) -> str:
+        return f"{location.city} {location.unit.name} {[u.value for u in units]}"
+
+    tool_call = SimpleNamespace(id="call_1", function=SimpleNamespace(
+        name="weather", arguments=json.dumps({"location": {"city": "Oslo"}, "units": ["f"]})
+    ))
+    response = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(tool_calls=[tool_call]))])
+    dispatcher = ToolDispatcher([weather])
+
+    assert dispatcher.interpret(response)[1]["content"] == "Oslo CELSIUS ['f']"
+
+    tool_call.function.arguments = json.dumps({"location": {"city": "Oslo"}, "units": ["k"]})
+    assert "Invalid function arguments" in dispatcher.interpret(response)[1]["content"]
+
+@dataclass
+class Node:
+    value: int
+    children: List["Node"]
+
+def test_decode_recursive_dataclass():
+    """Test that self-referencing dataclasses decode at every depth."""
+    def walk(tree: Node) -> int:
+        return tree.value + sum(walk(child) for child in tree.children)
+
+    tree = {"value": 1, "children": [{"value": 2, "children": [{"value": 3, "children": []}]}]}
+    assert build_decoder(Node)(tree) == Node(1, [Node(2, [Node(3, [])])])
+    with pytest.raises(ArgumentValidationError):
+        build_decoder(Node)({"value": 1, "children": ["leaf"]})
+
+    tool_call = SimpleNamespace(id="call_1", function=SimpleNamespace(name="walk", arguments=json.dumps({"tree": tree})))
+    response = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(tool_calls=[tool_call]))])
+    assert ToolDispatcher([walk]).interpret(response)[1]["content"] == "6"
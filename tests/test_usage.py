@@ -0,0 +1,77 @@
+"""Tests for usage module."""
+
+import json
+from arg_gpt.gpt_helpers import call_gpt_with_function, create_tools_dict
+from arg_gpt.mock_server import MockClient
+from arg_gpt.usage import UsageTracker, json_lines_exporter, tool_token_shares
+
+def short_tool(x: int) -> int:
+    """Double a number.
+
+    Arguments:
+        x: The number
+    """
+    return 2 * x
+
+def long_tool(first: str, second: str, third: str, fourth: str) -> str:
+    """Join four strings with a very long and detailed description of what happens to them.
+
+    Arguments:
+        first: The first string to join, which is described in great detail here
+        second: The second string to join, which is described in great detail here
+        third: The third string to join, which is described in great detail here
+        fourth: The fourth string to join, which is described in great detail here
+    """
+    return first + second + third + fourth
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+def test_tool_token_shares_cached():
+    """Test that larger schemas get larger shares and estimates are cached per payload."""
+    tools = create_tools_dict([short_tool, long_tool])
+    shares = tool_token_shares(tools)
+    assert shares["long_tool"] > shares["short_tool"] > 0
+    assert tool_token_shares(tools) is shares
+
+def test_tracker_aggregates_by_model_tool_and_session():
+    """Test totals and costs recorded through call_gpt_with_function."""
+    tracker = UsageTracker(prices={"cheap": (1.0, 2.0)})
+    client = MockClient()
+    tools = create_tools_dict([short_tool, long_tool])
+    for session in ("a", "a", "b"):
+        call_gpt_with_function(client, None, MESSAGES, model="cheap", tools_dict=tools,
+                               usage_tracker=tracker, session_id=session)
+
+    snapshot = tracker.snapshot()
+    model = snapshot["models"]["cheap"]
+    assert model["requests"] == 3
+    assert model["total_tokens"] == model["prompt_tokens"] + model["completion_tokens"] > 0
+    assert abs(model["cost"] - (model["prompt_tokens"] * 1.0 + model["completion_tokens"] * 2.0) / 1000) < 1e-9
+    assert snapshot["sessions"]["a"]["requests"] == 2
+    assert list(snapshot["tools"]) == ["long_tool", "short_tool"]
+    assert snapshot["tools"]["long_tool"]["schema_tokens"] == 3 * tool_token_shares(tools)["long_tool"]
+
+def test_periodic_export(tmp_path):
+    """Test that snapshots are exported once the interval has passed."""
+    now = [0.0]
+    path = tmp_path / "usage.jsonl"
+    tracker = UsageTracker(export=json_lines_exporter(str(path)), export_interval=10, clock=lambda: now[0])
+    tracker.record("m", {"prompt_tokens": 5, "completion_tokens": 1})
+    assert not path.exists()
+    now[0] = 11
+    tracker.record("m", {"prompt_tokens": 5, "completion_tokens": 1})
+    tracker.wait_for_export(5)
+    # The export was claimed, so a concurrent record in the same interval does not repeat it
+    tracker.record("m", {"prompt_tokens": 5, "completion_tokens": 1})
+    tracker.wait_for_export(5)
+    [line] = path.read_text().splitlines()
+    assert json.loads(line)["models"]["m"]["prompt_tokens"] == 10
+
+def test_session_totals_are_bounded():
+    """Test that only the most recently active sessions are kept."""
+    tracker = UsageTracker(max_sessions=2)
+    for session in ("a", "b", "a", "c"):
+        tracker.record("m", {"prompt_tokens": 1, "completion_tokens": 1}, session_id=session)
+    assert list(tracker.snapshot()["sessions"]) == ["a", "c"]
+    assert tracker.sessions["a"].requests == 2
+    assert tracker.dropped_sessions == 1